@@ -0,0 +1,301 @@
+"""
+上传流程端到端基准测试。
+
+启动本地模拟上传站点（见 mock_site.py），使用真实的 create_driver / login_to_website /
+perform_video_upload 代码驱动它，统计吞吐量、各步骤耗时以及每个 worker 的浏览器内存占用。
+
+用法（在 VideoUploaderProject 目录下）:
+    python -m benchmark.bench_upload --videos 20 --workers 2 --headless
+"""
+import argparse
+import configparser
+import json
+import logging
+import os
+import queue
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+
+from benchmark.mock_site import MockUploadSite, DEFAULT_DELAYS
+from web import web_interaction, resource_monitor
+
+logger = logging.getLogger(__name__)
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(pct / 100.0 * (len(sorted_values) - 1)))))
+    return sorted_values[index]
+
+
+def summarize_latencies(values):
+    """返回一组耗时（秒）的 count/mean/p50/p95/max 摘要。"""
+    ordered = sorted(values)
+    if not ordered:
+        return {'count': 0}
+    return {
+        'count': len(ordered),
+        'mean': statistics.fmean(ordered),
+        'p50': _percentile(ordered, 50),
+        'p95': _percentile(ordered, 95),
+        'max': ordered[-1],
+    }
+
+
+class _StepCollector:
+    """通过 web_interaction 的步骤监听器收集各步骤耗时。"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.durations = {}
+        self.failures = {}
+
+    def __call__(self, event):
+        if event['status'] == 'started':
+            return
+        with self._lock:
+            self.durations.setdefault(event['step'], []).append(event['elapsed'])
+            if event['status'] == 'failed':
+                self.failures[event['step']] = self.failures.get(event['step'], 0) + 1
+
+
+class _Worker(threading.Thread):
+    def __init__(self, index, config, upload_url, videos, reuse_driver, sample_interval):
+        super().__init__(name=f"bench-worker-{index}", daemon=True)
+        self.config = config
+        self.upload_url = upload_url
+        self.videos = videos
+        self.reuse_driver = reuse_driver
+        self.sample_interval = sample_interval
+        self.results = []
+        self.create_latencies = []
+        self.login_latencies = []
+        self.rss_samples = []
+        self._driver = None
+        self._stop_sampling = threading.Event()
+
+    def _sample_memory(self):
+        while not self._stop_sampling.wait(self.sample_interval):
+            driver = self._driver
+            sample = resource_monitor.sample_process_tree(resource_monitor.driver_root_pid(driver)) if driver else None
+            if sample is not None:
+                self.rss_samples.append(sample['rss'])
+
+    def _open_driver(self):
+        started = time.perf_counter()
+        driver = web_interaction.create_driver(self.config)
+        self.create_latencies.append(time.perf_counter() - started)
+        if not driver:
+            return None
+        started = time.perf_counter()
+        logged_in = web_interaction.login_to_website(driver, self.config)
+        self.login_latencies.append(time.perf_counter() - started)
+        if not logged_in:
+            driver.quit()
+            return None
+        return driver
+
+    def _close_driver(self):
+        if self._driver:
+            try:
+                self._driver.quit()
+            except Exception as e:
+                logger.debug(f"{self.name} 关闭浏览器失败: {e}")
+            self._driver = None
+
+    def run(self):
+        sampler = threading.Thread(target=self._sample_memory, name=f"{self.name}-sampler", daemon=True)
+        sampler.start()
+        try:
+            while True:
+                try:
+                    video_path = self.videos.get_nowait()
+                except queue.Empty:
+                    break
+                started = time.perf_counter()
+                ok = False
+                try:
+                    if self._driver is None:
+                        self._driver = self._open_driver()
+                    else:
+                        self._driver.get(self.upload_url)
+                    if self._driver:
+                        ok = web_interaction.perform_video_upload(self._driver, video_path, '', None, self.config)
+                except Exception as e:
+                    logger.error(f"{self.name} 处理 {video_path} 时发生错误: {e}", exc_info=True)
+                finally:
+                    if not self.reuse_driver or not ok:
+                        self._close_driver()
+                self.results.append({'video': video_path, 'ok': bool(ok), 'elapsed': time.perf_counter() - started})
+        finally:
+            self._close_driver()
+            self._stop_sampling.set()
+            sampler.join(timeout=self.sample_interval + 1)
+
+
+def build_benchmark_config(site, work_dir, headless, low_footprint=None):
+    """基于项目的 config.ini 构建指向模拟站点的配置（浏览器/驱动相关设置沿用原配置）。"""
+    config = configparser.ConfigParser()
+    config_path = os.path.join(PROJECT_DIR, 'config', 'config.ini')
+    if os.path.exists(config_path):
+        with open(config_path, 'r', encoding='utf-8') as f:
+            config.read_file(f)
+    for section in ('General', 'WebTarget', 'BrowserSettings', 'NetworkPolicy', 'AdaptiveTimeouts', 'Diagnostics'):
+        if not config.has_section(section):
+            config.add_section(section)
+    config.set('WebTarget', 'upload_url', site.upload_url)
+    config.set('WebTarget', 'cookie_domain_url', site.base_url + '/')
+    config.set('General', 'cookies_file_path', os.path.join(work_dir, 'bench_cookies.json'))
+    # 基准测试产生的瀑布记录、步骤耗时和诊断文件写入工作目录，不混入正式运行的历史数据
+    config.set('NetworkPolicy', 'waterfall_file', os.path.join(work_dir, 'network_waterfall.jsonl'))
+    config.set('AdaptiveTimeouts', 'state_file', os.path.join(work_dir, 'adaptive_timeouts.json'))
+    config.set('Diagnostics', 'folder', os.path.join(work_dir, 'diagnostics'))
+    config.set('BrowserSettings', 'headless', 'true' if headless else 'false')
+    if low_footprint is not None:
+        config.set('BrowserSettings', 'low_footprint', 'true' if low_footprint else 'false')
+    return config
+
+
+def create_dummy_videos(folder, count, size_bytes):
+    """生成 count 个指定大小的占位视频文件。"""
+    os.makedirs(folder, exist_ok=True)
+    chunk = b'\0' * min(size_bytes, 1024 * 1024)
+    paths = []
+    for i in range(count):
+        path = os.path.join(folder, f"bench_video_{i:04d}.mp4")
+        with open(path, 'wb') as f:
+            remaining = size_bytes
+            while remaining > 0:
+                f.write(chunk[:remaining])
+                remaining -= len(chunk)
+        paths.append(path)
+    return paths
+
+
+def run_benchmark(videos=10, workers=1, video_size_bytes=1024 * 1024, delays=None, popup=False,
+                  headless=True, reuse_driver=False, sample_interval=1.0, low_footprint=None):
+    """运行一次基准测试并返回结果字典。"""
+    work_dir = tempfile.mkdtemp(prefix='upload_bench_')
+    collector = _StepCollector()
+    web_interaction.add_step_listener(collector)
+    try:
+        with MockUploadSite(delays=delays, popup=popup) as site:
+            config = build_benchmark_config(site, work_dir, headless, low_footprint)
+            video_queue = queue.Queue()
+            for path in create_dummy_videos(os.path.join(work_dir, 'videos'), videos, video_size_bytes):
+                video_queue.put(path)
+
+            worker_threads = [
+                _Worker(i, config, site.upload_url, video_queue, reuse_driver, sample_interval)
+                for i in range(workers)
+            ]
+            started = time.perf_counter()
+            for worker in worker_threads:
+                worker.start()
+            for worker in worker_threads:
+                worker.join()
+            wall_time = time.perf_counter() - started
+            published_count = len(site.published)
+    finally:
+        web_interaction.remove_step_listener(collector)
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    results = [r for worker in worker_threads for r in worker.results]
+    succeeded = sum(1 for r in results if r['ok'])
+    return {
+        'videos': videos,
+        'workers': workers,
+        'succeeded': succeeded,
+        'failed': len(results) - succeeded,
+        'published_on_site': published_count,
+        'wall_time_seconds': wall_time,
+        'videos_per_hour': succeeded / wall_time * 3600 if wall_time > 0 else 0.0,
+        'per_video': summarize_latencies([r['elapsed'] for r in results]),
+        'create_driver': summarize_latencies([v for w in worker_threads for v in w.create_latencies]),
+        'login': summarize_latencies([v for w in worker_threads for v in w.login_latencies]),
+        'steps': {step: summarize_latencies(values) for step, values in collector.durations.items()},
+        'step_failures': dict(collector.failures),
+        'worker_memory_mb': {
+            w.name: {
+                'peak': max(w.rss_samples) / (1024 * 1024),
+                'mean': statistics.fmean(w.rss_samples) / (1024 * 1024),
+            } if w.rss_samples else None
+            for w in worker_threads
+        },
+    }
+
+
+def _format_summary(summary):
+    if not summary.get('count'):
+        return "无数据"
+    return (f"n={summary['count']} mean={summary['mean']:.2f}s p50={summary['p50']:.2f}s "
+            f"p95={summary['p95']:.2f}s max={summary['max']:.2f}s")
+
+
+def print_report(report):
+    print(f"视频数: {report['videos']}  worker 数: {report['workers']}")
+    print(f"成功: {report['succeeded']}  失败: {report['failed']}  站点记录发布: {report['published_on_site']}")
+    print(f"总耗时: {report['wall_time_seconds']:.1f}s  吞吐量: {report['videos_per_hour']:.1f} 个视频/小时")
+    print(f"单视频耗时: {_format_summary(report['per_video'])}")
+    print(f"创建浏览器: {_format_summary(report['create_driver'])}")
+    print(f"登录: {_format_summary(report['login'])}")
+    print("各步骤耗时:")
+    for step, summary in report['steps'].items():
+        failures = report['step_failures'].get(step, 0)
+        print(f"  {step:<20} {_format_summary(summary)}  失败={failures}")
+    print("各 worker 浏览器内存:")
+    for name, memory in report['worker_memory_mb'].items():
+        if memory:
+            print(f"  {name}: 峰值 {memory['peak']:.1f} MB, 平均 {memory['mean']:.1f} MB")
+        else:
+            print(f"  {name}: 无数据 (需要安装 psutil)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="使用本地模拟站点对视频上传流程做端到端基准测试。")
+    parser.add_argument('--videos', type=int, default=10, help="上传的视频数量")
+    parser.add_argument('--workers', type=int, default=1, help="并发浏览器数量")
+    parser.add_argument('--video-size-mb', type=float, default=1.0, help="占位视频文件大小 (MB)")
+    parser.add_argument('--delay', action='append', default=[], metavar='STEP=SECONDS',
+                        help=f"覆盖模拟站点的步骤延迟，可重复。可用步骤: {', '.join(DEFAULT_DELAYS)}")
+    parser.add_argument('--popup', action='store_true', help="首次点击发布时弹出确认框")
+    parser.add_argument('--headless', action='store_true', help="以无头模式运行浏览器")
+    parser.add_argument('--reuse-driver', action='store_true', help="同一 worker 复用浏览器实例（默认与生产一致，每个视频新建）")
+    parser.add_argument('--low-footprint', dest='low_footprint', action='store_true', default=None,
+                        help="启用低资源占用浏览器配置 (默认沿用 config.ini 中的设置)")
+    parser.add_argument('--json', dest='json_path', help="将结果以 JSON 写入指定文件，便于对比回归")
+    args = parser.parse_args(argv)
+
+    delays = {}
+    for item in args.delay:
+        step, _, seconds = item.partition('=')
+        if step not in DEFAULT_DELAYS or not seconds:
+            parser.error(f"无效的 --delay 参数: {item}")
+        delays[step] = float(seconds)
+
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    report = run_benchmark(
+        videos=args.videos,
+        workers=args.workers,
+        video_size_bytes=int(args.video_size_mb * 1024 * 1024),
+        delays=delays,
+        popup=args.popup,
+        headless=args.headless,
+        reuse_driver=args.reuse_driver,
+        low_footprint=args.low_footprint,
+    )
+    print_report(report)
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"结果已写入: {args.json_path}")
+
+
+if __name__ == "__main__":
+    main()
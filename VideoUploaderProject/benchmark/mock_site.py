@@ -0,0 +1,244 @@
+import json
+import logging
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+# 与 web_interaction.perform_video_upload 中使用的绝对 XPath 保持一致，
+# 模拟页面会按这些路径生成 DOM，使真实的上传代码无需修改即可驱动它。
+_MAIN_FORM_PREFIX = "/html/body/div[1]/div/div[3]/section/main/div[2]/div/div/div[2]/div/div/div/div[2]/div/div[1]/div/div/div/div[3]/div/div[2]/div[1]/div[2]/div[2]/div[2]"
+ELEMENT_XPATHS = {
+    'cover_area': _MAIN_FORM_PREFIX + "/div[1]/div/div/div",
+    'processing_text': _MAIN_FORM_PREFIX + "/div[2]",
+    'cover_dialog': "/html/body/div[6]",
+    'capture_tab': "/html/body/div[6]/div/div[2]/div/div[1]/ul/li[1]",
+    'next_step': "/html/body/div[6]/div/div[2]/div/div[2]/div",
+    'cover_confirm': "/html/body/div[6]/div/div[2]/div/div[1]/div/div[2]/div[2]/div[3]/div[3]/button[2]",
+    'final_confirm_dialog': "/html/body/div[7]/div[1]",
+    'final_confirm': "/html/body/div[7]/div/div[2]/div/div[2]/button[2]",
+    'popup_dialog': "/html/body/div[7]/div[2]",
+    'popup_confirm': "/html/body/div[7]/div[2]/div/div[2]/div[3]/button[1]/span",
+    'mask': "/html/body/div[8]",
+}
+
+# 各步骤的默认延迟（秒），可在启动时覆盖
+DEFAULT_DELAYS = {
+    'page_load': 0.2,        # 上传触发区域出现前的延迟
+    'cover_area': 1.0,       # 选择文件后封面区域变为可点击
+    'cover_dialog': 0.5,     # 点击封面区域后对话框出现
+    'capture': 1.0,          # 点击“下一步”后确认按钮出现
+    'final_confirm': 0.5,    # 点击确认后最终确认按钮出现
+    'processing': 3.0,       # 选择文件后处理状态文本出现
+    'mask': 2.0,             # 选择文件后遮罩层消失
+    'publish': 0.2,          # 点击发布后服务器记录提交
+}
+
+_XPATH_STEP_RE = re.compile(r'^(\w+)(?:\[(\d+)\])?$')
+
+
+class _Node:
+    def __init__(self, tag):
+        self.tag = tag
+        self.attrs = {}
+        self.text = ''
+        self.children = []
+
+    def render(self):
+        attrs = ''.join(f' {k}="{v}"' for k, v in self.attrs.items())
+        inner = self.text + ''.join(child.render() for child in self.children)
+        return f"<{self.tag}{attrs}>{inner}</{self.tag}>"
+
+
+def _ensure_path(body, xpath):
+    """按绝对 XPath 在 body 下创建（或复用）节点，不足的同名兄弟节点用空节点补齐。"""
+    steps = xpath.strip('/').split('/')
+    if steps[:2] != ['html', 'body']:
+        raise ValueError(f"只支持以 /html/body 开头的绝对 XPath: {xpath}")
+    node = body
+    for step in steps[2:]:
+        match = _XPATH_STEP_RE.match(step)
+        if not match:
+            raise ValueError(f"无法解析的 XPath 片段 '{step}' (来自 {xpath})")
+        tag, index = match.group(1), int(match.group(2) or 1)
+        same_tag = [child for child in node.children if child.tag == tag]
+        while len(same_tag) < index:
+            placeholder = _Node(tag)
+            node.children.append(placeholder)
+            same_tag.append(placeholder)
+        node = same_tag[index - 1]
+    return node
+
+
+def build_upload_page(delays):
+    """生成模拟上传页面的 HTML。"""
+    body = _Node('body')
+    nodes = {name: _ensure_path(body, xpath) for name, xpath in ELEMENT_XPATHS.items()}
+
+    nodes['cover_area'].attrs.update({'id': 'cover-area', 'style': 'display: none; width: 120px; height: 60px;'})
+    nodes['cover_area'].text = '上传封面'
+    nodes['processing_text'].attrs['id'] = 'processing-text'
+    nodes['cover_dialog'].attrs.update({'id': 'cover-dialog', 'style': 'display: none;'})
+    nodes['capture_tab'].attrs['id'] = 'capture-tab'
+    nodes['capture_tab'].text = '截取封面'
+    nodes['next_step'].attrs['id'] = 'next-step'
+    nodes['next_step'].text = '下一步'
+    nodes['cover_confirm'].attrs.update({'id': 'cover-confirm', 'style': 'display: none;'})
+    nodes['cover_confirm'].text = '确认'
+    nodes['final_confirm_dialog'].attrs.update({'id': 'final-confirm-dialog', 'style': 'display: none;'})
+    nodes['final_confirm'].attrs['id'] = 'final-confirm'
+    nodes['final_confirm'].text = '确定'
+    nodes['popup_dialog'].attrs.update({'id': 'popup-dialog', 'style': 'display: none;'})
+    nodes['popup_confirm'].attrs['id'] = 'popup-confirm'
+    nodes['popup_confirm'].text = '确定'  # 不能包含“发布”，否则会被发布按钮的 XPath 匹配
+    nodes['mask'].attrs.update({'class': 'mask ', 'id': 'mask', 'style': 'display: none; height: 1px;'})
+
+    # 以下元素不参与绝对 XPath 定位，放在 body 的 div 之后以免影响下标
+    trigger_area = _Node('section')
+    trigger_area.attrs.update({'class': 'byte-upload-trigger-area', 'id': 'trigger-area', 'style': 'display: none;'})
+    trigger_area.text = '点击上传视频'
+    file_input = _Node('input')
+    file_input.attrs.update({'type': 'file', 'id': 'video-input', 'accept': 'video/*', 'style': 'display: none'})
+    publish_button = _Node('button')
+    publish_button.attrs.update({'id': 'publish', 'disabled': 'disabled'})
+    publish_button.text = '发布'
+    body.children.extend([trigger_area, file_input, publish_button])
+
+    script = _Node('script')
+    script.text = _PAGE_SCRIPT.replace('__DELAYS__', json.dumps(delays))
+    body.children.append(script)
+    return "<!DOCTYPE html><html><head><meta charset='utf-8'><title>Mock Upload</title></head>" + body.render() + "</html>"
+
+
+_PAGE_SCRIPT = """
+(function () {
+  var delays = __DELAYS__;
+  var popupPending = delays.popup ? true : false;
+  function $(id) { return document.getElementById(id); }
+  function later(key, fn) { setTimeout(fn, (delays[key] || 0) * 1000); }
+  function show(id) { $(id).style.display = 'block'; }
+  function hide(id) { $(id).style.display = 'none'; }
+
+  later('page_load', function () { show('trigger-area'); });
+
+  $('video-input').addEventListener('change', function () {
+    var name = this.files.length ? this.files[0].name : '';
+    show('mask');
+    later('cover_area', function () { show('cover-area'); });
+    later('processing', function () { $('processing-text').textContent = '上传成功 ' + name; });
+    later('mask', function () { hide('mask'); $('publish').removeAttribute('disabled'); });
+  });
+  $('cover-area').addEventListener('click', function () {
+    later('cover_dialog', function () { show('cover-dialog'); });
+  });
+  $('next-step').addEventListener('click', function () {
+    later('capture', function () { show('cover-confirm'); });
+  });
+  $('cover-confirm').addEventListener('click', function () {
+    hide('cover-dialog');
+    later('final_confirm', function () { show('final-confirm-dialog'); });
+  });
+  $('final-confirm').addEventListener('click', function () { hide('final-confirm-dialog'); });
+  $('popup-confirm').addEventListener('click', function () { hide('popup-dialog'); });
+  $('publish').addEventListener('click', function () {
+    if (popupPending) { popupPending = false; show('popup-dialog'); return; }
+    var input = $('video-input');
+    var name = input.files.length ? input.files[0].name : '';
+    later('publish', function () {
+      fetch('/api/publish', {method: 'POST', body: JSON.stringify({file: name})});
+    });
+  });
+})();
+"""
+
+
+class MockUploadSite:
+    """
+    在本地线程中运行的模拟上传站点。
+
+    提供 /（cookie 域首页）、/upload（上传页）以及 /api/publish（记录发布请求），
+    各步骤延迟通过 delays 配置，popup=True 时首次点击发布会弹出确认框。
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, delays=None, popup=False):
+        self.delays = dict(DEFAULT_DELAYS)
+        if delays:
+            self.delays.update(delays)
+        self.delays['popup'] = bool(popup)
+        self.published = []
+        self._published_lock = threading.Lock()
+        self._page = build_upload_page(self.delays).encode('utf-8')
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def upload_url(self):
+        return f"{self.base_url}/upload"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name='mock-upload-site', daemon=True)
+        self._thread.start()
+        logger.info(f"模拟上传站点已启动: {self.base_url}")
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread:
+            self._thread.join(timeout=5)
+        logger.info("模拟上传站点已停止。")
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def _record_publish(self, payload):
+        with self._published_lock:
+            self.published.append({'file': payload.get('file'), 'time': time.time()})
+
+    def _make_handler(self):
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                path = urlparse(self.path).path
+                if path == '/upload':
+                    self._send(200, site._page, 'text/html; charset=utf-8')
+                elif path == '/':
+                    self._send(200, b"<!DOCTYPE html><html><body>mock</body></html>", 'text/html; charset=utf-8')
+                else:
+                    self._send(404, b"not found", 'text/plain')
+
+            def do_POST(self):
+                if urlparse(self.path).path != '/api/publish':
+                    self._send(404, b"not found", 'text/plain')
+                    return
+                length = int(self.headers.get('Content-Length') or 0)
+                try:
+                    payload = json.loads(self.rfile.read(length) or b'{}')
+                except ValueError:
+                    payload = {}
+                site._record_publish(payload)
+                self._send(200, b'{"ok": true}', 'application/json')
+
+            def _send(self, status, body, content_type):
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                logger.debug("mock-site: " + format % args)
+
+        return Handler
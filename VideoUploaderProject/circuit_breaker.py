@@ -0,0 +1,177 @@
+import os
+import json
+import time
+import logging
+import threading
+from collections import deque, Counter
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STATE_FILE_NAME = "circuit_breaker.json"
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitBreaker:
+    """
+    平台出现系统性故障（页面改版、账号被限流等）时暂停派发上传的熔断器。
+
+    作为 web_interaction 的步骤监听器记录每个视频失败在哪一步，record_result() 记录每个视频的结果。
+    同一步骤连续失败 consecutive_failures 次，或最近 window 个视频的失败率达到 failure_rate 时熔断 (open)，
+    allow() 返回 False，剩余视频留在队列中。冷却 cooldown 秒后进入半开 (half_open)，只放行一个探测上传：
+    成功则恢复 (closed)，失败则再次熔断并把冷却时间加倍 (不超过 max_cooldown)。
+    状态保存在 state_file 中，重启后仍然有效。
+    """
+
+    def __init__(self, consecutive_failures=3, window=10, failure_rate=0.7, min_window=5,
+                 cooldown=1800.0, max_cooldown=6 * 3600.0, state_file=None):
+        self.consecutive_failures = consecutive_failures
+        self.window = window
+        self.failure_rate = failure_rate
+        self.min_window = min_window
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.state_file = state_file
+        self._lock = threading.Lock()
+        self.state = CLOSED
+        self.cooldown = cooldown
+        self.retry_at = None # 熔断后允许探测的时间
+        self.reason = None
+        self._probe_in_flight = False
+        self._failed_steps = {} # 视频 -> 最近失败的步骤
+        self._consecutive = Counter() # 步骤 -> 连续失败次数
+        self._recent = deque(maxlen=window) # 最近视频的失败步骤，成功为 None
+        self._load()
+
+    @classmethod
+    def from_config(cls, config):
+        """根据 [CircuitBreaker] 构建熔断器；未启用时返回 None。相对路径相对于项目根目录。"""
+        if not config.getboolean('CircuitBreaker', 'enabled', fallback=False):
+            return None
+        state_file = config.get('CircuitBreaker', 'state_file', fallback=os.path.join('logs', DEFAULT_STATE_FILE_NAME)).strip()
+        if state_file and not os.path.isabs(state_file):
+            state_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), state_file)
+        return cls(
+            consecutive_failures=config.getint('CircuitBreaker', 'consecutive_failures', fallback=3),
+            window=config.getint('CircuitBreaker', 'window', fallback=10),
+            failure_rate=config.getfloat('CircuitBreaker', 'failure_rate', fallback=0.7),
+            min_window=config.getint('CircuitBreaker', 'min_window', fallback=5),
+            cooldown=config.getfloat('CircuitBreaker', 'cooldown_minutes', fallback=30) * 60,
+            max_cooldown=config.getfloat('CircuitBreaker', 'max_cooldown_minutes', fallback=360) * 60,
+            state_file=state_file or None,
+        )
+
+    # --- 事件 ---
+
+    def __call__(self, event):
+        """
+        步骤监听器：记录视频失败的步骤。启用暂存时事件中是暂存副本的路径，与 record_result() 的源路径不同，
+        两边都按文件名（暂存副本保留源文件名）对应。
+        """
+        if event['status'] == 'failed':
+            with self._lock:
+                self._failed_steps[os.path.basename(event['video'])] = event['step']
+
+    def record_result(self, video_path, upload_successful, failed_step=None):
+        """记录一个视频的处理结果。没有失败步骤事件的失败（如浏览器无法启动）记为 failed_step 或 'unknown'。"""
+        with self._lock:
+            step = self._failed_steps.pop(os.path.basename(video_path), None)
+            if upload_successful:
+                self._recent.append(None)
+                self._consecutive.clear()
+                if self.state != CLOSED:
+                    logger.info("探测上传成功，熔断器恢复，继续派发上传。")
+                self._close()
+            else:
+                step = step or failed_step or 'unknown'
+                self._recent.append(step)
+                self._consecutive[step] += 1
+                if self.state == HALF_OPEN:
+                    self.cooldown = min(self.cooldown * 2, self.max_cooldown)
+                    self._open(f"探测上传仍失败于步骤 {step}")
+                elif self.state == CLOSED:
+                    self._check_thresholds(step)
+            self._probe_in_flight = False
+
+    def _check_thresholds(self, step):
+        if self._consecutive[step] >= self.consecutive_failures:
+            self._open(f"步骤 {step} 连续失败 {self._consecutive[step]} 次")
+            return
+        failures = [s for s in self._recent if s is not None]
+        if len(self._recent) >= self.min_window and len(failures) / len(self._recent) >= self.failure_rate:
+            top_step, count = Counter(failures).most_common(1)[0]
+            self._open(f"最近 {len(self._recent)} 个视频失败 {len(failures)} 个 (最多的失败步骤: {top_step} × {count})")
+
+    # --- 状态切换（调用方持有锁） ---
+
+    def _open(self, reason):
+        self.state = OPEN
+        self.reason = reason
+        self.retry_at = time.time() + self.cooldown
+        logger.error(f"熔断器打开: {reason}。暂停派发上传 {self.cooldown / 60:.0f} 分钟后再进行探测上传。")
+        self._save()
+
+    def _close(self):
+        changed = self.state != CLOSED
+        self.state = CLOSED
+        self.reason = None
+        self.retry_at = None
+        self.cooldown = self.base_cooldown
+        if changed:
+            self._save()
+
+    # --- 派发控制 ---
+
+    def allow(self):
+        """是否可以开始下一个视频。熔断冷却结束后只放行一个探测上传。"""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and time.time() >= self.retry_at:
+                self.state = HALF_OPEN
+                logger.info("熔断冷却结束，进行一次探测上传。")
+            if self.state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            logger.warning(f"熔断器处于 {self.state} 状态 ({self.reason})，暂停派发，"
+                           f"{max(0, self.retry_at - time.time()) / 60:.0f} 分钟后探测。")
+            return False
+
+    def snapshot(self):
+        with self._lock:
+            return {'state': self.state, 'reason': self.reason, 'retry_at': self.retry_at,
+                    'cooldown_seconds': self.cooldown,
+                    'recent_failures': sum(1 for s in self._recent if s is not None), 'recent_total': len(self._recent)}
+
+    # --- 持久化 ---
+
+    def _load(self):
+        if not self.state_file or not os.path.exists(self.state_file):
+            return
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"熔断器状态文件 {self.state_file} 无法读取，忽略: {e}")
+            return
+        if state.get('state') in (OPEN, HALF_OPEN):
+            # 重启前处于半开状态时，探测结果未知，按熔断处理并立即允许探测
+            self.state = OPEN
+            self.reason = state.get('reason')
+            self.retry_at = state.get('retry_at') or time.time()
+            self.cooldown = state.get('cooldown', self.base_cooldown)
+            logger.warning(f"熔断器在上次运行中处于打开状态 ({self.reason})，将在冷却结束后探测。")
+
+    def _save(self):
+        if not self.state_file:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.state_file) or '.', exist_ok=True)
+            temp_path = f"{self.state_file}.{os.getpid()}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump({'state': self.state, 'reason': self.reason, 'retry_at': self.retry_at,
+                           'cooldown': self.cooldown}, f, ensure_ascii=False)
+            os.replace(temp_path, self.state_file)
+        except OSError as e:
+            logger.warning(f"保存熔断器状态失败: {e}")
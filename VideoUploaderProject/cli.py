@@ -0,0 +1,216 @@
+"""
+命令行入口:
+
+    python cli.py scan [--limit N] [--json]      列出待上传的视频
+    python cli.py status [--json]                 追踪文件、队列、多节点协调和运行中进程的状态
+    python cli.py rename FOLDER NAME START [...]   批量重命名视频文件
+    python cli.py logs [--days N] [--json]        增量索引历史日志，汇总每日上传量、失败步骤和耗时百分位
+    python cli.py upload                          启动定时上传 (等同于 python main.py)
+    python cli.py benchmark [...]                 本地模拟站点基准测试 (参数见 benchmark/bench_upload.py)
+    python cli.py simulate [...]                  模拟运行 (参数见 simulation.py)
+
+各子命令只在执行时导入所需模块：scan/status 不会导入 selenium/requests，也不会创建日志文件。
+"""
+import os
+import sys
+import json
+import argparse
+
+SCRIPT_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+
+
+def _load_config():
+    import main
+    return main.load_config(SCRIPT_DIRECTORY)
+
+
+def _print(payload, as_json):
+    if as_json:
+        print(json.dumps(payload, ensure_ascii=False, indent=2))
+        return
+    for key, value in payload.items():
+        if isinstance(value, list):
+            print(f"{key}:")
+            for item in value:
+                print(f"  {item}")
+        else:
+            print(f"{key}: {value}")
+
+
+def cmd_scan(args):
+    import main
+    import video_index
+    config = _load_config()
+    video_paths = main.get_videos_from_folder(
+        config.get('General', 'video_source_folder'),
+        main.get_tracker_file_path(config, SCRIPT_DIRECTORY),
+        config.getint('General', 'start_video_number_initial', fallback=111),
+        video_index.load_index_settings(config),
+    )
+    shown = video_paths if args.limit <= 0 else video_paths[:args.limit]
+    _print({'pending': len(video_paths), 'videos': [os.path.basename(path) for path in shown]}, args.json)
+    return 0
+
+
+def _count_lines(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return sum(1 for line in f if line.strip())
+    except FileNotFoundError:
+        return 0
+
+
+def _fetch_control_status(config):
+    """控制接口启用时读取运行中进程的状态，不可达时返回 None。"""
+    if not config.getboolean('ControlAPI', 'enabled', fallback=False):
+        return None
+    from urllib.request import urlopen
+    from urllib.error import URLError
+    host = config.get('ControlAPI', 'host', fallback='127.0.0.1').strip() or '127.0.0.1'
+    if host == '0.0.0.0':
+        host = '127.0.0.1'
+    url = f"http://{host}:{config.getint('ControlAPI', 'port', fallback=8765)}/status"
+    try:
+        with urlopen(url, timeout=0.5) as response:
+            return json.load(response)
+    except (URLError, OSError, ValueError):
+        return None
+
+
+def cmd_status(args):
+    import main
+    import upload_queue
+    config = _load_config()
+    status = {'uploaded': _count_lines(main.get_tracker_file_path(config, SCRIPT_DIRECTORY))}
+
+    # 读取上一次保存的队列状态，不重新扫描文件夹
+    video_queue = upload_queue.UploadQueue.from_config(config)
+    status['queue_policy'] = video_queue.policy
+    status['queued'] = len(video_queue)
+    status['next'] = [os.path.basename(path) for path in video_queue.peek(args.limit)]
+
+    if config.getboolean('Coordination', 'enabled', fallback=False):
+        import coordination
+        status['coordination'] = coordination.LeaseCoordinator.from_config(config).status()
+
+    running = _fetch_control_status(config)
+    if running:
+        status['running'] = {key: running.get(key) for key in
+                             ('mode', 'phase', 'next_run_in_seconds', 'uploads_last_hour', 'failure_rate_last_hour')}
+    elif config.getboolean('ControlAPI', 'enabled', fallback=False):
+        status['running'] = '控制接口无响应 (上传进程可能未运行)'
+    _print(status, args.json)
+    return 0
+
+
+def cmd_rename(args):
+    # rename_videos.py 位于仓库根目录
+    sys.path.insert(0, os.path.dirname(SCRIPT_DIRECTORY))
+    import rename_videos
+    if args.undo:
+        rename_videos.undo_renames(args.undo)
+        return 0
+    if not (args.folder and args.base_name and args.start is not None):
+        print("rename 需要 FOLDER BASE_NAME START 参数，或使用 --undo JOURNAL", file=sys.stderr)
+        return 2
+    rename_videos.batch_rename_videos(args.folder, args.base_name, args.start, args.extension,
+                                      order=args.order, dry_run=args.dry_run, verbose=args.verbose)
+    return 0
+
+
+def cmd_logs(args):
+    import time
+    import log_indexer
+    config = _load_config()
+    index = log_indexer.LogIndex(log_indexer.get_database_path(config))
+    try:
+        added = index.index_directory(args.log_dir or log_indexer.LOG_DIR)
+        summary = index.summary(since=time.time() - args.days * 86400 if args.days > 0 else None)
+    finally:
+        index.close()
+    if args.json:
+        print(json.dumps(dict(summary, newly_indexed=added), ensure_ascii=False, indent=2))
+        return 0
+    print(f"新索引的视频处理记录: {added}")
+    print("每日上传:")
+    for day in summary['throughput_per_day']:
+        print(f"  {day['day']}  处理 {day['attempts']:>4}  成功 {day['succeeded']:>4}  失败 {day['failed']:>4}  "
+              f"成功率 {day['success_rate']}")
+    print("失败步骤:")
+    for step, count in summary['failures_by_step'].items():
+        print(f"  {step:<20} {count}")
+    print("耗时百分位 (秒):")
+    for name, stats in summary['latency_seconds'].items():
+        print(f"  {name:<20} " + "  ".join(f"{key}={value}" for key, value in stats.items()))
+    return 0
+
+
+def cmd_upload(args):
+    import main
+    main.main()
+    return 0
+
+
+def cmd_benchmark(args):
+    from benchmark import bench_upload
+    return bench_upload.main(args.args) or 0
+
+
+def cmd_simulate(args):
+    import simulation
+    return simulation.main(args.args) or 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='cli.py', description="视频自动上传工具")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    scan = subparsers.add_parser('scan', help="列出待上传的视频")
+    scan.add_argument('--limit', type=int, default=20, help="最多列出的视频数量，0 表示全部")
+    scan.add_argument('--json', action='store_true', help="以 JSON 输出")
+    scan.set_defaults(func=cmd_scan)
+
+    status = subparsers.add_parser('status', help="显示上传进度和队列状态")
+    status.add_argument('--limit', type=int, default=5, help="列出队列最前面的视频数量")
+    status.add_argument('--json', action='store_true', help="以 JSON 输出")
+    status.set_defaults(func=cmd_status)
+
+    rename = subparsers.add_parser('rename', help="批量重命名视频文件")
+    rename.add_argument('folder', nargs='?')
+    rename.add_argument('base_name', nargs='?')
+    rename.add_argument('start', nargs='?', type=int)
+    rename.add_argument('--extension', default='.mp4')
+    rename.add_argument('--order', choices=('mtime', 'name', 'content_date'), default='mtime')
+    rename.add_argument('--dry-run', action='store_true', help="只打印计划，不实际改名")
+    rename.add_argument('--verbose', action='store_true')
+    rename.add_argument('--undo', metavar='JOURNAL', help="根据撤销日志恢复文件名")
+    rename.set_defaults(func=cmd_rename)
+
+    logs = subparsers.add_parser('logs', help="增量索引历史日志并汇总上传记录")
+    logs.add_argument('--days', type=float, default=0, help="只汇总最近 N 天，0 表示全部")
+    logs.add_argument('--log-dir', help="日志目录，默认为 logs")
+    logs.add_argument('--json', action='store_true', help="以 JSON 输出")
+    logs.set_defaults(func=cmd_logs)
+
+    upload = subparsers.add_parser('upload', help="启动定时上传")
+    upload.set_defaults(func=cmd_upload)
+
+    # 其余参数原样交给对应脚本解析
+    for name, func, help_text in (('benchmark', cmd_benchmark, "本地模拟站点基准测试"),
+                                  ('simulate', cmd_simulate, "用模拟后端和虚拟时钟运行完整流程")):
+        subparsers.add_parser(name, help=help_text, add_help=False).set_defaults(func=func, passthrough=True)
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args, extra = parser.parse_known_args(argv)
+    if getattr(args, 'passthrough', False):
+        args.args = extra
+    elif extra:
+        parser.error(f"无法识别的参数: {' '.join(extra)}")
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
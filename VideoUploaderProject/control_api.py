@@ -0,0 +1,266 @@
+import os
+import json
+import time
+import logging
+import threading
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+logger = logging.getLogger(__name__)
+
+RUNNING = 'running'
+PAUSED = 'paused'
+DRAINING = 'draining'
+DRAINED = 'drained'
+
+# 统计吞吐量和失败率的时间窗口 (秒)
+_HISTORY_SECONDS = 24 * 60 * 60
+
+
+class ControlState:
+    """
+    上传进程的运行状态与控制开关，由主循环、上传线程和 HTTP 服务线程共享。
+
+    作为 web_interaction 的步骤监听器记录每个上传线程当前所处的步骤；record_upload() 记录每个视频的结果，
+    用于计算每小时上传数和失败率。pause/resume/drain 只设置标志，由主循环在视频之间的检查点 checkpoint()
+    和等待下一轮时的 sleep() 中响应，HTTP 请求不会阻塞上传流程。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self.mode = RUNNING
+        self.started_at = time.time()
+        self.phase = 'starting' # starting / uploading / waiting
+        self.next_run_at = None
+        self._workers = {} # 线程名 -> 当前步骤信息
+        self._results = deque() # (完成时间, 是否成功)
+        self.total_succeeded = 0
+        self.total_failed = 0
+
+    # --- 上传线程调用 ---
+
+    def __call__(self, event):
+        """步骤监听器：记录各上传线程当前的视频和步骤。"""
+        with self._lock:
+            self._workers[event['thread']] = {
+                'video': os.path.basename(event['video']),
+                'step': event['step'],
+                'status': event['status'],
+                'since': time.time(),
+            }
+
+    def record_upload(self, video_path, upload_successful):
+        now = time.time()
+        with self._lock:
+            self._results.append((now, upload_successful))
+            if upload_successful:
+                self.total_succeeded += 1
+            else:
+                self.total_failed += 1
+            while self._results and self._results[0][0] < now - _HISTORY_SECONDS:
+                self._results.popleft()
+            for worker in self._workers.values():
+                if worker['video'] == os.path.basename(video_path):
+                    worker['status'] = 'finished'
+
+    # --- 主循环调用 ---
+
+    def set_phase(self, phase, next_run_at=None):
+        with self._lock:
+            self.phase = phase
+            self.next_run_at = next_run_at
+
+    def checkpoint(self):
+        """在开始处理下一个视频之前调用：暂停时阻塞等待恢复；返回 False 表示正在排空，不应再开始新的视频。"""
+        with self._changed:
+            if self.mode == PAUSED:
+                logger.info("上传已暂停，等待恢复...")
+                self._changed.wait_for(lambda: self.mode != PAUSED)
+                logger.info(f"上传已{'恢复' if self.mode == RUNNING else '转为排空'}。")
+            return self.mode == RUNNING
+
+    def sleep(self, seconds):
+        """等待下一轮期间使用：最多等待 seconds 秒，控制状态变化时提前返回。"""
+        with self._changed:
+            mode = self.mode
+            self._changed.wait_for(lambda: self.mode != mode, timeout=seconds)
+
+    @property
+    def draining(self):
+        return self.mode in (DRAINING, DRAINED)
+
+    def mark_drained(self):
+        with self._changed:
+            self.mode = DRAINED
+            self._changed.notify_all()
+
+    # --- HTTP 服务调用 ---
+
+    def set_mode(self, mode):
+        """切换 running/paused/draining，返回 (是否成功, 当前模式)。排空开始后不能再恢复。"""
+        with self._changed:
+            if self.draining and mode != self.mode:
+                return False, self.mode
+            if self.mode != mode:
+                logger.info(f"控制接口: 运行模式 {self.mode} -> {mode}")
+                self.mode = mode
+                self._changed.notify_all()
+            return True, self.mode
+
+    def snapshot(self):
+        now = time.time()
+        with self._lock:
+            last_hour = [ok for finished_at, ok in self._results if finished_at >= now - 3600]
+            window = [ok for _, ok in self._results]
+            return {
+                'mode': self.mode,
+                'phase': self.phase,
+                'uptime_seconds': round(now - self.started_at, 1),
+                'next_run_at': self.next_run_at,
+                'next_run_in_seconds': round(self.next_run_at - now, 1) if self.next_run_at else None,
+                'workers': {name: dict(worker, seconds=round(now - worker['since'], 1))
+                            for name, worker in self._workers.items()},
+                'uploads_last_hour': sum(last_hour),
+                'failure_rate_last_hour': round(last_hour.count(False) / len(last_hour), 3) if last_hour else None,
+                'failure_rate_24h': round(window.count(False) / len(window), 3) if window else None,
+                'total_succeeded': self.total_succeeded,
+                'total_failed': self.total_failed,
+            }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = 'VideoUploaderControl/1.0'
+
+    def log_message(self, format, *args):
+        logger.debug(f"控制接口 {self.address_string()} - {format % args}")
+
+    def _reply(self, code, payload):
+        body = json.dumps(payload, ensure_ascii=False, indent=2).encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        path = urlparse(self.path).path.rstrip('/') or '/status'
+        if path == '/status':
+            self._reply(200, self.server.api.status())
+        else:
+            self._reply(404, {'error': f'未知路径 {path}'})
+
+    def do_POST(self):
+        api = self.server.api
+        if api.token and self.headers.get('X-Control-Token') != api.token:
+            self._reply(403, {'error': '缺少或错误的 X-Control-Token'})
+            return
+        parsed = urlparse(self.path)
+        path = parsed.path.rstrip('/')
+        params = {key: values[-1] for key, values in parse_qs(parsed.query).items()}
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            try:
+                body = json.loads(self.rfile.read(length).decode('utf-8'))
+            except ValueError:
+                body = None
+            if not isinstance(body, dict):
+                self._reply(400, {'error': '请求体应为 JSON 对象'})
+                return
+            params.update(body)
+
+        if path in ('/pause', '/resume', '/drain'):
+            mode = {'/pause': PAUSED, '/resume': RUNNING, '/drain': DRAINING}[path]
+            ok, current = api.state.set_mode(mode)
+            self._reply(200 if ok else 409, {'ok': ok, 'mode': current})
+        elif path == '/prioritize':
+            video = params.get('video')
+            if not video:
+                self._reply(400, {'error': '需要参数 video（文件名或完整路径）'})
+                return
+            pinned = api.prioritize(video)
+            self._reply(200 if pinned else 404, {'ok': bool(pinned), 'video': pinned or video})
+        else:
+            self._reply(404, {'error': f'未知路径 {path}'})
+
+
+class ControlAPI:
+    """
+    本地 HTTP 状态/控制接口，在后台守护线程中运行。
+
+      GET  /status                       队列、上传线程、吞吐量、失败率和下一轮时间
+      POST /pause | /resume | /drain     暂停 / 恢复 / 处理完当前视频后停止
+      POST /prioritize?video=<文件名>     将队列中的视频置顶
+
+    配置了 token 时，POST 请求需要带上 X-Control-Token 头。
+    """
+
+    def __init__(self, runtime, state, host='127.0.0.1', port=8765, token=None):
+        self.runtime = runtime
+        self.state = state
+        self.token = token
+        self._server = ThreadingHTTPServer((host, port), _Handler)
+        self._server.daemon_threads = True
+        self._server.api = self
+        self._thread = None
+
+    @classmethod
+    def from_config(cls, config, runtime, state):
+        """根据 [ControlAPI] 构建接口；未启用时返回 None。"""
+        if not config.getboolean('ControlAPI', 'enabled', fallback=False):
+            return None
+        return cls(
+            runtime, state,
+            host=config.get('ControlAPI', 'host', fallback='127.0.0.1').strip() or '127.0.0.1',
+            port=config.getint('ControlAPI', 'port', fallback=8765),
+            token=config.get('ControlAPI', 'token', fallback='').strip() or None,
+        )
+
+    @property
+    def address(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def status(self):
+        video_queue = self.runtime['video_queue']
+        status = self.state.snapshot()
+        status['queue'] = {
+            'depth': len(video_queue),
+            'policy': video_queue.policy,
+            'next': [os.path.basename(path) for path in video_queue.peek(10)],
+        }
+        status['schedule'] = {
+            'upload_interval_hours': self.runtime['upload_interval_hours'],
+            'videos_per_batch': self.runtime['videos_per_batch'],
+        }
+        breaker = self.runtime.get('breaker')
+        if breaker:
+            status['circuit_breaker'] = breaker.snapshot()
+        coordinator = self.runtime.get('coordinator')
+        if coordinator:
+            status['coordination'] = dict(coordinator.status(), node=coordinator.node_id)
+        return status
+
+    def prioritize(self, video):
+        """置顶视频，返回置顶的完整路径；视频不在队列中时返回 None。"""
+        video_queue = self.runtime['video_queue']
+        path = video if os.path.isabs(video) else os.path.join(self.runtime['video_source_folder'], video)
+        if video_queue.pin(path):
+            logger.info(f"控制接口: 已置顶视频 {path}")
+            return path
+        return None
+
+    def start(self):
+        from web import web_interaction
+        web_interaction.add_step_listener(self.state)
+        self._thread = threading.Thread(target=self._server.serve_forever, name='control-api', daemon=True)
+        self._thread.start()
+        logger.info(f"控制接口已启动: {self.address}/status")
+        return self
+
+    def stop(self):
+        from web import web_interaction
+        web_interaction.remove_step_listener(self.state)
+        self._server.shutdown()
+        self._server.server_close()
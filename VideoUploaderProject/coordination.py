@@ -0,0 +1,180 @@
+import os
+import time
+import socket
+import sqlite3
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DATABASE_NAME = "coordination.db"
+LEASED = 'leased'
+DONE = 'done'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS leases (
+    video TEXT PRIMARY KEY,
+    node TEXT NOT NULL,
+    state TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 1,
+    result TEXT,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS leases_node_state ON leases (node, state);
+"""
+
+
+class LeaseCoordinator:
+    """
+    多台主机共用一个视频源文件夹时，通过共享 SQLite 数据库中的租约分配视频。
+
+    节点 claim() 视频后获得一段时间的租约，后台心跳线程定期续约；处理结束后 complete() 将视频标记为
+    done，done 的视频不会再被任何节点领取。节点崩溃后心跳停止，租约到期后其他节点会自动重新领取。
+    视频以相对于源文件夹的路径为键，各主机挂载共享目录的路径可以不同。
+
+    数据库放在网络共享上时不使用 WAL（网络文件系统上不可靠），所有写操作都是短事务 (BEGIN IMMEDIATE)。
+    """
+
+    def __init__(self, db_path, node_id=None, lease_seconds=600, heartbeat_seconds=60, busy_timeout=30):
+        self.db_path = db_path
+        self.node_id = node_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.lease_seconds = lease_seconds
+        self.heartbeat_seconds = heartbeat_seconds
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        self._stop = threading.Event()
+        self._heartbeat_thread = None
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._connection().executescript(_SCHEMA)
+
+    @classmethod
+    def from_config(cls, config):
+        """根据 [Coordination] 构建协调器；未启用时返回 None。相对路径相对于项目根目录。"""
+        if not config.getboolean('Coordination', 'enabled', fallback=False):
+            return None
+        db_path = config.get('Coordination', 'database', fallback=DEFAULT_DATABASE_NAME)
+        if not os.path.isabs(db_path):
+            db_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), db_path)
+        return cls(
+            db_path,
+            node_id=config.get('Coordination', 'node_id', fallback='').strip() or None,
+            lease_seconds=config.getfloat('Coordination', 'lease_minutes', fallback=10) * 60,
+            heartbeat_seconds=config.getfloat('Coordination', 'heartbeat_seconds', fallback=60),
+        )
+
+    # --- 数据库连接 ---
+
+    def _connection(self):
+        # sqlite3 连接不能跨线程共享，心跳线程与上传线程各用一个连接
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=self.busy_timeout, isolation_level=None)
+            self._local.conn = conn
+        return conn
+
+    def _transaction(self):
+        return _ImmediateTransaction(self._connection())
+
+    # --- 租约操作 ---
+
+    def claim(self, videos, limit=None):
+        """
+        按给定顺序尝试领取视频，返回成功领取的列表（最多 limit 个）。
+        未被领取、租约已过期的视频可以领取；已完成或被其他节点持有的视频会被跳过。
+        """
+        claimed = []
+        now = time.time()
+        expires_at = now + self.lease_seconds
+        with self._transaction() as conn:
+            for video in videos:
+                if limit is not None and len(claimed) >= limit:
+                    break
+                row = conn.execute("SELECT node, state, expires_at FROM leases WHERE video = ?", (video,)).fetchone()
+                if row is None:
+                    conn.execute("INSERT INTO leases (video, node, state, expires_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+                                 (video, self.node_id, LEASED, expires_at, now))
+                elif row[1] == LEASED and (row[0] == self.node_id or row[2] < now):
+                    if row[0] != self.node_id:
+                        logger.warning(f"节点 {row[0]} 对视频 {video} 的租约已过期，由本节点 {self.node_id} 重新领取。")
+                    conn.execute("UPDATE leases SET node = ?, expires_at = ?, attempts = attempts + 1, updated_at = ? "
+                                 "WHERE video = ?", (self.node_id, expires_at, now, video))
+                else:
+                    continue
+                claimed.append(video)
+        return claimed
+
+    def heartbeat(self):
+        """为本节点持有的所有租约续期，返回续期的数量。"""
+        now = time.time()
+        with self._transaction() as conn:
+            cursor = conn.execute("UPDATE leases SET expires_at = ?, updated_at = ? WHERE node = ? AND state = ?",
+                                  (now + self.lease_seconds, now, self.node_id, LEASED))
+            return cursor.rowcount
+
+    def complete(self, video, result=None):
+        """标记视频已处理完成（无论成功与否），之后不会再被任何节点领取。"""
+        now = time.time()
+        with self._transaction() as conn:
+            cursor = conn.execute("UPDATE leases SET state = ?, result = ?, updated_at = ? WHERE video = ? AND node = ? AND state = ?",
+                                  (DONE, result, now, video, self.node_id, LEASED))
+            if cursor.rowcount == 0:
+                logger.error(f"完成视频 {video} 时发现租约已不属于本节点 {self.node_id}（可能因心跳中断而过期），其他节点可能重复处理。")
+                conn.execute("INSERT OR REPLACE INTO leases (video, node, state, expires_at, result, updated_at) "
+                             "VALUES (?, ?, ?, ?, ?, ?)", (video, self.node_id, DONE, now, result, now))
+
+    def release(self, videos):
+        """放弃尚未处理的租约，让其他节点立即可以领取。"""
+        with self._transaction() as conn:
+            conn.executemany("DELETE FROM leases WHERE video = ? AND node = ? AND state = ?",
+                             [(video, self.node_id, LEASED) for video in videos])
+
+    def done_videos(self):
+        """返回所有节点已完成的视频集合，用于在扫描时提前排除。"""
+        return {row[0] for row in self._connection().execute("SELECT video FROM leases WHERE state = ?", (DONE,))}
+
+    def status(self):
+        """返回 {'leased', 'done', 'expired', 'nodes'} 统计。"""
+        now = time.time()
+        conn = self._connection()
+        leased, expired = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(expires_at < ?), 0) FROM leases WHERE state = ?", (now, LEASED)).fetchone()
+        done = conn.execute("SELECT COUNT(*) FROM leases WHERE state = ?", (DONE,)).fetchone()[0]
+        nodes = dict(conn.execute("SELECT node, COUNT(*) FROM leases WHERE state = ? GROUP BY node", (LEASED,)).fetchall())
+        return {'leased': leased, 'done': done, 'expired': expired, 'nodes': nodes}
+
+    # --- 心跳线程 ---
+
+    def _heartbeat_loop(self):
+        while not self._stop.wait(self.heartbeat_seconds):
+            try:
+                self.heartbeat()
+            except sqlite3.Error as e:
+                logger.warning(f"租约续期失败，将在 {self.heartbeat_seconds} 秒后重试: {e}")
+
+    def start(self):
+        if self._heartbeat_thread is None:
+            self._heartbeat_thread = threading.Thread(target=self._heartbeat_loop, name='lease-heartbeat', daemon=True)
+            self._heartbeat_thread.start()
+            logger.info(f"多节点协调已启用，本节点: {self.node_id}，数据库: {self.db_path}")
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._heartbeat_thread:
+            self._heartbeat_thread.join(timeout=5)
+
+
+class _ImmediateTransaction:
+    """BEGIN IMMEDIATE ... COMMIT/ROLLBACK，在事务开始时即获取写锁，避免读后写的竞争。"""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute("COMMIT" if exc_type is None else "ROLLBACK")
+        return False
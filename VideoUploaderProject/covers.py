@@ -0,0 +1,99 @@
+import os
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+from web import video_utils
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_COVER_FOLDER_NAME = "temp_covers"
+
+
+class CoverPrefetcher:
+    """
+    在后台预先提取封面图片 ([VideoSettings] cover_mode = upload 时使用)。
+
+    prefetch() 按上传顺序把视频交给后台线程用 video_utils.extract_cover_image 提取封面，
+    与上一个视频的上传重叠进行；get() 在上传前取得封面路径，最多等待 wait_seconds 秒，
+    提取失败或超时返回 None，上传时改用页面截取封面。release() 在上传结束后删除封面图片。
+    """
+
+    def __init__(self, config, output_folder, wait_seconds=60.0, max_workers=1):
+        self.config = config
+        self.output_folder = output_folder
+        self.wait_seconds = wait_seconds
+        self._lock = threading.Lock()
+        self._futures = {} # 视频路径 -> Future
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='cover-prefetch')
+
+    @classmethod
+    def from_config(cls, config):
+        """cover_mode = upload 时构建；否则返回 None。相对路径相对于项目根目录。"""
+        if config.get('VideoSettings', 'cover_mode', fallback='capture').strip().lower() != 'upload':
+            return None
+        output_folder = config.get('VideoSettings', 'cover_folder', fallback=DEFAULT_COVER_FOLDER_NAME).strip() or DEFAULT_COVER_FOLDER_NAME
+        if not os.path.isabs(output_folder):
+            output_folder = os.path.join(os.path.dirname(os.path.abspath(__file__)), output_folder)
+        return cls(
+            config,
+            output_folder,
+            wait_seconds=config.getfloat('VideoSettings', 'cover_wait_seconds', fallback=60),
+            max_workers=config.getint('VideoSettings', 'cover_workers', fallback=1),
+        )
+
+    def _extract(self, video_path):
+        return video_utils.extract_cover_image(video_path, self.config, self.output_folder)
+
+    def prefetch(self, video_paths):
+        """按顺序提交封面提取任务（已提交的视频会被跳过）。"""
+        with self._lock:
+            for video_path in video_paths:
+                if video_path not in self._futures:
+                    self._futures[video_path] = self._executor.submit(self._extract, video_path)
+
+    def get(self, video_path):
+        """返回视频的封面图片路径；未提交过的视频立即提取。失败或等待超时返回 None。"""
+        with self._lock:
+            future = self._futures.get(video_path)
+            if future is None:
+                future = self._futures[video_path] = self._executor.submit(self._extract, video_path)
+        if not future.done():
+            logger.info(f"等待视频 {os.path.basename(video_path)} 的封面提取完成...")
+        try:
+            return future.result(timeout=self.wait_seconds)
+        except FutureTimeoutError:
+            logger.warning(f"视频 {os.path.basename(video_path)} 的封面在 {self.wait_seconds:.0f} 秒内未提取完成，改用页面截取封面。")
+        except Exception as e:
+            logger.warning(f"提取视频 {os.path.basename(video_path)} 的封面失败，改用页面截取封面: {e}")
+        return None
+
+    def release(self, video_path):
+        """删除视频的封面图片；仍在提取中的任务完成后再删除。"""
+        with self._lock:
+            future = self._futures.pop(video_path, None)
+        if future is None:
+            return
+        if not future.cancel():
+            future.add_done_callback(_remove_cover)
+
+    def stop(self):
+        with self._lock:
+            video_paths = list(self._futures)
+        for video_path in video_paths:
+            self.release(video_path)
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+
+def _remove_cover(future):
+    try:
+        cover_image_path = future.result()
+    except Exception:
+        return
+    if cover_image_path:
+        try:
+            os.remove(cover_image_path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"删除封面图片 {cover_image_path} 失败: {e}")
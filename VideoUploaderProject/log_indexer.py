@@ -0,0 +1,264 @@
+import os
+import re
+import gzip
+import json
+import hashlib
+import logging
+import sqlite3
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DATABASE_NAME = "log_index.db"
+LOG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "logs")
+
+_TIME_FORMAT = "%Y-%m-%d %H:%M:%S,%f"
+# 文本格式: '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+_TEXT_LINE = re.compile(r'^(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2},\d{3}) - (\S+) - ([A-Z]+) - (.*)$')
+
+# 消息 -> (事件, 结果)。视频路径中可能有空格，统一用非贪婪匹配到固定的后缀
+_VIDEO_EVENTS = (
+    (re.compile(r'^======== 开始处理视频: (.+?) ========'), 'start', None),
+    (re.compile(r'^======== 完成处理视频: (.+?) ========'), 'end', None),
+    (re.compile(r'^视频 (.+?) 上传成功并已记录到追踪文件'), 'result', 'succeeded'),
+    (re.compile(r'^视频 (.+?) 上传失败。'), 'result', 'failed'),
+    (re.compile(r'^视频 (.+?) 因WebDriver创建失败'), 'result', 'failed'),
+    (re.compile(r'^处理视频 (.+?) 过程中发生意外错误'), 'result', 'failed'),
+)
+_STEP_EVENT = re.compile(r'^上传步骤 (\S+) (失败|完成)，耗时 ([\d.]+) 秒')
+# 在增加“上传步骤 ... 失败”日志之前的历史日志中，用典型错误信息推断失败步骤
+_LEGACY_STEP_HINTS = (
+    ('未能找到文件输入元素', 'file_input'),
+    ('因WebDriver创建失败', 'driver'),
+    ('登录网站失败', 'login'),
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    identity TEXT PRIMARY KEY,  -- 文件首行的哈希，轮转改名后仍能识别为同一个文件
+    path TEXT NOT NULL,
+    offset INTEGER NOT NULL,    -- 已处理到的字节位置（.gz 为解压后的位置）
+    indexed_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS attempts (
+    id INTEGER PRIMARY KEY,
+    video TEXT NOT NULL,
+    started_at REAL NOT NULL,
+    finished_at REAL,
+    result TEXT,
+    failed_step TEXT
+);
+CREATE INDEX IF NOT EXISTS attempts_video ON attempts (video, finished_at);
+CREATE INDEX IF NOT EXISTS attempts_started ON attempts (started_at);
+CREATE TABLE IF NOT EXISTS steps (
+    attempt_id INTEGER,
+    step TEXT NOT NULL,
+    status TEXT NOT NULL,
+    elapsed REAL NOT NULL,
+    at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS steps_step ON steps (step, status);
+"""
+
+
+def _open_log(path):
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rb')
+    return open(path, 'rb')
+
+
+def _file_identity(path):
+    with _open_log(path) as f:
+        first_line = f.readline()
+    if not first_line.endswith(b'\n'):
+        return None # 空文件或首行尚未写完，下次再处理
+    return hashlib.sha1(first_line).hexdigest()
+
+
+def _parse_line(raw):
+    """返回 (时间戳, 消息)，无法识别（如异常堆栈的续行）时返回 None。"""
+    line = raw.decode('utf-8', 'replace').rstrip('\r\n')
+    if line.startswith('{'):
+        try:
+            record = json.loads(line)
+            return datetime.strptime(record['time'], _TIME_FORMAT).timestamp(), record.get('message', '')
+        except (ValueError, KeyError, TypeError):
+            return None
+    match = _TEXT_LINE.match(line)
+    if not match:
+        return None
+    return datetime.strptime(match.group(1), _TIME_FORMAT).timestamp(), match.group(4)
+
+
+class LogIndex:
+    """
+    把 logs/app.log* (包括按日期/大小轮转的文件、.gz 压缩文件和 JSON 格式日志) 增量索引到 SQLite。
+
+    每个文件以首行内容识别，记录已处理到的位置，下次只读取新增部分；轮转改名或压缩后的文件不会被重复处理。
+    索引得到每个视频的每次处理 (开始/结束时间、结果、失败步骤) 和各上传步骤的耗时，供汇总查询使用。
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self.conn = sqlite3.connect(db_path)
+        self.conn.executescript(_SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    # --- 索引 ---
+
+    def index_directory(self, log_dir=LOG_DIR, prefix='app.log'):
+        """索引目录中所有以 prefix 开头的日志文件，按修改时间从旧到新处理。返回新增的处理记录数。"""
+        paths = [os.path.join(log_dir, name) for name in os.listdir(log_dir)
+                 if name.startswith(prefix) and not name.endswith('.tmp')]
+        paths.sort(key=os.path.getmtime)
+        added = 0
+        for path in paths:
+            added += self.index_file(path)
+        return added
+
+    def index_file(self, path):
+        identity = _file_identity(path)
+        if identity is None:
+            return 0
+        row = self.conn.execute("SELECT offset FROM files WHERE identity = ?", (identity,)).fetchone()
+        offset = row[0] if row else 0
+        if not path.endswith('.gz') and os.path.getsize(path) <= offset:
+            return 0
+
+        added = 0
+        with self.conn, _open_log(path) as f:
+            f.seek(offset)
+            for raw in f:
+                if not raw.endswith(b'\n'):
+                    break # 最后一行可能还在写入，留到下次
+                offset += len(raw)
+                parsed = _parse_line(raw)
+                if parsed:
+                    added += self._handle(*parsed)
+            self.conn.execute("INSERT OR REPLACE INTO files (identity, path, offset, indexed_at) VALUES (?, ?, ?, ?)",
+                              (identity, path, offset, datetime.now().timestamp()))
+        if added:
+            logger.debug(f"已索引 {path}: 新增 {added} 条视频处理记录")
+        return added
+
+    def _open_attempt(self, video=None):
+        if video is None:
+            row = self.conn.execute("SELECT id FROM attempts WHERE finished_at IS NULL ORDER BY id DESC LIMIT 1").fetchone()
+        else:
+            row = self.conn.execute("SELECT id FROM attempts WHERE video = ? AND finished_at IS NULL "
+                                    "ORDER BY id DESC LIMIT 1", (video,)).fetchone()
+        return row[0] if row else None
+
+    def _handle(self, timestamp, message):
+        step_match = _STEP_EVENT.match(message)
+        if step_match:
+            step, status, elapsed = step_match.groups()
+            attempt_id = self._open_attempt()
+            self.conn.execute("INSERT INTO steps (attempt_id, step, status, elapsed, at) VALUES (?, ?, ?, ?, ?)",
+                              (attempt_id, step, 'failed' if status == '失败' else 'succeeded', float(elapsed), timestamp))
+            if status == '失败' and attempt_id:
+                self.conn.execute("UPDATE attempts SET failed_step = ? WHERE id = ?", (step, attempt_id))
+            return 0
+
+        for pattern, event, result in _VIDEO_EVENTS:
+            match = pattern.match(message)
+            if not match:
+                continue
+            video = match.group(1)
+            if event == 'start':
+                # 上一次处理没有结束标记 (程序中途退出)，视为未完成
+                self.conn.execute("UPDATE attempts SET finished_at = started_at, result = COALESCE(result, 'aborted') "
+                                  "WHERE video = ? AND finished_at IS NULL", (video,))
+                self.conn.execute("INSERT INTO attempts (video, started_at) VALUES (?, ?)", (video, timestamp))
+                return 1
+            attempt_id = self._open_attempt(video)
+            if attempt_id is None:
+                return 0
+            if event == 'end':
+                self.conn.execute("UPDATE attempts SET finished_at = ? WHERE id = ?", (timestamp, attempt_id))
+            else:
+                failed_step = None
+                if result == 'failed':
+                    failed_step = next((step for hint, step in _LEGACY_STEP_HINTS if hint in message), None)
+                self.conn.execute("UPDATE attempts SET result = ?, failed_step = COALESCE(failed_step, ?) WHERE id = ?",
+                                  (result, failed_step, attempt_id))
+            return 0
+
+        # 旧日志中没有步骤日志时，从错误信息推断失败步骤
+        for hint, step in _LEGACY_STEP_HINTS:
+            if hint in message:
+                attempt_id = self._open_attempt()
+                if attempt_id:
+                    self.conn.execute("UPDATE attempts SET failed_step = COALESCE(failed_step, ?) WHERE id = ?",
+                                      (step, attempt_id))
+                break
+        return 0
+
+    # --- 汇总查询 ---
+
+    def _since_clause(self, since, column='started_at'):
+        return (f" AND {column} >= ?", (since,)) if since else ("", ())
+
+    def throughput_per_day(self, since=None):
+        """每天的处理数、成功数、失败数和成功率。"""
+        clause, params = self._since_clause(since)
+        rows = self.conn.execute(
+            "SELECT date(started_at, 'unixepoch', 'localtime') AS day, COUNT(*), "
+            "SUM(result = 'succeeded'), SUM(result = 'failed') "
+            f"FROM attempts WHERE 1 = 1{clause} GROUP BY day ORDER BY day", params).fetchall()
+        return [{'day': day, 'attempts': total, 'succeeded': ok or 0, 'failed': failed or 0,
+                 'success_rate': round((ok or 0) / total, 3) if total else None}
+                for day, total, ok, failed in rows]
+
+    def failures_by_step(self, since=None):
+        """失败的处理按失败步骤分组计数，无法确定步骤的记为 unknown。"""
+        clause, params = self._since_clause(since)
+        rows = self.conn.execute(
+            "SELECT COALESCE(failed_step, 'unknown') AS step, COUNT(*) FROM attempts "
+            f"WHERE result = 'failed'{clause} GROUP BY step ORDER BY COUNT(*) DESC", params).fetchall()
+        return dict(rows)
+
+    def latency_percentiles(self, since=None, percentiles=(50, 90, 99)):
+        """成功上传的视频从开始到结束的耗时百分位，以及各步骤成功耗时的百分位（秒）。"""
+        clause, params = self._since_clause(since)
+        durations = [row[0] for row in self.conn.execute(
+            "SELECT finished_at - started_at FROM attempts WHERE result = 'succeeded' AND finished_at IS NOT NULL"
+            f"{clause} ORDER BY 1", params)]
+        result = {'video': _percentiles(durations, percentiles)}
+        step_clause, step_params = self._since_clause(since, 'at')
+        by_step = {}
+        for step, elapsed in self.conn.execute(
+                f"SELECT step, elapsed FROM steps WHERE status = 'succeeded'{step_clause} ORDER BY step, elapsed", step_params):
+            by_step.setdefault(step, []).append(elapsed)
+        for step, values in by_step.items():
+            result[step] = _percentiles(values, percentiles)
+        return result
+
+    def summary(self, since=None):
+        return {
+            'throughput_per_day': self.throughput_per_day(since),
+            'failures_by_step': self.failures_by_step(since),
+            'latency_seconds': self.latency_percentiles(since),
+        }
+
+
+def _percentiles(sorted_values, percentiles):
+    if not sorted_values:
+        return {'count': 0}
+    result = {'count': len(sorted_values)}
+    for pct in percentiles:
+        index = min(len(sorted_values) - 1, max(0, int(round(pct / 100.0 * len(sorted_values) + 0.5)) - 1))
+        result[f'p{pct}'] = round(sorted_values[index], 2)
+    return result
+
+
+def get_database_path(config=None):
+    """索引数据库路径 ([LogIndex] database)，相对路径相对于项目根目录。"""
+    path = config.get('LogIndex', 'database', fallback=os.path.join('logs', DEFAULT_DATABASE_NAME)) if config else \
+        os.path.join('logs', DEFAULT_DATABASE_NAME)
+    if not os.path.isabs(path):
+        path = os.path.join(os.path.dirname(os.path.abspath(__file__)), path)
+    return path
@@ -1,83 +1,193 @@
 import os
+import gzip
+import json
+import shutil
+import atexit
+import copy
+import queue
 import logging
-from logging.handlers import TimedRotatingFileHandler
+from logging.handlers import TimedRotatingFileHandler, RotatingFileHandler, QueueHandler, QueueListener
 from typing import Optional, List, Union
 
+# logger 名称 -> 正在运行的 QueueListener，重新配置或退出时需要停止
+_queue_listeners = {}
+
+# LogRecord 自带的属性，JSON 格式化时其余属性视为通过 extra= 传入的结构化字段
+_RESERVED_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+class JsonFormatter(logging.Formatter):
+    """将日志记录格式化为单行 JSON，extra= 传入的字段会原样输出。"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'thread': record.threadName,
+            'message': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RESERVED_RECORD_ATTRS and not key.startswith('_'):
+                payload[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            payload['exc_info'] = record.exc_text
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class CompressingRotatingFileHandler(RotatingFileHandler):
+    """按文件大小轮转，轮转出的旧日志以 gzip 压缩保存 (app.log.1.gz, app.log.2.gz ...)。"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.namer = lambda name: name + '.gz'
+        self.rotator = self._gzip_rotator
+
+    @staticmethod
+    def _gzip_rotator(source: str, dest: str) -> None:
+        with open(source, 'rb') as src, gzip.open(dest, 'wb') as dst:
+            shutil.copyfileobj(src, dst)
+        os.remove(source)
+
+
+class _PreparedQueueHandler(QueueHandler):
+    """在调用线程中只做最少的工作：合并参数、固化异常文本，格式化交给监听线程。"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def _stop_listener(logger_name: str) -> None:
+    listener = _queue_listeners.pop(logger_name, None)
+    if listener is not None:
+        listener.stop()
+        for handler in listener.handlers:
+            handler.close()
+
+
+def shutdown_logging() -> None:
+    """停止所有异步日志监听线程并刷新剩余日志，进程退出时自动调用。"""
+    for name in list(_queue_listeners):
+        _stop_listener(name)
+
+
+atexit.register(shutdown_logging)
+
+
 def setup_logger(
-    logger_name: str,
+    logger_name: Optional[str],
     log_dir: str = "logs",
     log_file: str = "app.log",
     log_level: int = logging.INFO,
     log_formats: Optional[List[str]] = None,
-    handlers: Optional[List[logging.Handler]] = None
+    handlers: Optional[List[logging.Handler]] = None,
+    structured: bool = False,
+    async_mode: bool = False,
+    max_bytes: int = 0,
+    backup_count: int = 7,
+    compress: bool = False,
+    console_level: Optional[int] = None
 ) -> logging.Logger:
     """
     配置日志记录器
-    
+
     参数:
-        logger_name: 日志记录器名称
+        logger_name: 日志记录器名称，None 表示根 logger（所有模块的日志只经过这一组处理器）
         log_dir: 日志目录路径
         log_file: 日志文件名
         log_level: 日志级别
         log_formats: 日志格式列表(控制台和文件可以不同)
         handlers: 自定义日志处理器列表
-    
+        structured: 文件日志是否输出为单行 JSON
+        async_mode: 是否通过 QueueHandler/QueueListener 在后台线程写日志，避免磁盘 I/O 阻塞调用线程
+        max_bytes: 大于 0 时按文件大小轮转，否则每天午夜轮转
+        backup_count: 保留的轮转文件数量
+        compress: 按大小轮转时是否 gzip 压缩旧日志
+        console_level: 控制台输出级别，默认与 log_level 相同
+
     返回:
         配置好的日志记录器
     """
     # 确保日志目录存在
     os.makedirs(log_dir, exist_ok=True)
     log_path = os.path.join(log_dir, log_file)
-    
+
     # 默认日志格式
     default_formats = [
         '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
         '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
     ]
     log_formats = log_formats or default_formats
-    
-    # 创建 TimedRotatingFileHandler 用于文件日志，每天轮转，保留7天备份
-    file_handler = TimedRotatingFileHandler(
-        log_path, 
-        when="midnight", 
-        interval=1, 
-        backupCount=7, 
-        encoding='utf-8'
-    )
-    
-    # 默认处理器列表修改，使用新的 file_handler
-    default_handlers = [
-        file_handler,
-        logging.StreamHandler()
-    ]
-    handlers = handlers or default_handlers
-    
-    # 配置处理器
-    for handler, fmt in zip(handlers, log_formats):
-        handler.setFormatter(logging.Formatter(fmt))
-    
+
+    if handlers is None:
+        if max_bytes > 0:
+            # 长时间运行时按大小轮转，可选压缩旧文件
+            handler_class = CompressingRotatingFileHandler if compress else RotatingFileHandler
+            file_handler = handler_class(
+                log_path,
+                maxBytes=max_bytes,
+                backupCount=backup_count,
+                encoding='utf-8'
+            )
+        else:
+            # 创建 TimedRotatingFileHandler 用于文件日志，每天轮转，保留7天备份
+            file_handler = TimedRotatingFileHandler(
+                log_path,
+                when="midnight",
+                interval=1,
+                backupCount=backup_count,
+                encoding='utf-8'
+            )
+        console_handler = logging.StreamHandler()
+        console_handler.setLevel(console_level if console_level is not None else log_level)
+        handlers = [file_handler, console_handler]
+
+        # 配置处理器，结构化模式下文件使用 JSON，控制台仍保持可读格式
+        file_handler.setFormatter(JsonFormatter() if structured else logging.Formatter(log_formats[0]))
+        console_handler.setFormatter(logging.Formatter(log_formats[-1]))
+    else:
+        for handler, fmt in zip(handlers, log_formats):
+            handler.setFormatter(JsonFormatter() if structured else logging.Formatter(fmt))
+
     # 创建并配置日志记录器
     logger = logging.getLogger(logger_name)
     logger.setLevel(log_level)
-    
-    # 清除现有处理器
+
+    # 清除现有处理器（包括之前的异步监听线程）
+    _stop_listener(logger.name)
     for handler in logger.handlers[:]:
         logger.removeHandler(handler)
-    
+        handler.close()
+
     # 添加新处理器
-    for handler in handlers:
-        logger.addHandler(handler)
-    
+    if async_mode:
+        log_queue = queue.SimpleQueue()
+        listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+        listener.start()
+        _queue_listeners[logger.name] = listener
+        logger.addHandler(_PreparedQueueHandler(log_queue))
+    else:
+        for handler in handlers:
+            logger.addHandler(handler)
+
     return logger
 
 def get_logger(name: str) -> logging.Logger:
     """
     获取已配置的日志记录器
-    
+
     参数:
         name: 日志记录器名称
-    
+
     返回:
         配置好的日志记录器
     """
-    return logging.getLogger(name)
\ No newline at end of file
+    return logging.getLogger(name)
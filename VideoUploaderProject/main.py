@@ -1,48 +1,72 @@
 import logging
-# 基本配置，尽早进行，影响所有后续的 logger
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-
 import configparser
 import os
 import time # 用于调试时可能的暂停
-from web import web_interaction,video_utils
-from log_utils import setup_logger
-import re # 导入re模块用于正则表达式提取数字
+import video_index # 文件名编号解析与候选视频排序
+import upload_queue # 持久化的待上传优先队列
+import settings # 配置校验、缓存与热加载
 import shutil # 导入shutil模块用于文件移动
+# web 包 (selenium、requests)、metadata、coordination、control_api 在用到它们的函数中导入，
+# 使 cli.py 的 scan/status 等命令可以只导入本模块的扫描函数而不必承担浏览器相关的启动开销。
 
 # 自定义异常
 class LoginFailureException(Exception):
     """当网站登录失败时抛出此异常。"""
     pass
 
-# 初始化日志
-# 移除旧的 logger 初始化，因为 basicConfig 已经做了基础配置，
-# setup_logger 将进一步添加 handlers。
-# 我们需要确保 setup_logger 获取的是根 logger 或应用级 logger 来添加其 handlers
-# 或者修改 setup_logger 使其能正确作用于已由 basicConfig 初始化的系统。
-
-# 让我们先尝试直接调用 setup_logger 看它如何与 basicConfig 交互
-# 注意：basicConfig 设置的 level 和 format 是针对根 logger 的默认 handler。
-# setup_logger 可能会添加额外的 handlers。
-logger = setup_logger( 
-    __name__, # 或者尝试 logging.getLogger() 来获取根 logger，或者 "VideoUploaderProject"
-    log_dir=os.path.join(os.path.dirname(__file__), "logs"),
-    log_file="app.log",
-    log_level=logging.INFO # 确保 setup_logger 内部的 handlers 也遵循此级别
-)
+LOG_DIR = os.path.join(os.path.dirname(__file__), "logs")
+
+logger = logging.getLogger(__name__)
+
+def init_logging():
+    """
+    读取配置之前的初始日志。处理器统一挂在根 logger 上（web_interaction 等模块的日志也只经过这一组处理器，
+    不会重复输出），读取配置后由 configure_logging() 按 [Logging] 设置重新配置。
+    只在 main() 中调用，导入本模块不会创建日志文件。
+    """
+    from log_utils import setup_logger
+    setup_logger(
+        None,
+        log_dir=LOG_DIR,
+        log_file="app.log",
+        log_level=logging.INFO,
+        async_mode=True
+    )
+
+def configure_logging(config):
+    """根据配置文件的 [Logging] 部分重新配置日志（异步写入、JSON 格式、按大小轮转压缩）。"""
+    level_name = config.get('Logging', 'level', fallback='INFO').upper()
+    console_level_name = config.get('Logging', 'console_level', fallback=level_name).upper()
+    from log_utils import setup_logger
+    setup_logger(
+        None,
+        log_dir=LOG_DIR,
+        log_file=config.get('Logging', 'log_file', fallback='app.log'),
+        log_level=getattr(logging, level_name, logging.INFO),
+        structured=config.getboolean('Logging', 'structured', fallback=False),
+        async_mode=config.getboolean('Logging', 'async', fallback=True),
+        max_bytes=config.getint('Logging', 'max_bytes', fallback=0),
+        backup_count=config.getint('Logging', 'backup_count', fallback=7),
+        compress=config.getboolean('Logging', 'compress', fallback=True),
+        console_level=getattr(logging, console_level_name, logging.INFO)
+    )
+
+def get_config_path(script_dir):
+    return os.path.join(script_dir, 'config', 'config.ini')
 
 def load_config(script_dir):
-    """加载配置文件 config.ini"""
-    config_path = os.path.join(script_dir, 'config', 'config.ini')
+    """加载并校验配置文件 config.ini（进程内缓存，见 settings.ConfigManager）"""
+    config_path = get_config_path(script_dir)
     if not os.path.exists(config_path):
         logger.error(f"配置文件 {config_path} 未找到!")
         raise FileNotFoundError(f"配置文件 {config_path} 未找到!")
     
-    config = configparser.ConfigParser()
     try:
-        # 以 UTF-8 编码读取配置文件，防止中文乱码
-        with open(config_path, 'r', encoding='utf-8') as f:
-            config.read_file(f)
+        config = settings.get_config_manager(config_path).config
+    except settings.ConfigError as e:
+        for problem in e.problems:
+            logger.error(f"配置错误: {problem}")
+        raise
     except UnicodeDecodeError as e:
         logger.error(f"读取配置文件 {config_path} 时发生编码错误 (尝试UTF-8失败): {e}")
         logger.error("请确保 config.ini 文件是以 UTF-8 编码保存的。")
@@ -52,42 +76,58 @@ def load_config(script_dir):
         raise
     return config
 
-def get_videos_from_folder(video_folder, tracker_file_path, start_video_number=111):
-    """
-    获取指定文件夹下待上传的视频列表。
-    会排除掉那些已经在 tracker_file_path 文件中记录过的视频。
-    只包含文件名数字大于等于 start_video_number 的视频。
-    视频按文件名中的数字排序。
-    """
+def load_uploaded_videos(tracker_file_path):
+    """读取追踪文件中已记录（已尝试上传）的视频路径集合。"""
     uploaded_videos = set()
     if os.path.exists(tracker_file_path):
         with open(tracker_file_path, 'r', encoding='utf-8') as f:
             for line in f:
                 uploaded_videos.add(line.strip())
-    
-    videos_to_upload = []
+    return uploaded_videos
+
+def get_pending_candidates(video_folder, tracker_file_path, start_video_number=111, index_settings=None, with_stat=False):
+    """
+    扫描指定文件夹，返回尚未上传的候选视频（video_index.scan_candidates 的结果，未排序）。
+    会排除掉那些已经在 tracker_file_path 文件中记录过的视频，只包含文件名编号大于等于 start_video_number 的视频。
+    """
+    index_settings = index_settings or {}
+    uploaded_videos = load_uploaded_videos(tracker_file_path)
+
     if not os.path.isdir(video_folder):
         logger.error(f"视频文件夹 {video_folder} 不存在或不是一个目录。")
-        return videos_to_upload
-        
+        return []
+
+    candidates = video_index.scan_candidates(
+        video_folder,
+        start_number=start_video_number,
+        name_pattern=index_settings.get('name_pattern', video_index.DEFAULT_NAME_PATTERN),
+        extensions=index_settings.get('extensions', video_index.DEFAULT_EXTENSIONS),
+        with_stat=with_stat
+    )
+
     video_files = []
-    for filename in os.listdir(video_folder):
-        if filename.lower().endswith('.mp4'): # 只处理 .mp4 文件
-            # 从文件名提取数字，例如 "海外猫咪视频大赏111.mp4" -> 111
-            match = re.search(r'(\d+)', filename)
-            if match:
-                video_number = int(match.group(1))
-                if video_number >= start_video_number:
-                    video_path = os.path.join(video_folder, filename)
-                    if video_path not in uploaded_videos:
-                        video_files.append({'path': video_path, 'number': video_number, 'filename': filename})
-                    else:
-                        logger.info(f"视频 {filename} 已记录为上传过，将跳过。")
-            else:
-                logger.warning(f"无法从文件名 {filename} 中提取编号，将跳过。")
+    for candidate in candidates:
+        if candidate['path'] not in uploaded_videos:
+            video_files.append(candidate)
+        else:
+            logger.debug(f"视频 {candidate['filename']} 已记录为上传过，将跳过。")
+    return video_files
+
+def get_videos_from_folder(video_folder, tracker_file_path, start_video_number=111, index_settings=None):
+    """
+    获取指定文件夹下待上传的视频列表。
+    会排除掉那些已经在 tracker_file_path 文件中记录过的视频。
+    只包含文件名编号大于等于 start_video_number 的视频。
+    文件名编号的解析方式、支持的扩展名和排序键由 index_settings（见 video_index.load_index_settings）决定，
+    默认按文件名中最后一段数字排序。
+    """
+    index_settings = index_settings or {}
+    order_by = index_settings.get('order_by', 'number')
+    video_files = get_pending_candidates(video_folder, tracker_file_path, start_video_number, index_settings,
+                                         with_stat=order_by != 'number')
 
-    # 按视频编号排序
-    video_files.sort(key=lambda x: x['number'])
+    # 按配置的排序键排序（默认按视频编号）
+    video_index.sort_candidates(video_files, order_by)
     
     # 提取排序后的路径列表
     videos_to_upload = [vf['path'] for vf in video_files]
@@ -99,8 +139,27 @@ def mark_as_uploaded(video_path, tracker_file_path):
     with open(tracker_file_path, 'a', encoding='utf-8') as f:
         f.write(f"{video_path}\n")
 
-def main_upload_cycle(config, script_directory, videos_to_process_current_batch, tracker_file, move_files_config):
-    """执行单次上传周期的核心逻辑。"""
+def move_video(video_path, destination_folder):
+    """把视频移动到指定文件夹（不存在时创建），失败时只记录日志。"""
+    try:
+        os.makedirs(destination_folder, exist_ok=True)
+        if os.path.exists(video_path):
+            shutil.move(video_path, os.path.join(destination_folder, os.path.basename(video_path)))
+            logger.info(f"视频 {os.path.basename(video_path)} 已移动到: {destination_folder}")
+        else:
+            logger.warning(f"尝试移动视频 {os.path.basename(video_path)}，但源文件不存在。")
+    except Exception as e:
+        logger.error(f"移动视频 {video_path} 到 {destination_folder} 失败: {e}")
+
+def main_upload_cycle(config, script_directory, videos_to_process_current_batch, tracker_file, move_files_config, verifier=None, video_metadata=None,
+                      on_video_done=None, checkpoint=None, staging=None, segments=None, covers=None):
+    """
+    执行单次上传周期的核心逻辑。on_video_done(video_path, upload_successful) 在每个视频记录到追踪文件后调用；
+    checkpoint() 在开始每个视频之前调用，返回 False 时不再处理本批次剩余的视频。
+    staging 为 staging.StagingArea 时，浏览器从本地暂存副本读取视频。
+    segments 为 {分段路径: 原视频路径}，分段上传后不移动，由调用方在全部分段完成后处理原视频。
+    covers 为 covers.CoverPrefetcher 时，上传预先提取的封面图片而不是在页面中截取。
+    """
     if not videos_to_process_current_batch:
         logger.info("当前批次没有视频可供上传。")
         return
@@ -128,41 +187,92 @@ def main_upload_cycle(config, script_directory, videos_to_process_current_batch,
             logger.error(f"创建失败视频文件夹 {failed_videos_folder_path} 失败: {e}. 失败文件将不会被移动。")
             move_failed_enabled = False # 创建失败则禁用移动失败文件功能
 
+    # 浏览器进程树资源采样间隔 (秒)，0 表示不采样
+    resource_sample_interval = config.getfloat('BrowserSettings', 'resource_sample_interval_seconds', fallback=0)
+
+    from web import driver_watchdog
+
+    # 浏览器的创建、复用和回收由 watchdog 负责（默认每个视频使用新的浏览器）
+    watchdog = driver_watchdog.DriverWatchdog.from_config(config)
+    try:
+        _process_batch(config, videos_to_process_current_batch, tracker_file, watchdog, resource_sample_interval,
+                       move_successful_enabled, archive_folder_path, move_failed_enabled, failed_videos_folder_path,
+                       verifier, video_metadata or {}, on_video_done, checkpoint, staging, segments or {}, covers)
+    finally:
+        watchdog.shutdown()
+    logger.info("当前批次的视频均已尝试处理。")
+
+def _process_batch(config, videos_to_process_current_batch, tracker_file, watchdog, resource_sample_interval,
+                   move_successful_enabled, archive_folder_path, move_failed_enabled, failed_videos_folder_path,
+                   verifier=None, video_metadata=None, on_video_done=None, checkpoint=None, staging=None, segments=None,
+                   covers=None):
+    """逐个处理批次中的视频。"""
+    from web import web_interaction, resource_monitor
+
     for video_full_path in videos_to_process_current_batch:
-        logger.info(f"******************************************************\n")
+        if checkpoint and not checkpoint():
+            logger.info("暂停派发（排空或熔断），本批次剩余的视频留待下次处理。")
+            break
+        logger.debug(f"******************************************************\n")
         logger.info(f"======== 开始处理视频: {video_full_path} ========")
-        logger.info(f"******************************************************\n")
+        logger.debug(f"******************************************************\n")
         driver = None
+        resource_sampler = None
         upload_successful = False
+        reported = False
+        is_segment = video_full_path in (segments or {})
         try:
-            logger.debug(f"为视频 {os.path.basename(video_full_path)} 创建 WebDriver 实例...")
-            driver = web_interaction.create_driver(config)
+            logger.debug(f"为视频 {os.path.basename(video_full_path)} 获取 WebDriver 实例...")
+            driver, is_new_driver = watchdog.acquire()
+            if driver and resource_sample_interval > 0:
+                resource_sampler = resource_monitor.ResourceSampler(driver, resource_sample_interval, name=os.path.basename(video_full_path)).start()
             if not driver:
                 logger.error(f"无法为视频 {os.path.basename(video_full_path)} 创建 WebDriver 实例，跳过此视频。")
                 mark_as_uploaded(video_full_path, tracker_file)
                 logger.warning(f"视频 {video_full_path} 因WebDriver创建失败已记录到追踪文件，不会重试。")
-            else:
+            elif is_new_driver:
                 logger.debug(f"为视频 {os.path.basename(video_full_path)} 登录网站...")
                 if not web_interaction.login_to_website(driver, config):
                     critical_error_msg = f"关键错误：为视频 {os.path.basename(video_full_path)} 登录网站失败。请检查 Cookies 或手动登录流程。程序将终止。"
                     logger.critical(critical_error_msg)
-                    if driver:
-                        driver.quit()
+                    watchdog.discard(driver)
+                    driver = None
                     raise LoginFailureException(critical_error_msg)
-            
+            else:
+                # 复用的浏览器已登录，只需重新打开上传页
+                logger.debug(f"复用浏览器实例，为视频 {os.path.basename(video_full_path)} 重新打开上传页面...")
+                driver.get(config.get('WebTarget', 'upload_url'))
+
+            if driver:
                 logger.debug(f"成功为视频 {os.path.basename(video_full_path)} 登录/导航到上传页面。")
                 time.sleep(5)
 
-                upload_successful = web_interaction.perform_video_upload(driver, video_full_path, '', None, config)
+                # 预先渲染好的标题/简介/标签，没有时使用平台默认值
+                video_meta = (video_metadata or {}).get(video_full_path, {})
+                # 已预先复制到本地暂存目录时从本地读取，否则直接读取源文件
+                upload_file_path = staging.local_path(video_full_path) if staging else video_full_path
+                # 后台预先提取的封面，没有时在页面中截取
+                cover_image_path = covers.get(video_full_path) if covers else None
+                upload_started_at = time.time()
+                upload_successful = web_interaction.perform_video_upload(
+                    driver, upload_file_path, video_meta.get('title', ''), cover_image_path, config,
+                    description=video_meta.get('description'), tags=video_meta.get('tags'))
+                if upload_successful and verifier:
+                    # 未填写标题时平台默认使用文件名作为标题，后台核对该视频是否真正出现在内容列表中
+                    expected_title = video_meta.get('title') or os.path.splitext(os.path.basename(video_full_path))[0]
+                    verifier.submit(video_full_path, expected_title, upload_started_at)
             
             mark_as_uploaded(video_full_path, tracker_file)
+            if on_video_done:
+                reported = True
+                on_video_done(video_full_path, upload_successful)
             
             if upload_successful:
                 logger.info(f"视频 {video_full_path} 上传成功并已记录到追踪文件。")
                 time.sleep(10) # 短暂等待，原逻辑保留
 
                 # 将移动成功视频的逻辑块移到这里
-                if move_successful_enabled and archive_folder_path:
+                if move_successful_enabled and archive_folder_path and not is_segment:
                     try:
                         video_filename = os.path.basename(video_full_path)
                         destination_path = os.path.join(archive_folder_path, video_filename)
@@ -177,7 +287,7 @@ def main_upload_cycle(config, script_directory, videos_to_process_current_batch,
                 logger.error(f"视频 {video_full_path} 上传失败。该视频已记录到追踪文件，不会重试。")
                 
                 # 将移动失败视频的逻辑块移到这里
-                if move_failed_enabled and failed_videos_folder_path:
+                if move_failed_enabled and failed_videos_folder_path and not is_segment:
                     try:
                         video_filename = os.path.basename(video_full_path)
                         destination_path = os.path.join(failed_videos_folder_path, video_filename)
@@ -197,7 +307,9 @@ def main_upload_cycle(config, script_directory, videos_to_process_current_batch,
             upload_successful = False # 确保标记为失败
             if not os.path.exists(tracker_file) or video_full_path not in open(tracker_file, 'r', encoding='utf-8').read():
                 mark_as_uploaded(video_full_path, tracker_file) # 确保在意外错误时也标记，如果之前没标记的话
-            if move_failed_enabled and failed_videos_folder_path:
+            if on_video_done and not reported:
+                on_video_done(video_full_path, False)
+            if move_failed_enabled and failed_videos_folder_path and not is_segment:
                 try:
                     video_filename = os.path.basename(video_full_path)
                     destination_path = os.path.join(failed_videos_folder_path, video_filename)
@@ -209,65 +321,354 @@ def main_upload_cycle(config, script_directory, videos_to_process_current_batch,
                 except Exception as e_move:
                     logger.error(f"移动因意外错误上传失败的视频 {video_full_path} 到失败文件夹失败: {e_move}")
         finally:
+            if staging:
+                staging.release(video_full_path)
+            if covers:
+                covers.release(video_full_path)
+            if resource_sampler:
+                logger.info(f"视频 {os.path.basename(video_full_path)} 的浏览器资源占用: {resource_monitor.format_summary(resource_sampler.stop())}")
             if driver:
-                logger.debug(f"正在关闭视频 {os.path.basename(video_full_path)} 的浏览器实例...")
-                driver.quit()
-                logger.debug(f"视频 {os.path.basename(video_full_path)} 的浏览器实例已关闭。")
+                # 由 watchdog 根据上传结果和阈值决定保留还是回收浏览器
+                watchdog.release(driver, upload_successful)
             else:
                 logger.debug(f"视频 {os.path.basename(video_full_path)} 的 WebDriver 实例未创建或已提前处理。")
             time.sleep(5)
-        logger.info(f"******************************************************\n")
+        logger.debug(f"******************************************************\n")
         logger.info(f"======== 完成处理视频: {video_full_path} ========\n")
-        logger.info(f"******************************************************\n")
-    logger.info("当前批次的视频均已尝试处理。")
+        logger.debug(f"******************************************************\n")
+
+def get_tracker_file_path(config_parser, script_directory):
+    """追踪文件路径，相对路径相对于项目根目录。"""
+    raw_tracker_path = config_parser.get('General', 'uploaded_tracker_file', fallback='uploaded_videos_tracker.txt').split('#')[0].strip()
+    if not os.path.isabs(raw_tracker_path):
+        return os.path.join(script_directory, raw_tracker_path)
+    return raw_tracker_path
+
+def prepare_runtime(config_parser, script_directory):
+    """读取配置，构建一次运行所需的路径、队列等状态，返回字典供 run_cycle 使用。"""
+    import metadata # 标题/简介/标签模板渲染
+    from web import video_utils
+
+    video_source_folder = config_parser.get('General', 'video_source_folder')
+
+    upload_interval_hours = config_parser.getfloat('General', 'upload_interval_hours', fallback=8)
+    videos_per_batch = config_parser.getint('General', 'videos_per_batch', fallback=10)
+    start_video_number_initial = config_parser.getint('General', 'start_video_number_initial', fallback=111)
+    index_settings = video_index.load_index_settings(config_parser)
+    metadata_settings = metadata.load_metadata_settings(config_parser)
+    video_queue = upload_queue.UploadQueue.from_config(
+        config_parser, index_settings, duration_probe=lambda path: video_utils.probe_duration(path, config_parser))
+    
+    # 文件移动相关配置 (成功上传的视频)
+    move_successful_files_enabled = config_parser.getboolean('General', 'move_uploaded_files', fallback=True)
+    raw_archive_folder = config_parser.get('General', 'uploaded_archive_folder', fallback='UploadedArchive')
+    
+    # 新增：失败视频移动相关配置
+    move_failed_files_enabled = config_parser.getboolean('General', 'move_failed_videos', fallback=False)
+    raw_failed_videos_folder = config_parser.get('General', 'failed_videos_folder', fallback='FailedUploads')
+
+    # 处理存档文件夹路径 (成功上传)
+    if not os.path.isabs(raw_archive_folder):
+        archive_folder = os.path.join(script_directory, raw_archive_folder)
+    else:
+        archive_folder = raw_archive_folder
+
+    # 新增：处理失败视频文件夹路径
+    if not os.path.isabs(raw_failed_videos_folder):
+        failed_videos_folder = os.path.join(script_directory, raw_failed_videos_folder)
+    else:
+        failed_videos_folder = raw_failed_videos_folder
+
+    move_files_settings = {
+        'enabled': move_successful_files_enabled,
+        'archive_folder': archive_folder if move_successful_files_enabled else None,
+        'move_failed_enabled': move_failed_files_enabled,
+        'failed_videos_folder': failed_videos_folder if move_failed_files_enabled else None
+    }
+
+    tracker_file = get_tracker_file_path(config_parser, script_directory)
+
+    return {
+        'config': config_parser,
+        'script_directory': script_directory,
+        'video_source_folder': video_source_folder,
+        'upload_interval_hours': upload_interval_hours,
+        'videos_per_batch': videos_per_batch,
+        'start_video_number_initial': start_video_number_initial,
+        'index_settings': index_settings,
+        'metadata_settings': metadata_settings,
+        'video_queue': video_queue,
+        'move_files_settings': move_files_settings,
+        'tracker_file': tracker_file,
+        'verifier': None,
+        'coordinator': None,
+        'control': None,
+        'staging': None,
+        'breaker': None,
+        'splitter': None,
+        'covers': None,
+    }
+
+def apply_runtime_settings(runtime, config_manager):
+    """配置热加载后用校验过的类型化值更新运行中的可调参数。路径等其余配置需要重启才能生效。"""
+    runtime['config'] = config_manager.config
+    runtime['upload_interval_hours'] = config_manager.get('General', 'upload_interval_hours')
+    runtime['videos_per_batch'] = config_manager.get('General', 'videos_per_batch')
+    runtime['start_video_number_initial'] = config_manager.get('General', 'start_video_number_initial')
+    logger.info(f"新的调度参数: 每隔 {runtime['upload_interval_hours']} 小时上传最多 {runtime['videos_per_batch']} 个视频。")
+
+def wait_for_next_cycle(runtime, config_manager, cycle_finished_at):
+    """
+    等待到下一轮上传时间，期间按 reload_poll_seconds 检查配置文件。
+    配置变化时立即生效，并按新的上传间隔重新计算下一轮时间。
+    """
+    control = runtime.get('control')
+    breaker = runtime.get('breaker')
+    while True:
+        next_run_at = cycle_finished_at + runtime['upload_interval_hours'] * 60 * 60
+        if breaker and breaker.retry_at and breaker.retry_at > cycle_finished_at:
+            # 熔断后留在队列中的视频在冷却结束时就进行探测，不必等到下一个上传周期
+            next_run_at = min(next_run_at, breaker.retry_at)
+        remaining = next_run_at - time.time()
+        if remaining <= 0 or (control and control.draining):
+            return
+        if control:
+            # 控制接口切换暂停/排空时提前醒来
+            control.set_phase('waiting', next_run_at)
+            control.sleep(min(remaining, config_manager.reload_poll_seconds))
+        else:
+            time.sleep(min(remaining, config_manager.reload_poll_seconds))
+        if config_manager.reload_if_changed():
+            apply_runtime_settings(runtime, config_manager)
+
+def coordination_key(runtime, video_path):
+    """视频在协调数据库中的键：相对于源文件夹的路径，各主机挂载共享目录的位置可以不同。"""
+    return os.path.relpath(video_path, runtime['video_source_folder']).replace(os.sep, '/')
+
+def claim_videos(runtime, count):
+    """从队列中依次取出视频并向协调器领取，跳过其他节点正在处理的视频，直到领取 count 个或队列为空。"""
+    video_queue = runtime['video_queue']
+    coordinator = runtime['coordinator']
+    claimed = []
+    skipped = 0
+    while len(claimed) < count:
+        batch = video_queue.pop_batch(count - len(claimed))
+        if not batch:
+            break
+        keys = {coordination_key(runtime, path): path for path in batch}
+        won = set(coordinator.claim(list(keys)))
+        for key, path in keys.items():
+            if key in won:
+                claimed.append(path)
+            else:
+                # 由其他节点持有；若对方最终放弃，下一轮扫描会重新入队
+                video_queue.complete(path)
+                skipped += 1
+    if skipped:
+        logger.info(f"跳过 {skipped} 个正由其他节点处理的视频。")
+    return claimed
+
+def split_oversized_videos(runtime, videos):
+    """
+    把本批次中超过平台限制的视频切成分段，返回 (上传列表, {分段路径: 原视频路径}, {原视频路径: 全部分段路径})。
+    上传列表中超限的视频被替换为它尚未上传过的分段，其余视频保持原样。
+    分段也计入每轮的 videos_per_batch：超出的分段和视频留到之后的轮次（未上传完的原视频会放回队列，
+    已上传的分段记录在追踪文件中不会重复上传）。{分段路径: 原视频路径} 包含全部未上传的分段。
+    """
+    splitter = runtime.get('splitter')
+    if not splitter:
+        return list(videos), {}, {}
+    uploaded = load_uploaded_videos(runtime['tracker_file'])
+    split_parts = splitter.split_batch(videos, runtime['config'], skip_parts=uploaded)
+    upload_videos = []
+    segments = {}
+    for video_path in videos:
+        parts = split_parts.get(video_path)
+        if not parts:
+            upload_videos.append(video_path)
+            continue
+        for part_path in parts:
+            if part_path not in uploaded:
+                segments[part_path] = video_path
+                upload_videos.append(part_path)
+    limit = runtime['videos_per_batch']
+    if len(upload_videos) > limit:
+        logger.info(f"分段后本批次共有 {len(upload_videos)} 个上传，超过批次上限 {limit}，其余的留到之后的轮次。")
+        upload_videos = upload_videos[:limit]
+    return upload_videos, segments, split_parts
+
+def number_segment_metadata(runtime, video_metadata, split_parts):
+    """分段使用原视频的简介和标签，标题按 [Splitting] part_title_template 编号（没有预设标题时基于文件名）。"""
+    splitter = runtime['splitter']
+    metadata_settings = runtime['metadata_settings']
+    max_length = metadata_settings['title_max_length'] if metadata_settings else None
+    for video_path, parts in split_parts.items():
+        base = video_metadata.get(video_path, {})
+        title = base.get('title') or os.path.splitext(os.path.basename(video_path))[0]
+        for index, part_path in enumerate(parts, start=1):
+            video_metadata[part_path] = dict(base, title=splitter.part_title(title, index, len(parts), max_length))
+
+def finish_split_video(runtime, video_path, parts, upload_successful):
+    """原视频的全部分段都已处理：记录原视频到追踪文件，按结果移动原视频，删除分段文件。"""
+    mark_as_uploaded(video_path, runtime['tracker_file'])
+    move_files_settings = runtime['move_files_settings']
+    if upload_successful:
+        logger.info(f"视频 {video_path} 的 {len(parts)} 个分段均已上传。")
+        if move_files_settings['enabled'] and move_files_settings['archive_folder']:
+            move_video(video_path, move_files_settings['archive_folder'])
+    else:
+        logger.error(f"视频 {video_path} 有分段上传失败。该视频已记录到追踪文件，不会重试。")
+        if move_files_settings['move_failed_enabled'] and move_files_settings['failed_videos_folder']:
+            move_video(video_path, move_files_settings['failed_videos_folder'])
+    runtime['splitter'].remove_parts(parts)
+
+def run_cycle(runtime):
+    """执行一轮扫描和上传，返回本轮尝试上传的视频列表。可能抛出 LoginFailureException。"""
+    import metadata
+
+    config_parser = runtime['config']
+    video_queue = runtime['video_queue']
+    videos_per_batch = runtime['videos_per_batch']
+
+    # 扫描结果增量喂入队列：只有新视频会被插入，已上传或已删除的视频会被移除
+    candidates = get_pending_candidates(runtime['video_source_folder'], runtime['tracker_file'],
+                                        runtime['start_video_number_initial'], runtime['index_settings'],
+                                        with_stat=video_queue.needs_stat)
+    coordinator = runtime.get('coordinator')
+    if coordinator:
+        # 其他节点已处理完的视频不再进入本节点的队列
+        done = coordinator.done_videos()
+        candidates = [c for c in candidates if coordination_key(runtime, c['path']) not in done]
+    added, removed = video_queue.sync(candidates)
+    logger.debug(f"队列更新: 新增 {added} 个，移除 {removed} 个视频。")
+
+    if not len(video_queue):
+        logger.info("目前没有找到新的、符合条件的视频可供上传。")
+        return []
+
+    logger.info(f"找到 {len(video_queue)} 个潜在待上传视频。")
+    
+    if coordinator:
+        videos_for_this_run = claim_videos(runtime, videos_per_batch)
+    else:
+        videos_for_this_run = video_queue.pop_batch(videos_per_batch)
+    logger.info(f"本轮将尝试上传 {len(videos_for_this_run)} 个视频: {videos_for_this_run}")
+    
+    staging_area = runtime.get('staging')
+    cover_prefetcher = runtime.get('covers')
+    upload_videos = []
+    finished = set()
+    # 取出视频后的任何异常都要经过下面的 finally，把未处理的视频放回队列并释放租约
+    try:
+        # 超过平台限制的视频切成分段，每个分段单独上传
+        upload_videos, segments, split_parts = split_oversized_videos(runtime, videos_for_this_run)
+
+        if staging_area:
+            # 后台按上传顺序把本批次视频复制到本地暂存目录，与元数据渲染和上传并行（分段已在本地，不需要暂存）
+            staging_area.prefetch([path for path in upload_videos if path not in segments])
+        if cover_prefetcher:
+            # 后台按上传顺序提取封面，与前一个视频的上传重叠进行
+            cover_prefetcher.prefetch(upload_videos)
+
+        # 在打开浏览器之前批量渲染并校验本批次的元数据
+        video_metadata = metadata.prepare_batch(videos_for_this_run, runtime['metadata_settings'], config_parser)
+        if split_parts:
+            number_segment_metadata(runtime, video_metadata, split_parts)
+
+        control = runtime.get('control')
+        breaker = runtime.get('breaker')
+        # 原视频 -> 本轮要上传的分段数和已完成分段的结果；以前的运行中已上传过的分段不计入
+        pending_parts = {video_path: sum(1 for original in segments.values() if original == video_path) for video_path in split_parts}
+        part_results = {video_path: {} for video_path in split_parts}
+
+        def finish(video_path, upload_successful):
+            finished.add(video_path)
+            if coordinator:
+                coordinator.complete(coordination_key(runtime, video_path), 'succeeded' if upload_successful else 'failed')
+
+        def on_video_done(video_path, upload_successful):
+            if breaker:
+                breaker.record_result(video_path, upload_successful)
+            if control:
+                control.record_upload(video_path, upload_successful)
+            original = segments.get(video_path)
+            if original is None:
+                finish(video_path, upload_successful)
+                return
+            results = part_results[original]
+            results[video_path] = upload_successful
+            if len(results) == pending_parts[original]:
+                all_successful = all(results.values())
+                finish_split_video(runtime, original, split_parts[original], all_successful)
+                finish(original, all_successful)
+
+        for video_path, parts in split_parts.items():
+            if not pending_parts[video_path]:
+                # 上次运行中全部分段都已上传，只差记录原视频
+                finish_split_video(runtime, video_path, parts, True)
+                finish(video_path, True)
+
+        def checkpoint():
+            if control and not control.checkpoint():
+                return False
+            return not breaker or breaker.allow()
+
+        if control:
+            control.set_phase('uploading')
+        # 注意：main_upload_cycle 现在可能会抛出 LoginFailureException
+        main_upload_cycle(config_parser, runtime['script_directory'], upload_videos, runtime['tracker_file'],
+                          runtime['move_files_settings'], runtime['verifier'], video_metadata, on_video_done,
+                          checkpoint, staging_area, segments, cover_prefetcher)
+    finally:
+        # 已处理的视频无论成功与否都已记录到追踪文件，从队列中移除；
+        # 因排空或中途退出而未处理的视频放回队列，并立即释放租约，其他节点无需等待租约过期
+        unfinished = []
+        for video_path in videos_for_this_run:
+            if video_path in finished:
+                video_queue.complete(video_path)
+            else:
+                video_queue.requeue(video_path)
+                unfinished.append(video_path)
+        if coordinator and unfinished:
+            coordinator.release([coordination_key(runtime, path) for path in unfinished])
+        if staging_area:
+            for video_path in unfinished:
+                staging_area.release(video_path)
+        if cover_prefetcher:
+            # 未上传的视频（含分段）的封面不再需要，下次重新提取；已上传的视频在上传后已删除封面
+            for video_path in upload_videos:
+                cover_prefetcher.release(video_path)
+    
+    if len(videos_for_this_run) < videos_per_batch:
+        logger.info(f"本轮上传数量 ({len(videos_for_this_run)}) 少于批次上限 ({videos_per_batch})，可能所有符合条件的视频都已处理完毕。")
+    return videos_for_this_run
 
 def main():
     """主函数，执行整个视频上传流程，包含定时和数量控制。"""
     script_directory = os.path.dirname(__file__)
+    runtime = None
+    control = None
+    init_logging()
+
+    import coordination # 多节点共享视频源时的租约协调
+    import control_api # 本地 HTTP 状态/控制接口
+    import staging # 源文件夹较慢时预先复制到本地磁盘
+    import circuit_breaker # 系统性失败时暂停派发
+    import segmentation # 超过平台限制的视频分段上传
+    import covers # 后台预先提取封面图片
+    from web import web_interaction, driver_watchdog, upload_verifier
 
     try:
         config_parser = load_config(script_directory)
-        video_source_folder = config_parser.get('General', 'video_source_folder')
-
-        upload_interval_hours = config_parser.getint('General', 'upload_interval_hours', fallback=8)
-        videos_per_batch = config_parser.getint('General', 'videos_per_batch', fallback=10)
-        start_video_number_initial = config_parser.getint('General', 'start_video_number_initial', fallback=111)
-        
-        # 文件移动相关配置 (成功上传的视频)
-        move_successful_files_enabled = config_parser.getboolean('General', 'move_uploaded_files', fallback=True)
-        raw_archive_folder = config_parser.get('General', 'uploaded_archive_folder', fallback='UploadedArchive')
+        configure_logging(config_parser)
+        # 清理上次异常退出时遗留的浏览器进程
+        driver_watchdog.cleanup_orphaned_drivers(config_parser)
+        runtime = prepare_runtime(config_parser, script_directory)
+        upload_interval_hours = runtime['upload_interval_hours']
+        videos_per_batch = runtime['videos_per_batch']
+        move_files_settings = runtime['move_files_settings']
         
-        # 新增：失败视频移动相关配置
-        move_failed_files_enabled = config_parser.getboolean('General', 'move_failed_videos', fallback=False)
-        raw_failed_videos_folder = config_parser.get('General', 'failed_videos_folder', fallback='FailedUploads')
-
-        # 处理存档文件夹路径 (成功上传)
-        if not os.path.isabs(raw_archive_folder):
-            archive_folder = os.path.join(script_directory, raw_archive_folder)
-        else:
-            archive_folder = raw_archive_folder
-
-        # 新增：处理失败视频文件夹路径
-        if not os.path.isabs(raw_failed_videos_folder):
-            failed_videos_folder = os.path.join(script_directory, raw_failed_videos_folder)
-        else:
-            failed_videos_folder = raw_failed_videos_folder
-
-        move_files_settings = {
-            'enabled': move_successful_files_enabled,
-            'archive_folder': archive_folder if move_successful_files_enabled else None,
-            'move_failed_enabled': move_failed_files_enabled,
-            'failed_videos_folder': failed_videos_folder if move_failed_files_enabled else None
-        }
-
-        raw_tracker_path_config = config_parser.get('General', 'uploaded_tracker_file', fallback='uploaded_videos_tracker.txt')
-        raw_tracker_path = raw_tracker_path_config.split('#')[0].strip()
-        if not os.path.isabs(raw_tracker_path):
-            tracker_file = os.path.join(script_directory, raw_tracker_path)
-        else:
-            tracker_file = raw_tracker_path
-        
-        logger.info(f"视频上传任务启动。源文件夹: {video_source_folder}, 追踪文件: {tracker_file}")
+        logger.info(f"视频上传任务启动。源文件夹: {runtime['video_source_folder']}, 追踪文件: {runtime['tracker_file']}")
         if move_files_settings['enabled']:
             logger.info(f"成功上传的视频将被移动到: {move_files_settings['archive_folder']}")
         else:
@@ -277,29 +678,60 @@ def main():
         else:
             logger.info("上传失败的视频将不会被移动。")
         logger.info(f"将每隔 {upload_interval_hours} 小时上传最多 {videos_per_batch} 个视频。")
-        logger.info(f"首次将从文件名编号不小于 {start_video_number_initial} 的视频开始处理。")
+        logger.info(f"首次将从文件名编号不小于 {runtime['start_video_number_initial']} 的视频开始处理。")
+        logger.info(f"待上传队列排序策略: {runtime['video_queue'].policy}，置顶文件: {runtime['video_queue'].pins_file}")
 
-        while True:
-            logger.info(f"开始新一轮视频上传检查 (间隔: {upload_interval_hours} 小时, 批次数量: {videos_per_batch})...")
-            
-            all_potential_videos = get_videos_from_folder(video_source_folder, tracker_file, start_video_number_initial)
-            
-            if not all_potential_videos:
-                logger.info("目前没有找到新的、符合条件的视频可供上传。")
-            else:
-                logger.info(f"找到 {len(all_potential_videos)} 个潜在待上传视频。")
-                
-                videos_for_this_run = all_potential_videos[:videos_per_batch]
-                logger.info(f"本轮将尝试上传 {len(videos_for_this_run)} 个视频: {videos_for_this_run}")
-                
-                # 注意：main_upload_cycle 现在可能会抛出 LoginFailureException
-                main_upload_cycle(config_parser, script_directory, videos_for_this_run, tracker_file, move_files_settings)
-                
-                if len(videos_for_this_run) < videos_per_batch:
-                    logger.info(f"本轮上传数量 ({len(videos_for_this_run)}) 少于批次上限 ({videos_per_batch})，可能所有符合条件的视频都已处理完毕。")
+        verifier = upload_verifier.UploadVerifier.from_config(config_parser)
+        if verifier:
+            verifier.start()
+            runtime['verifier'] = verifier
+            logger.info(f"已启用上传结果核对，状态将写入: {verifier.status_file}")
+
+        coordinator = coordination.LeaseCoordinator.from_config(config_parser)
+        if coordinator:
+            runtime['coordinator'] = coordinator.start()
 
-            logger.info(f"本轮上传结束。将在 {upload_interval_hours} 小时后再次检查。")
-            time.sleep(upload_interval_hours * 60 * 60)
+        staging_area = staging.StagingArea.from_config(config_parser)
+        if staging_area:
+            runtime['staging'] = staging_area.start()
+            logger.info(f"已启用本地暂存，目录: {staging_area.staging_dir}，预算 {staging_area.budget_bytes / 1024 ** 3:.1f} GB")
+
+        breaker = circuit_breaker.CircuitBreaker.from_config(config_parser)
+        if breaker:
+            # 记录每个视频失败在哪个步骤
+            web_interaction.add_step_listener(breaker)
+            runtime['breaker'] = breaker
+
+        splitter = segmentation.VideoSplitter.from_config(config_parser)
+        if splitter:
+            runtime['splitter'] = splitter
+            logger.info(f"超过限制的视频将分段上传 (时长上限 {splitter.max_duration / 60:.0f} 分钟, "
+                        f"大小上限 {splitter.max_bytes / 1024 / 1024:.0f} MB)，分段目录: {splitter.segments_dir}")
+
+        cover_prefetcher = covers.CoverPrefetcher.from_config(config_parser)
+        if cover_prefetcher:
+            runtime['covers'] = cover_prefetcher
+            logger.info(f"将上传预先提取的封面图片，封面目录: {cover_prefetcher.output_folder}")
+
+        control = control_api.ControlAPI.from_config(config_parser, runtime, control_api.ControlState())
+        if control:
+            runtime['control'] = control.state
+            control.start()
+
+        config_manager = settings.get_config_manager(get_config_path(script_directory))
+        while True:
+            if config_manager.reload_if_changed():
+                apply_runtime_settings(runtime, config_manager)
+            if runtime['control'] and not runtime['control'].checkpoint():
+                break
+            logger.info(f"开始新一轮视频上传检查 (间隔: {runtime['upload_interval_hours']} 小时, 批次数量: {runtime['videos_per_batch']})...")
+            run_cycle(runtime)
+            if runtime['control'] and runtime['control'].draining:
+                break
+            logger.info(f"本轮上传结束。将在 {runtime['upload_interval_hours']} 小时后再次检查。")
+            wait_for_next_cycle(runtime, config_manager, time.time())
+        runtime['control'].mark_drained()
+        logger.info("排空完成，程序退出。")
 
     except FileNotFoundError as e:
         logger.error(f"初始化错误 (文件未找到): {e}")
@@ -310,6 +742,17 @@ def main():
         # 此处不需要显式退出，异常会使 while True 循环停止
     except Exception as e:
         logger.error(f"发生未预期错误: {e}", exc_info=True)
+    finally:
+        if runtime and runtime['verifier']:
+            runtime['verifier'].stop(timeout=10)
+        if runtime and runtime['coordinator']:
+            runtime['coordinator'].stop()
+        if runtime and runtime['staging']:
+            runtime['staging'].stop()
+        if runtime and runtime['covers']:
+            runtime['covers'].stop()
+        if control:
+            control.stop()
 
 if __name__ == "__main__":
-    main() # 程序入口 
\ No newline at end of file
+    main() # 程序入口
@@ -0,0 +1,181 @@
+import os
+import json
+import logging
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+import video_index
+from web import video_utils
+
+logger = logging.getLogger(__name__)
+
+# 模板中可用的字段: {stem} {filename} {number} {duration} {duration_text} {date}，以及旁路 JSON 中的任意键
+DEFAULT_TITLE_TEMPLATE = "{stem}"
+DEFAULT_SIDECAR_EXTENSION = ".json"
+
+
+class _TemplateFields(dict):
+    """缺失的模板字段渲染为空字符串，并记录下来供校验报告。"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.missing = set()
+
+    def __missing__(self, key):
+        self.missing.add(key)
+        return ''
+
+
+class _AnyFormat:
+    """旁路 JSON 字段的占位值，接受任意格式说明。"""
+
+    def __format__(self, format_spec):
+        return ''
+
+
+class _SampleFields(dict):
+    def __missing__(self, key):
+        return _AnyFormat()
+
+
+_SAMPLE_FIELDS = _SampleFields(stem='clip_111', filename='clip_111.mp4', number=111, duration=60,
+                               duration_text='1:00', date='2025-01-01')
+
+
+def load_metadata_settings(config):
+    """从配置的 [Metadata] 部分读取模板和校验规则；未启用时返回 None。"""
+    if not config.getboolean('Metadata', 'enabled', fallback=False):
+        return None
+    settings = {
+        'title_template': config.get('Metadata', 'title_template', fallback=DEFAULT_TITLE_TEMPLATE, raw=True),
+        'description_template': config.get('Metadata', 'description_template', fallback='', raw=True),
+        'tag_templates': [t.strip() for t in config.get('Metadata', 'tags', fallback='', raw=True).split(',') if t.strip()],
+        'title_min_length': config.getint('Metadata', 'title_min_length', fallback=5),
+        'title_max_length': config.getint('Metadata', 'title_max_length', fallback=30),
+        'description_max_length': config.getint('Metadata', 'description_max_length', fallback=400),
+        'max_tags': config.getint('Metadata', 'max_tags', fallback=5),
+        'sidecar_extension': config.get('Metadata', 'sidecar_extension', fallback=DEFAULT_SIDECAR_EXTENSION),
+        'probe_duration': config.getboolean('Metadata', 'probe_duration', fallback=True),
+        'name_pattern': video_index.load_index_settings(config)['name_pattern'],
+    }
+    # 启动时即用示例字段渲染一次模板，语法或格式说明有误时在上传窗口之前就报错
+    for template in [settings['title_template'], settings['description_template']] + settings['tag_templates']:
+        template.format_map(_SAMPLE_FIELDS)
+    return settings
+
+
+def load_sidecar(video_path, extension=DEFAULT_SIDECAR_EXTENSION):
+    """读取与视频同名的旁路 JSON（例如 clip_115.json），不存在或无法解析时返回空字典。"""
+    sidecar_path = os.path.splitext(video_path)[0] + extension
+    try:
+        with open(sidecar_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        logger.warning(f"旁路元数据文件 {sidecar_path} 无法读取，将忽略: {e}")
+        return {}
+    if not isinstance(data, dict):
+        logger.warning(f"旁路元数据文件 {sidecar_path} 不是 JSON 对象，将忽略。")
+        return {}
+    return data
+
+
+def _format_duration(seconds):
+    if seconds is None:
+        return ''
+    minutes, secs = divmod(int(round(seconds)), 60)
+    return f"{minutes}:{secs:02d}"
+
+
+def build_fields(video_path, settings, duration=None, sidecar=None):
+    """构建一个视频的模板字段。"""
+    filename = os.path.basename(video_path)
+    try:
+        date = datetime.fromtimestamp(os.path.getmtime(video_path)).strftime('%Y-%m-%d')
+    except OSError:
+        date = ''
+    number = video_index.parse_video_number(filename, settings['name_pattern'])
+    fields = _TemplateFields(
+        stem=os.path.splitext(filename)[0],
+        filename=filename,
+        number=number if number is not None else '',
+        duration=int(round(duration)) if duration is not None else '',
+        duration_text=_format_duration(duration),
+        date=date,
+    )
+    for key, value in (sidecar or {}).items():
+        if key not in ('title', 'description', 'tags'):
+            fields[key] = value
+    return fields
+
+
+def render_metadata(video_path, settings, duration=None, sidecar=None):
+    """
+    渲染一个视频的标题、简介和标签，返回 {'title', 'description', 'tags', 'problems'}。
+    旁路 JSON 中直接给出的 title/description/tags 优先于模板。
+    """
+    sidecar = sidecar or {}
+    fields = build_fields(video_path, settings, duration, sidecar)
+
+    def render(template):
+        return ' '.join(template.format_map(fields).split())
+
+    try:
+        title = sidecar.get('title') or render(settings['title_template'])
+        description = sidecar.get('description') or render(settings['description_template'])
+        if isinstance(sidecar.get('tags'), list):
+            tags = [str(t).strip() for t in sidecar['tags']]
+        else:
+            tags = [render(t) for t in settings['tag_templates']]
+    except (ValueError, KeyError, IndexError, TypeError) as e:
+        # 字段为空（时长读取失败、文件名无编号）时带格式说明的模板（如 {duration:04d}）无法渲染
+        return {'title': '', 'description': '', 'tags': [], 'problems': [f"模板渲染失败: {e!r}"]}
+    tags = list(dict.fromkeys(t for t in tags if t)) # 去重并保持顺序
+
+    metadata = {'title': str(title).strip(), 'description': str(description).strip(), 'tags': tags}
+    metadata['problems'] = validate_metadata(metadata, settings)
+    if fields.missing:
+        metadata['problems'].append(f"模板字段缺失: {', '.join(sorted(fields.missing))}")
+    return metadata
+
+
+def validate_metadata(metadata, settings):
+    """检查渲染结果是否满足平台限制，返回问题列表（空列表表示通过）。"""
+    problems = []
+    title_length = len(metadata['title'])
+    if title_length < settings['title_min_length']:
+        problems.append(f"标题过短 ({title_length} < {settings['title_min_length']})")
+    if title_length > settings['title_max_length']:
+        problems.append(f"标题过长 ({title_length} > {settings['title_max_length']})")
+    if len(metadata['description']) > settings['description_max_length']:
+        problems.append(f"简介过长 ({len(metadata['description'])} > {settings['description_max_length']})")
+    if len(metadata['tags']) > settings['max_tags']:
+        problems.append(f"标签过多 ({len(metadata['tags'])} > {settings['max_tags']})")
+    return problems
+
+
+def prepare_batch(video_paths, settings, config, max_workers=4):
+    """
+    在上传窗口开始前批量渲染并校验一批视频的元数据。
+    ffprobe 读取时长在线程池中并发执行。返回 {视频路径: 元数据}；校验不通过的视频不在结果中，
+    上传时使用平台默认值。
+    """
+    if not settings or not video_paths:
+        return {}
+    durations = {}
+    if settings['probe_duration']:
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='probe-duration') as executor:
+            durations = dict(zip(video_paths, executor.map(lambda p: video_utils.probe_duration(p, config), video_paths)))
+
+    prepared = {}
+    for video_path in video_paths:
+        metadata = render_metadata(video_path, settings, durations.get(video_path),
+                                   load_sidecar(video_path, settings['sidecar_extension']))
+        problems = metadata.pop('problems')
+        if problems:
+            logger.error(f"视频 {os.path.basename(video_path)} 的元数据校验失败，将使用平台默认值: {'; '.join(problems)}")
+            continue
+        prepared[video_path] = metadata
+    logger.info(f"已为 {len(prepared)}/{len(video_paths)} 个视频准备好标题/简介/标签。")
+    return prepared
@@ -0,0 +1,155 @@
+import os
+import logging
+from concurrent.futures import ProcessPoolExecutor
+
+from web import video_utils
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SEGMENTS_DIR_NAME = "segments"
+DEFAULT_PART_TITLE_TEMPLATE = "{title} ({part}/{parts})"
+
+
+class VideoSplitter:
+    """
+    上传前把超过平台时长或大小限制的视频切成若干段，每段作为一个单独的上传。
+
+    先用 ffprobe 读取时长并规划分段，切点对齐到目标之前最近的关键帧，
+    再用流复制 (不重新编码) 截取，一批视频的所有分段在进程池中并行截取。
+    分段文件名固定 (clip_120_part01of03.mp4)，中途退出后下次直接复用已截好的分段，
+    已记录到追踪文件的分段不再上传。
+    """
+
+    def __init__(self, segments_dir, max_duration=0, max_bytes=0, margin=0.95, keyframe_window=30.0,
+                 max_workers=2, part_title_template=DEFAULT_PART_TITLE_TEMPLATE):
+        self.segments_dir = segments_dir
+        self.max_duration = max_duration
+        self.max_bytes = max_bytes
+        self.margin = margin
+        self.keyframe_window = keyframe_window
+        self.max_workers = max_workers
+        self.part_title_template = part_title_template
+        os.makedirs(segments_dir, exist_ok=True)
+
+    @classmethod
+    def from_config(cls, config):
+        """根据 [Splitting] 构建分段器；未启用或未设置任何限制时返回 None。相对路径相对于项目根目录。"""
+        if not config.getboolean('Splitting', 'enabled', fallback=False):
+            return None
+        max_duration = config.getfloat('Splitting', 'max_duration_minutes', fallback=0) * 60
+        max_bytes = int(config.getfloat('Splitting', 'max_size_mb', fallback=0) * 1024 * 1024)
+        if not max_duration and not max_bytes:
+            logger.warning("[Splitting] 已启用但未设置时长或大小限制，不会分段。")
+            return None
+        keyframe_window = config.getfloat('Splitting', 'keyframe_search_seconds', fallback=30)
+        margin = config.getfloat('Splitting', 'margin', fallback=0.95)
+        if max_duration and keyframe_window >= max_duration * margin / 2:
+            # 关键帧搜索范围不能超过分段长度的一半，否则切点可能落到上一个分段之前
+            keyframe_window = max_duration * margin / 2
+            logger.warning(f"[Splitting] keyframe_search_seconds 相对于 max_duration_minutes 过大，已调整为 {keyframe_window:.1f} 秒。")
+        segments_dir = config.get('Splitting', 'segments_dir', fallback=DEFAULT_SEGMENTS_DIR_NAME).strip() or DEFAULT_SEGMENTS_DIR_NAME
+        if not os.path.isabs(segments_dir):
+            segments_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), segments_dir)
+        return cls(
+            segments_dir,
+            max_duration=max_duration,
+            max_bytes=max_bytes,
+            margin=margin,
+            keyframe_window=keyframe_window,
+            max_workers=config.getint('Splitting', 'max_workers', fallback=2),
+            part_title_template=config.get('Splitting', 'part_title_template', fallback=DEFAULT_PART_TITLE_TEMPLATE, raw=True),
+        )
+
+    def _part_path(self, video_path, index, count):
+        stem, extension = os.path.splitext(os.path.basename(video_path))
+        return os.path.join(self.segments_dir, f"{stem}_part{index:02d}of{count:02d}{extension}")
+
+    def plan(self, video_path, config):
+        """
+        返回视频的分段计划 [(起点, 时长或 None, 分段路径), ...]；不超限时返回空列表。
+        只在设置了时长限制或文件接近大小限制时才用 ffprobe 读取时长。
+        """
+        try:
+            size = os.path.getsize(video_path)
+        except OSError as e:
+            logger.warning(f"无法读取视频大小 {video_path}: {e}")
+            return []
+        duration = None
+        if self.max_duration or size > self.max_bytes * self.margin:
+            duration = video_utils.probe_duration(video_path, config)
+        if not duration:
+            if self.max_bytes and size > self.max_bytes:
+                logger.error(f"视频 {os.path.basename(video_path)} 超过大小限制，但无法读取时长，不能分段。")
+            return []
+
+        targets = video_utils.plan_segments(duration, size, self.max_duration, self.max_bytes,
+                                            self.margin, self.keyframe_window)
+        if not targets:
+            return []
+        cuts = video_utils.probe_keyframes(video_path, config, targets, self.keyframe_window)
+        if cuts is None:
+            return []
+        starts = [0.0] + cuts
+        count = len(starts)
+        plan = []
+        for index, start in enumerate(starts):
+            end = starts[index + 1] if index + 1 < count else None
+            plan.append((start, end - start if end is not None else None, self._part_path(video_path, index + 1, count)))
+        logger.info(f"视频 {os.path.basename(video_path)} ({duration / 60:.1f} 分钟, {size / 1024 / 1024:.0f} MB) "
+                    f"超过上传限制，将分为 {count} 段: {', '.join(f'{start:.1f}s' for start, _, _ in plan)}")
+        return plan
+
+    def split_batch(self, video_paths, config, skip_parts=()):
+        """
+        为一批视频中超限的视频截取分段，返回 {原视频路径: [全部分段路径, ...]}（按顺序）。
+        skip_parts 中的分段（已上传过）和已存在的分段文件不再截取；任一分段截取失败的视频不在结果中，按原文件上传。
+        """
+        plans = {}
+        for video_path in video_paths:
+            plan = self.plan(video_path, config)
+            if plan:
+                plans[video_path] = plan
+        if not plans:
+            return {}
+
+        ffmpeg_executable = config.get('General', 'ffmpeg_path', fallback='ffmpeg')
+        jobs = [(video_path, start, length, part_path)
+                for video_path, plan in plans.items() for start, length, part_path in plan
+                if part_path not in skip_parts and not os.path.exists(part_path)]
+        failed = set()
+        if jobs:
+            with ProcessPoolExecutor(max_workers=min(self.max_workers, len(jobs))) as executor:
+                futures = [(video_path, executor.submit(video_utils.cut_segment, ffmpeg_executable, video_path,
+                                                        start, length, part_path))
+                           for video_path, start, length, part_path in jobs]
+                for video_path, future in futures:
+                    part_path, error = future.result()
+                    if error:
+                        logger.error(f"截取分段 {os.path.basename(part_path)} 失败: {error}")
+                        failed.add(video_path)
+            logger.info(f"已截取 {len(jobs)} 个分段 (并行 {min(self.max_workers, len(jobs))} 个)。")
+
+        splits = {}
+        for video_path, plan in plans.items():
+            if video_path in failed:
+                logger.error(f"视频 {os.path.basename(video_path)} 分段失败，将按原文件上传。")
+                continue
+            splits[video_path] = [part_path for _, _, part_path in plan]
+        return splits
+
+    def part_title(self, title, index, count, max_length=None):
+        """分段的标题：按 part_title_template 编号，超过 max_length 时截短原标题。"""
+        numbered = self.part_title_template.format(title=title, part=index, parts=count)
+        if max_length and len(numbered) > max_length:
+            overflow = len(numbered) - max_length
+            numbered = self.part_title_template.format(title=title[:max(len(title) - overflow, 1)], part=index, parts=count)
+        return numbered
+
+    def remove_parts(self, part_paths):
+        for part_path in part_paths:
+            try:
+                os.remove(part_path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"删除分段文件 {part_path} 失败: {e}")
@@ -0,0 +1,207 @@
+import os
+import re
+import logging
+import threading
+import configparser
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+# 一个受校验的配置项。type 为 str/int/float/bool 或可选值元组；minimum 为数值下限；
+# reloadable 表示运行中修改后无需重启即可生效。
+Option = namedtuple('Option', 'section key type default minimum reloadable')
+
+SCHEMA = (
+    Option('General', 'video_source_folder', str, None, None, False),
+    Option('General', 'uploaded_tracker_file', str, 'uploaded_videos_tracker.txt', None, False),
+    Option('General', 'upload_interval_hours', float, 8.0, 0.01, True),
+    Option('General', 'videos_per_batch', int, 10, 1, True),
+    Option('General', 'start_video_number_initial', int, 111, 0, True),
+    Option('General', 'move_uploaded_files', bool, True, None, False),
+    Option('General', 'uploaded_archive_folder', str, 'UploadedArchive', None, False),
+    Option('General', 'move_failed_videos', bool, False, None, False),
+    Option('General', 'failed_videos_folder', str, 'FailedUploads', None, False),
+    Option('WebTarget', 'upload_url', str, None, None, True),
+    Option('Logging', 'level', ('DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL'), 'INFO', None, False),
+    Option('BrowserSettings', 'headless', bool, False, None, True),
+    Option('BrowserSettings', 'low_footprint', bool, False, None, True),
+    Option('BrowserSettings', 'resource_sample_interval_seconds', float, 0.0, 0, True),
+    Option('Watchdog', 'max_uploads_per_driver', int, 1, 0, True),
+    Option('Watchdog', 'max_uptime_minutes', float, 0.0, 0, True),
+    Option('Watchdog', 'max_rss_mb', float, 0.0, 0, True),
+    Option('Watchdog', 'ping_timeout_seconds', float, 10.0, 0.1, True),
+    Option('Watchdog', 'quit_timeout_seconds', float, 30.0, 0.1, True),
+    Option('Queue', 'policy', ('', 'number', 'mtime', 'size', 'newest', 'shortest'), '', None, False),
+    Option('Settings', 'reload_poll_seconds', float, 60.0, 1, False),
+    Option('Coordination', 'enabled', bool, False, None, False),
+    Option('Coordination', 'lease_minutes', float, 10.0, 0.1, False),
+    Option('Coordination', 'heartbeat_seconds', float, 60.0, 1, False),
+    Option('ControlAPI', 'enabled', bool, False, None, False),
+    Option('ControlAPI', 'port', int, 8765, 0, False),
+    Option('Staging', 'enabled', bool, False, None, False),
+    Option('Staging', 'budget_gb', float, 20.0, 0, False),
+    Option('Staging', 'chunk_mb', int, 8, 1, False),
+    Option('CircuitBreaker', 'enabled', bool, False, None, False),
+    Option('CircuitBreaker', 'consecutive_failures', int, 3, 1, False),
+    Option('CircuitBreaker', 'failure_rate', float, 0.7, 0, False),
+    Option('CircuitBreaker', 'cooldown_minutes', float, 30.0, 0, False),
+    Option('VideoSettings', 'cover_mode', ('capture', 'upload'), 'capture', None, False),
+    Option('VideoSettings', 'cover_wait_seconds', float, 60.0, 0, False),
+    Option('Splitting', 'enabled', bool, False, None, False),
+    Option('Splitting', 'max_duration_minutes', float, 60.0, 0, False),
+    Option('Splitting', 'max_size_mb', float, 4096.0, 0, False),
+    Option('Splitting', 'max_workers', int, 2, 1, False),
+)
+_SCHEMA_BY_KEY = {(o.section, o.key): o for o in SCHEMA}
+
+
+class ConfigError(configparser.Error):
+    """配置文件校验失败。problems 为所有问题的列表。"""
+
+    def __init__(self, path, problems):
+        self.path = path
+        self.problems = problems
+        super().__init__(f"配置文件 {path} 校验失败: " + "; ".join(problems))
+
+
+def parse_config_file(config_path):
+    """
+    读取 config.ini。只有 SCHEMA 中数值、布尔和可选值类型的配置项允许在值后面写注释 (# 或 ;)，
+    标题/简介模板、标签、URL 等文本值中的 # 是值的一部分，原样保留。
+    """
+    config = configparser.ConfigParser()
+    # 以 UTF-8 编码读取配置文件，防止中文乱码
+    with open(config_path, 'r', encoding='utf-8') as f:
+        config.read_file(f)
+    for option in SCHEMA:
+        if option.type is not str and config.has_option(option.section, option.key):
+            raw = config.get(option.section, option.key, raw=True)
+            config.set(option.section, option.key, re.split(r'[#;]', raw, maxsplit=1)[0].strip())
+    return config
+
+
+def _convert(option, raw):
+    if isinstance(option.type, tuple):
+        value = raw.strip()
+        choices = {c.lower(): c for c in option.type}
+        if value.lower() not in choices:
+            raise ValueError(f"可选值为 {', '.join(c for c in option.type if c) or '(空)'}")
+        return choices[value.lower()]
+    if option.type is bool:
+        if raw.strip().lower() not in configparser.ConfigParser.BOOLEAN_STATES:
+            raise ValueError("应为 true/false")
+        return configparser.ConfigParser.BOOLEAN_STATES[raw.strip().lower()]
+    value = option.type(raw.strip())
+    if option.minimum is not None and value < option.minimum:
+        raise ValueError(f"不能小于 {option.minimum}")
+    return value
+
+
+def validate(config):
+    """按 SCHEMA 校验配置，返回 (类型化的值字典 {(section, key): value}, 问题列表)。"""
+    values = {}
+    problems = []
+    for option in SCHEMA:
+        raw = config.get(option.section, option.key, fallback=None, raw=True)
+        if raw is None or (raw.strip() == '' and option.type in (int, float, bool)):
+            if option.default is None:
+                problems.append(f"[{option.section}] {option.key} 未配置")
+            values[(option.section, option.key)] = option.default
+            continue
+        if option.default is None and not raw.strip():
+            problems.append(f"[{option.section}] {option.key} 不能为空")
+        try:
+            values[(option.section, option.key)] = _convert(option, raw)
+        except ValueError as e:
+            problems.append(f"[{option.section}] {option.key} = {raw!r} 无效: {e}")
+            values[(option.section, option.key)] = option.default
+    return values, problems
+
+
+class ConfigManager:
+    """
+    持有当前生效的配置：启动时解析并校验一次，之后缓存；reload_if_changed() 在文件修改后重新加载。
+    新配置校验失败时保留旧配置并记录错误，不会让运行中的进程因为写到一半的配置文件而中断。
+    需要重启才能生效的配置项被修改时只记录警告。
+    """
+
+    def __init__(self, config_path):
+        self.config_path = config_path
+        self._lock = threading.Lock()
+        self.version = 0
+        self._signature = None
+        self.config = None
+        self.values = {}
+        self._load(initial=True)
+
+    def _file_signature(self):
+        stat = os.stat(self.config_path)
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _load(self, initial=False):
+        signature = self._file_signature()
+        config = parse_config_file(self.config_path)
+        values, problems = validate(config)
+        if problems:
+            raise ConfigError(self.config_path, problems)
+        self.config = config
+        self.values = values
+        self._signature = signature
+        self.version += 1
+        if not initial:
+            logger.info(f"配置文件已重新加载 (第 {self.version} 版)。")
+
+    def get(self, section, key):
+        """返回 SCHEMA 中配置项的类型化值。"""
+        return self.values[(section, key)]
+
+    @property
+    def reload_poll_seconds(self):
+        return self.get('Settings', 'reload_poll_seconds')
+
+    def reload_if_changed(self):
+        """文件有变化时重新加载，返回发生变化的 (section, key) 集合；未变化或新配置无效时返回空集合。"""
+        with self._lock:
+            try:
+                if self._file_signature() == self._signature:
+                    return set()
+                old_config = self.config
+                self._load()
+            except ConfigError as e:
+                logger.error(f"新配置无效，继续使用旧配置: {e}")
+                self._signature = self._file_signature()
+                return set()
+            except (OSError, configparser.Error) as e:
+                logger.error(f"重新加载配置文件失败，继续使用旧配置: {e}")
+                return set()
+
+            changed = {
+                (section, key)
+                for section in set(old_config.sections()) | set(self.config.sections())
+                for key in set(old_config[section] if old_config.has_section(section) else ()) |
+                           set(self.config[section] if self.config.has_section(section) else ())
+                if old_config.get(section, key, fallback=None, raw=True) != self.config.get(section, key, fallback=None, raw=True)
+            }
+            if not changed:
+                return set()
+            needs_restart = sorted(f"[{s}] {k}" for s, k in changed
+                                   if (s, k) in _SCHEMA_BY_KEY and not _SCHEMA_BY_KEY[(s, k)].reloadable)
+            if needs_restart:
+                logger.warning(f"以下配置项的修改需要重启后才能生效: {', '.join(needs_restart)}")
+            logger.info(f"配置已更新: {', '.join(sorted(f'[{s}] {k}' for s, k in changed))}")
+            return changed
+
+
+_managers = {}
+_managers_lock = threading.Lock()
+
+
+def get_config_manager(config_path):
+    """返回该配置文件的 ConfigManager（同一路径在进程内只解析一次）。"""
+    config_path = os.path.abspath(config_path)
+    with _managers_lock:
+        manager = _managers.get(config_path)
+        if manager is None:
+            manager = ConfigManager(config_path)
+            _managers[config_path] = manager
+        return manager
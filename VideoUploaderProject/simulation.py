@@ -0,0 +1,340 @@
+"""
+不启动浏览器的模拟运行模式。
+
+在 web_interaction 边界用模拟后端替换 create_driver / login_to_website / perform_video_upload，
+按 [Simulation] 中配置的耗时和失败率分布返回结果，并使用虚拟时钟代替 time.sleep / time.time。
+扫描、队列、追踪文件、存档/失败文件夹等逻辑与正式运行完全相同，只是运行在临时沙盒目录中，
+一周的定时上传可以在几秒内跑完，用于调整批次大小、间隔、队列策略和回收阈值等参数。
+
+用法（在 VideoUploaderProject 目录下）:
+    python simulation.py --days 7 --files 50000 --seed 1
+"""
+import argparse
+import configparser
+import json
+import logging
+import math
+import os
+import random
+import shutil
+import tempfile
+import time
+from contextlib import contextmanager
+
+import main as uploader
+from web import web_interaction, video_utils, driver_watchdog
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DISTRIBUTIONS = {
+    'create_driver_latency': 'lognormal:8,0.3',
+    'login_latency': 'normal:6,2',
+    'upload_latency': 'lognormal:120,0.4',
+    'publish_latency': 'uniform:2,6',
+    'video_duration': 'uniform:30,600',
+}
+
+
+def parse_distribution(spec):
+    """
+    解析分布描述，返回 sample(rng) -> 非负浮点数。支持:
+    fixed:V, uniform:A,B, normal:MEAN,STD, lognormal:MEDIAN,SIGMA, exp:MEAN
+    """
+    kind, _, params = spec.strip().partition(':')
+    try:
+        values = [float(v) for v in params.split(',') if v.strip()]
+    except ValueError:
+        raise ValueError(f"无效的分布参数: {spec}")
+    kind = kind.strip().lower()
+    expected = {'fixed': 1, 'uniform': 2, 'normal': 2, 'lognormal': 2, 'exp': 1}
+    if kind not in expected or len(values) != expected[kind]:
+        raise ValueError(f"无效的分布描述 '{spec}'，可选: fixed:V, uniform:A,B, normal:MEAN,STD, lognormal:MEDIAN,SIGMA, exp:MEAN")
+    if kind == 'fixed':
+        return lambda rng: max(0.0, values[0])
+    if kind == 'uniform':
+        return lambda rng: max(0.0, rng.uniform(values[0], values[1]))
+    if kind == 'normal':
+        return lambda rng: max(0.0, rng.gauss(values[0], values[1]))
+    if kind == 'lognormal':
+        mu = math.log(values[0]) if values[0] > 0 else 0.0
+        return lambda rng: rng.lognormvariate(mu, values[1])
+    return lambda rng: rng.expovariate(1.0 / values[0]) if values[0] > 0 else 0.0
+
+
+class VirtualClock:
+    """虚拟时钟：sleep() 只推进时间，不真正等待。未实现的属性回退到 time 模块。"""
+
+    def __init__(self, start=None):
+        self._now = start if start is not None else time.time()
+        self._start = self._now
+
+    def time(self):
+        return self._now
+
+    def monotonic(self):
+        return self._now - self._start
+
+    perf_counter = monotonic
+
+    def sleep(self, seconds):
+        self._now += max(0.0, seconds)
+
+    def elapsed(self):
+        return self._now - self._start
+
+    def __getattr__(self, name):
+        return getattr(time, name)
+
+
+class FakeDriver:
+    """模拟的 WebDriver，只实现上传流程和 watchdog 用到的接口。"""
+
+    def __init__(self, backend):
+        self._backend = backend
+        self.current_url = None
+        self.quit_called = False
+
+    def get(self, url):
+        self.current_url = url
+
+    def execute_script(self, script, *args):
+        return 1
+
+    def get_cookies(self):
+        return []
+
+    def quit(self):
+        self.quit_called = True
+        self._backend.stats['drivers_closed'] += 1
+
+
+class SimulatedBackend:
+    """按配置的分布模拟浏览器创建、登录和上传的耗时与失败。"""
+
+    def __init__(self, clock, rng, distributions=None, create_failure_rate=0.0,
+                 login_failure_rate=0.0, upload_failure_rate=0.0):
+        distributions = dict(DEFAULT_DISTRIBUTIONS, **(distributions or {}))
+        self.clock = clock
+        self.rng = rng
+        self.samplers = {name: parse_distribution(spec) for name, spec in distributions.items()}
+        self.create_failure_rate = create_failure_rate
+        self.login_failure_rate = login_failure_rate
+        self.upload_failure_rate = upload_failure_rate
+        self.stats = {'drivers_created': 0, 'drivers_closed': 0, 'create_failures': 0, 'logins': 0,
+                      'login_failures': 0, 'uploads': 0, 'upload_failures': 0}
+
+    @classmethod
+    def from_config(cls, config, clock, rng):
+        distributions = {name: config.get('Simulation', name, fallback=default)
+                         for name, default in DEFAULT_DISTRIBUTIONS.items()}
+        return cls(
+            clock, rng, distributions,
+            create_failure_rate=config.getfloat('Simulation', 'create_failure_rate', fallback=0.01),
+            login_failure_rate=config.getfloat('Simulation', 'login_failure_rate', fallback=0.0),
+            upload_failure_rate=config.getfloat('Simulation', 'upload_failure_rate', fallback=0.05),
+        )
+
+    def _wait(self, name):
+        self.clock.sleep(self.samplers[name](self.rng))
+
+    def create_driver(self, config):
+        self._wait('create_driver_latency')
+        if self.rng.random() < self.create_failure_rate:
+            self.stats['create_failures'] += 1
+            return None
+        self.stats['drivers_created'] += 1
+        return FakeDriver(self)
+
+    def login_to_website(self, driver, config):
+        self._wait('login_latency')
+        self.stats['logins'] += 1
+        if self.rng.random() < self.login_failure_rate:
+            self.stats['login_failures'] += 1
+            return False
+        driver.get(config.get('WebTarget', 'upload_url', fallback=''))
+        return True
+
+    def perform_video_upload(self, driver, video_file_path, video_title, cover_image_path, config,
+                             description=None, tags=None):
+        # 与真实流程一样发出步骤事件，步骤监听器（统计、自适应超时等）在模拟中同样生效
+        steps = web_interaction._StepRecorder(video_file_path)
+        self.stats['uploads'] += 1
+        fail_at = None
+        if self.rng.random() < self.upload_failure_rate:
+            fail_at = self.rng.choice(('file_input', 'processing_text', 'publish'))
+        for step, latency in (('file_input', None), ('processing_text', 'upload_latency'), ('publish', 'publish_latency')):
+            steps.start(step)
+            if latency:
+                self._wait(latency)
+            else:
+                self.clock.sleep(1)
+            if step == fail_at:
+                steps.fail()
+                self.stats['upload_failures'] += 1
+                return False
+        steps.finish()
+        return True
+
+    def probe_duration(self, video_path, config):
+        return self.samplers['video_duration'](self.rng)
+
+
+@contextmanager
+def install(backend, clock):
+    """在 web_interaction 边界装入模拟后端，并让主流程使用虚拟时钟；退出时恢复原函数。"""
+    patches = [
+        (web_interaction, 'create_driver', backend.create_driver),
+        (web_interaction, 'login_to_website', backend.login_to_website),
+        (web_interaction, 'perform_video_upload', backend.perform_video_upload),
+        (video_utils, 'probe_duration', backend.probe_duration),
+        (web_interaction, 'time', clock),
+        (driver_watchdog, 'time', clock),
+        (uploader, 'time', clock),
+    ]
+    originals = [(module, name, getattr(module, name)) for module, name, _ in patches]
+    try:
+        for module, name, replacement in patches:
+            setattr(module, name, replacement)
+        yield backend
+    finally:
+        for module, name, original in originals:
+            setattr(module, name, original)
+
+
+def build_simulation_config(config, work_dir):
+    """复制配置，并把所有会被写入的路径指向沙盒目录，关闭需要网络或真实视频的功能。"""
+    sim_config = configparser.ConfigParser()
+    sim_config.read_dict({section: dict(config.items(section, raw=True)) for section in config.sections()})
+    for section in ('General', 'WebTarget', 'Queue', 'Watchdog', 'UploadVerifier', 'Metadata', 'BrowserSettings'):
+        if not sim_config.has_section(section):
+            sim_config.add_section(section)
+    sim_config.set('General', 'video_source_folder', os.path.join(work_dir, 'videos'))
+    sim_config.set('General', 'uploaded_tracker_file', os.path.join(work_dir, 'uploaded_videos_tracker.txt'))
+    sim_config.set('General', 'uploaded_archive_folder', os.path.join(work_dir, 'UploadedArchive'))
+    sim_config.set('General', 'failed_videos_folder', os.path.join(work_dir, 'FailedUploads'))
+    sim_config.set('Queue', 'state_file', os.path.join(work_dir, 'upload_queue.json'))
+    sim_config.set('Queue', 'pins_file', os.path.join(work_dir, 'pinned_videos.txt'))
+    sim_config.set('Watchdog', 'pid_registry_file', os.path.join(work_dir, 'driver_pids.json'))
+    sim_config.set('UploadVerifier', 'enabled', 'false')
+    sim_config.set('Metadata', 'probe_duration', 'false')
+    sim_config.set('BrowserSettings', 'resource_sample_interval_seconds', '0')
+    return sim_config
+
+
+def create_video_files(folder, count, start_number, mirror_folder=None):
+    """在沙盒中创建空的视频文件；指定 mirror_folder 时复制其文件名（不复制内容）。"""
+    os.makedirs(folder, exist_ok=True)
+    if mirror_folder:
+        with os.scandir(mirror_folder) as it:
+            names = [entry.name for entry in it if entry.is_file()]
+    else:
+        names = [f"sim_{start_number + i:06d}.mp4" for i in range(count)]
+    for name in names:
+        open(os.path.join(folder, name), 'wb').close()
+    return len(names)
+
+
+def _count_files(folder):
+    return len(os.listdir(folder)) if os.path.isdir(folder) else 0
+
+
+def run_simulation(config, days=7.0, files=50000, mirror_folder=None, seed=None, work_dir=None):
+    """运行一次模拟并返回结果字典。未指定 work_dir 时使用临时目录并在结束后删除。"""
+    keep_work_dir = work_dir is not None
+    work_dir = work_dir or tempfile.mkdtemp(prefix='upload_sim_')
+    sim_config = build_simulation_config(config, work_dir)
+    start_number = sim_config.getint('General', 'start_video_number_initial', fallback=111)
+    created = create_video_files(os.path.join(work_dir, 'videos'), files, start_number, mirror_folder)
+
+    clock = VirtualClock()
+    backend = SimulatedBackend.from_config(config, clock, random.Random(seed))
+    cycles = 0
+    attempted = 0
+    login_failure = None
+    wall_started = time.perf_counter()
+    try:
+        with install(backend, clock):
+            runtime = uploader.prepare_runtime(sim_config, work_dir)
+            end_time = clock.time() + days * 24 * 60 * 60
+            while clock.time() < end_time:
+                cycles += 1
+                try:
+                    attempted += len(uploader.run_cycle(runtime))
+                except uploader.LoginFailureException as e:
+                    # 与正式运行一致：登录失败时程序终止
+                    login_failure = str(e)
+                    break
+                clock.sleep(runtime['upload_interval_hours'] * 60 * 60)
+            remaining = len(runtime['video_queue'])
+        archived = _count_files(os.path.join(work_dir, 'UploadedArchive'))
+        failed_moved = _count_files(os.path.join(work_dir, 'FailedUploads'))
+        tracked = 0
+        tracker_path = os.path.join(work_dir, 'uploaded_videos_tracker.txt')
+        if os.path.exists(tracker_path):
+            with open(tracker_path, 'r', encoding='utf-8') as f:
+                tracked = sum(1 for line in f if line.strip())
+    finally:
+        if not keep_work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    return {
+        'files': created,
+        'days_simulated': clock.elapsed() / (24 * 60 * 60),
+        'wall_time_seconds': time.perf_counter() - wall_started,
+        'cycles': cycles,
+        'attempted': attempted,
+        'tracked': tracked,
+        'archived': archived,
+        'moved_to_failed': failed_moved,
+        'remaining_in_queue': remaining,
+        'terminated_by_login_failure': login_failure,
+        'backend': dict(backend.stats),
+        'work_dir': work_dir if keep_work_dir else None,
+    }
+
+
+def print_report(report):
+    print(f"模拟视频文件: {report['files']}  模拟时长: {report['days_simulated']:.2f} 天  实际耗时: {report['wall_time_seconds']:.1f}s")
+    print(f"上传轮数: {report['cycles']}  尝试上传: {report['attempted']}  追踪文件记录: {report['tracked']}")
+    print(f"已存档: {report['archived']}  移入失败文件夹: {report['moved_to_failed']}  队列剩余: {report['remaining_in_queue']}")
+    stats = report['backend']
+    print(f"浏览器创建: {stats['drivers_created']} (失败 {stats['create_failures']})  关闭: {stats['drivers_closed']}  "
+          f"登录: {stats['logins']} (失败 {stats['login_failures']})  上传: {stats['uploads']} (失败 {stats['upload_failures']})")
+    if report['terminated_by_login_failure']:
+        print(f"模拟因登录失败提前终止: {report['terminated_by_login_failure']}")
+    if report['work_dir']:
+        print(f"沙盒目录已保留: {report['work_dir']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="不启动浏览器，用模拟后端和虚拟时钟运行完整的定时上传流程。")
+    parser.add_argument('--days', type=float, default=7.0, help="模拟的天数")
+    parser.add_argument('--files', type=int, default=50000, help="沙盒中生成的视频文件数量")
+    parser.add_argument('--mirror-folder', help="复制该文件夹中的文件名（不复制内容）代替生成的文件")
+    parser.add_argument('--seed', type=int, help="随机种子，便于复现")
+    parser.add_argument('--work-dir', help="沙盒目录（保留以便检查追踪文件、存档等结果），默认使用临时目录")
+    parser.add_argument('--log-level', default='CRITICAL', help="模拟期间的日志级别 (默认只显示导致终止的错误)")
+    parser.add_argument('--json', dest='json_path', help="将结果以 JSON 写入指定文件")
+    args = parser.parse_args(argv)
+
+    # web_interaction 等模块给自己的 logger 设置了 INFO 级别，只设置根 logger 的级别挡不住它们的警告
+    # (没有处理器时会交给 logging.lastResort 输出)，所以在根 logger 的处理器上按级别过滤
+    level = args.log_level.upper()
+    root_logger = logging.getLogger()
+    if not root_logger.handlers:
+        root_logger.addHandler(logging.StreamHandler())
+    root_logger.setLevel(level)
+    for handler in root_logger.handlers:
+        handler.setLevel(level)
+    config = uploader.load_config(os.path.dirname(os.path.abspath(__file__)))
+    report = run_simulation(config, days=args.days, files=args.files, mirror_folder=args.mirror_folder,
+                            seed=args.seed, work_dir=args.work_dir)
+    print_report(report)
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"结果已写入: {args.json_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+import os
+import time
+import shutil
+import logging
+import threading
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STAGING_DIR_NAME = "staging"
+_PART_SUFFIX = ".part"
+# 记录本类在暂存目录中创建的文件，启动时只清理其中列出的文件
+_MANIFEST_NAME = ".staging_manifest"
+
+
+class StagingArea:
+    """
+    把即将上传的视频预先从（慢速/网络）源文件夹复制到本地暂存目录，浏览器直接从本地磁盘读取。
+
+    prefetch() 把视频按顺序加入后台复制队列，单个后台线程用大块顺序读写逐个复制，
+    暂存目录中的文件总大小不超过 budget_bytes，空间不足时等待 release() 释放。
+    local_path() 在上传前调用：已暂存的视频返回本地路径，正在复制的等待复制完成，
+    其余情况（未排队、预算不足、复制失败）直接返回源路径，上传流程不受影响。
+    暂存文件保留源文件名，平台以文件名作为默认标题时结果不变。
+    暂存目录中由本类创建的文件记录在清单文件中，启动时只删除清单中的遗留文件，目录中的其他文件不受影响。
+    """
+
+    def __init__(self, staging_dir, budget_bytes, chunk_size=8 * 1024 * 1024, min_free_bytes=0):
+        self.staging_dir = staging_dir
+        self.budget_bytes = budget_bytes
+        self.chunk_size = chunk_size
+        self.min_free_bytes = min_free_bytes
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._pending = deque() # 等待复制的源路径
+        self._staged = {} # 源路径 -> 暂存路径
+        self._sizes = {} # 源路径 -> 文件大小（已暂存或正在复制，计入预算）
+        self._copying = None
+        self._cancelled = False # 正在复制的视频已被 release()，复制完成后直接删除
+        self._blocked = False # 后台线程因暂存空间不足而等待
+        self._stop = False
+        self._thread = None
+        os.makedirs(staging_dir, exist_ok=True)
+        self._remove_leftovers()
+
+    @classmethod
+    def from_config(cls, config):
+        """根据 [Staging] 构建暂存区；未启用时返回 None。相对路径相对于项目根目录。"""
+        if not config.getboolean('Staging', 'enabled', fallback=False):
+            return None
+        staging_dir = config.get('Staging', 'staging_dir', fallback=DEFAULT_STAGING_DIR_NAME).strip() or DEFAULT_STAGING_DIR_NAME
+        project_root = os.path.dirname(os.path.abspath(__file__))
+        if not os.path.isabs(staging_dir):
+            staging_dir = os.path.join(project_root, staging_dir)
+        # 暂存副本与源文件同名，暂存目录不能是视频源、存档或失败文件夹，否则释放副本时会删除原视频
+        for key in ('video_source_folder', 'uploaded_archive_folder', 'failed_videos_folder'):
+            folder = config.get('General', key, fallback='').strip()
+            if folder and os.path.realpath(os.path.join(project_root, folder)) == os.path.realpath(staging_dir):
+                logger.error(f"[Staging] staging_dir 与 [General] {key} 是同一个目录，暂存功能不会启动。")
+                return None
+        return cls(
+            staging_dir,
+            budget_bytes=int(config.getfloat('Staging', 'budget_gb', fallback=20) * 1024 ** 3),
+            chunk_size=config.getint('Staging', 'chunk_mb', fallback=8) * 1024 * 1024,
+            min_free_bytes=int(config.getfloat('Staging', 'min_free_gb', fallback=2) * 1024 ** 3),
+        )
+
+    def _remove_leftovers(self):
+        # 上次运行留下的暂存文件无法确认是否完整，删除清单中记录的文件（包括未完成的 .part 文件）
+        try:
+            with open(os.path.join(self.staging_dir, _MANIFEST_NAME), 'r', encoding='utf-8') as f:
+                names = [line.strip() for line in f if line.strip()]
+        except FileNotFoundError:
+            names = []
+        for name in names:
+            if os.path.basename(name) != name:
+                continue
+            for path in (os.path.join(self.staging_dir, name), os.path.join(self.staging_dir, name + _PART_SUFFIX)):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    logger.warning(f"删除遗留的暂存文件 {path} 失败: {e}")
+        self._write_manifest()
+
+    def _write_manifest(self):
+        """把已暂存和正在复制的文件名写入清单（调用方持有锁或尚未启动线程）。"""
+        names = [os.path.basename(path) for path in self._staged.values()]
+        if self._copying:
+            names.append(os.path.basename(self._copying))
+        manifest_path = os.path.join(self.staging_dir, _MANIFEST_NAME)
+        temp_path = f"{manifest_path}.{os.getpid()}.tmp"
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                f.writelines(name + "\n" for name in names)
+            os.replace(temp_path, manifest_path)
+        except OSError as e:
+            logger.warning(f"写入暂存清单 {manifest_path} 失败: {e}")
+
+    def _staged_path(self, source_path):
+        return os.path.join(self.staging_dir, os.path.basename(source_path))
+
+    # --- 对外接口 ---
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='staging-prefetch', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        with self._changed:
+            self._stop = True
+            self._pending.clear()
+            self._changed.notify_all()
+        if self._thread:
+            self._thread.join(timeout=10)
+        for source_path in list(self._staged):
+            self.release(source_path)
+
+    def prefetch(self, source_paths):
+        """按顺序把视频加入后台复制队列（已暂存或已排队的视频会被跳过）。"""
+        with self._changed:
+            for source_path in source_paths:
+                if source_path in self._staged or source_path in self._pending or source_path == self._copying:
+                    continue
+                self._pending.append(source_path)
+            # 由后台线程按新的队列重新判断空间是否足够
+            self._blocked = False
+            self._changed.notify_all()
+
+    def local_path(self, source_path, timeout=None):
+        """
+        返回上传时应使用的路径：已暂存的本地副本，或源路径。
+        视频正在复制或排在复制队列中时最多等待 timeout 秒；复制因空间不足而停滞时不等待。
+        """
+        def _settled():
+            if source_path == self._copying:
+                return False
+            return source_path not in self._pending or self._blocked or self._stop
+
+        with self._changed:
+            if not _settled():
+                logger.info(f"等待视频 {os.path.basename(source_path)} 复制到暂存目录...")
+                self._changed.wait_for(_settled, timeout=timeout)
+            if source_path in self._pending:
+                # 还没开始复制（通常是因为暂存空间不足），直接从源文件夹上传
+                self._pending.remove(source_path)
+            staged_path = self._staged.get(source_path)
+        return staged_path or source_path
+
+    def release(self, source_path):
+        """上传结束后删除暂存副本，释放预算。"""
+        with self._changed:
+            if source_path in self._pending:
+                self._pending.remove(source_path)
+            staged_path = self._staged.pop(source_path, None)
+            if source_path == self._copying:
+                self._cancelled = True
+            else:
+                self._sizes.pop(source_path, None)
+            if staged_path:
+                self._write_manifest()
+            self._changed.notify_all()
+        if staged_path:
+            try:
+                os.remove(staged_path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"删除暂存文件 {staged_path} 失败: {e}")
+
+    def used_bytes(self):
+        with self._lock:
+            return sum(self._sizes.values())
+
+    # --- 后台复制 ---
+
+    def _fits(self, size):
+        if sum(self._sizes.values()) + size > self.budget_bytes:
+            return False
+        return shutil.disk_usage(self.staging_dir).free - size >= self.min_free_bytes
+
+    def _run(self):
+        while True:
+            with self._changed:
+                while not self._stop:
+                    if self._pending:
+                        source_path = self._pending[0]
+                        try:
+                            size = os.path.getsize(source_path)
+                        except OSError as e:
+                            logger.warning(f"无法读取待暂存视频 {source_path}: {e}")
+                            self._pending.popleft()
+                            continue
+                        if size > self.budget_bytes:
+                            logger.info(f"视频 {os.path.basename(source_path)} 大于暂存预算，将直接从源文件夹上传。")
+                            self._pending.popleft()
+                            continue
+                        self._blocked = not self._fits(size)
+                        if not self._blocked:
+                            self._pending.popleft()
+                            self._copying = source_path
+                            self._cancelled = False
+                            self._sizes[source_path] = size
+                            # 开始复制前先记入清单，中途退出后下次启动能清理 .part 文件
+                            self._write_manifest()
+                            break
+                        self._changed.notify_all()
+                    # 队列为空或空间不足时等待新的视频或 release()，空间不足时定期重新检查磁盘剩余空间
+                    self._changed.wait(timeout=30 if self._pending else None)
+                if self._stop:
+                    return
+
+            staged_path = self._staged_path(source_path)
+            started_at = time.monotonic()
+            try:
+                self._copy(source_path, staged_path)
+            except OSError as e:
+                logger.warning(f"复制视频 {source_path} 到暂存目录失败，将直接从源文件夹上传: {e}")
+                staged_path = None
+            elapsed = time.monotonic() - started_at
+
+            with self._changed:
+                self._copying = None
+                if staged_path and self._cancelled:
+                    os.remove(staged_path)
+                    staged_path = None
+                if staged_path:
+                    self._staged[source_path] = staged_path
+                    logger.debug(f"已暂存 {os.path.basename(source_path)} ({size / 1024 / 1024:.1f} MB, "
+                                 f"{size / 1024 / 1024 / max(elapsed, 1e-6):.1f} MB/s)")
+                else:
+                    self._sizes.pop(source_path, None)
+                self._write_manifest()
+                self._changed.notify_all()
+
+    def _copy(self, source_path, staged_path):
+        """大块顺序读写，先写入 .part 临时文件，完成并校验大小后再改名。"""
+        temp_path = staged_path + _PART_SUFFIX
+        buffer = bytearray(self.chunk_size)
+        view = memoryview(buffer)
+        try:
+            with open(source_path, 'rb', buffering=0) as src, open(temp_path, 'wb', buffering=0) as dst:
+                while not self._stop:
+                    read = src.readinto(buffer)
+                    if not read:
+                        break
+                    dst.write(view[:read])
+            if self._stop:
+                raise OSError("暂存区已停止")
+            if os.path.getsize(temp_path) != os.path.getsize(source_path):
+                raise OSError("复制后的文件大小与源文件不一致")
+            os.replace(temp_path, staged_path)
+        except OSError:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            raise
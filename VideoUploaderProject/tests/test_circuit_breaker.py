@@ -0,0 +1,140 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from circuit_breaker import CircuitBreaker, CLOSED, OPEN, HALF_OPEN
+
+
+def _step_failed(video, step):
+    return {'video': video, 'step': step, 'status': 'failed', 'elapsed': 1.0, 'thread': 'MainThread'}
+
+
+class CircuitBreakerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.state_file = os.path.join(self.work_dir, 'circuit_breaker.json')
+        self.now = 1000000.0
+        patcher = mock.patch('circuit_breaker.time.time', side_effect=lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # 熔断器会输出 INFO/WARNING/ERROR 日志，测试中不显示
+        logging_patcher = mock.patch('circuit_breaker.logger')
+        logging_patcher.start()
+        self.addCleanup(logging_patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    def _breaker(self, **kwargs):
+        options = dict(consecutive_failures=3, window=10, failure_rate=0.7, min_window=5,
+                       cooldown=60.0, max_cooldown=300.0, state_file=self.state_file)
+        options.update(kwargs)
+        return CircuitBreaker(**options)
+
+    def _fail(self, breaker, video, step):
+        breaker(_step_failed(video, step))
+        breaker.record_result(video, False)
+
+    def test_opens_after_consecutive_failures_of_one_step(self):
+        breaker = self._breaker()
+        self._fail(breaker, '/videos/1.mp4', 'publish')
+        self._fail(breaker, '/videos/2.mp4', 'publish')
+        self.assertEqual(breaker.state, CLOSED)
+        self.assertTrue(breaker.allow())
+        self._fail(breaker, '/videos/3.mp4', 'publish')
+        self.assertEqual(breaker.state, OPEN)
+        self.assertIn('publish', breaker.reason)
+        self.assertFalse(breaker.allow())
+
+    def test_success_resets_consecutive_count(self):
+        breaker = self._breaker()
+        self._fail(breaker, '/videos/1.mp4', 'publish')
+        self._fail(breaker, '/videos/2.mp4', 'publish')
+        breaker.record_result('/videos/3.mp4', True)
+        self._fail(breaker, '/videos/4.mp4', 'publish')
+        self.assertEqual(breaker.state, CLOSED)
+
+    def test_opens_on_failure_rate_across_steps(self):
+        breaker = self._breaker(consecutive_failures=10)
+        for index, step in enumerate(('login', 'publish', 'file_input', 'login')):
+            self._fail(breaker, f'/videos/{index}.mp4', step)
+        self.assertEqual(breaker.state, CLOSED) # 不足 min_window 个视频
+        self._fail(breaker, '/videos/4.mp4', 'login')
+        self.assertEqual(breaker.state, OPEN)
+        self.assertIn('login', breaker.reason)
+
+    def test_failure_rate_below_threshold_stays_closed(self):
+        breaker = self._breaker(consecutive_failures=10)
+        for index in range(6):
+            if index % 2:
+                breaker.record_result(f'/videos/{index}.mp4', True)
+            else:
+                self._fail(breaker, f'/videos/{index}.mp4', 'publish')
+        self.assertEqual(breaker.state, CLOSED)
+
+    def test_step_events_match_results_by_file_name(self):
+        # 启用暂存时步骤事件中是暂存副本的路径
+        breaker = self._breaker(consecutive_failures=1)
+        breaker(_step_failed('/staging/1.mp4', 'cover_area'))
+        breaker.record_result('/videos/1.mp4', False)
+        self.assertEqual(breaker.state, OPEN)
+        self.assertIn('cover_area', breaker.reason)
+        self.assertEqual(breaker._failed_steps, {})
+
+    def test_failure_without_step_event_is_unknown(self):
+        breaker = self._breaker(consecutive_failures=1)
+        breaker.record_result('/videos/1.mp4', False)
+        self.assertIn('unknown', breaker.reason)
+
+    def test_half_open_allows_single_probe(self):
+        breaker = self._breaker(consecutive_failures=1)
+        self._fail(breaker, '/videos/1.mp4', 'publish')
+        self.now += 59
+        self.assertFalse(breaker.allow())
+        self.now += 1
+        self.assertTrue(breaker.allow())
+        self.assertEqual(breaker.state, HALF_OPEN)
+        self.assertFalse(breaker.allow())
+
+    def test_successful_probe_closes_and_resets_cooldown(self):
+        breaker = self._breaker(consecutive_failures=1)
+        self._fail(breaker, '/videos/1.mp4', 'publish')
+        self.now += 60
+        breaker.allow()
+        self._fail(breaker, '/videos/2.mp4', 'publish')
+        self.now += 120
+        self.assertTrue(breaker.allow())
+        breaker.record_result('/videos/3.mp4', True)
+        self.assertEqual(breaker.state, CLOSED)
+        self.assertEqual(breaker.cooldown, 60.0)
+        self.assertTrue(breaker.allow())
+
+    def test_failed_probe_doubles_cooldown_up_to_max(self):
+        breaker = self._breaker(consecutive_failures=1)
+        self._fail(breaker, '/videos/0.mp4', 'publish')
+        cooldowns = []
+        for index in range(1, 5):
+            self.now = breaker.retry_at
+            self.assertTrue(breaker.allow())
+            self._fail(breaker, f'/videos/{index}.mp4', 'publish')
+            self.assertEqual(breaker.state, OPEN)
+            cooldowns.append(breaker.cooldown)
+        self.assertEqual(cooldowns, [120.0, 240.0, 300.0, 300.0])
+        self.assertEqual(breaker.retry_at, self.now + 300.0)
+
+    def test_open_state_survives_restart(self):
+        breaker = self._breaker(consecutive_failures=1)
+        self._fail(breaker, '/videos/1.mp4', 'publish')
+        restarted = self._breaker(consecutive_failures=1)
+        self.assertEqual(restarted.state, OPEN)
+        self.assertEqual(restarted.retry_at, breaker.retry_at)
+        self.assertFalse(restarted.allow())
+        self.now = breaker.retry_at
+        self.assertTrue(restarted.allow())
+
+
+if __name__ == '__main__':
+    unittest.main()
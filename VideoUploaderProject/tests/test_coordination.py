@@ -0,0 +1,87 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from coordination import LeaseCoordinator
+
+
+class LeaseCoordinatorTest(unittest.TestCase):
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.work_dir, 'coordination.db')
+        self.now = 1000000.0
+        patcher = mock.patch('coordination.time.time', side_effect=lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.node_a = LeaseCoordinator(self.db_path, node_id='node-a', lease_seconds=600)
+        self.node_b = LeaseCoordinator(self.db_path, node_id='node-b', lease_seconds=600)
+
+    def tearDown(self):
+        for node in (self.node_a, self.node_b):
+            node._connection().close()
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    def test_claim_skips_videos_leased_by_other_nodes(self):
+        self.assertEqual(self.node_a.claim(['a.mp4', 'b.mp4']), ['a.mp4', 'b.mp4'])
+        self.assertEqual(self.node_b.claim(['a.mp4', 'b.mp4', 'c.mp4']), ['c.mp4'])
+        self.assertEqual(self.node_a.status()['nodes'], {'node-a': 2, 'node-b': 1})
+
+    def test_claim_respects_limit_and_order(self):
+        self.assertEqual(self.node_a.claim(['c.mp4', 'a.mp4', 'b.mp4'], limit=2), ['c.mp4', 'a.mp4'])
+
+    def test_node_can_reclaim_its_own_lease(self):
+        self.node_a.claim(['a.mp4'])
+        self.assertEqual(self.node_a.claim(['a.mp4']), ['a.mp4'])
+
+    def test_expired_lease_is_taken_over(self):
+        self.node_a.claim(['a.mp4'])
+        self.now += 601
+        self.assertEqual(self.node_a.status()['expired'], 1)
+        with self.assertLogs('coordination', 'WARNING'):
+            self.assertEqual(self.node_b.claim(['a.mp4']), ['a.mp4'])
+        self.assertEqual(self.node_b.status()['nodes'], {'node-b': 1})
+        attempts = self.node_b._connection().execute("SELECT attempts FROM leases WHERE video = 'a.mp4'").fetchone()[0]
+        self.assertEqual(attempts, 2)
+
+    def test_heartbeat_keeps_lease_alive(self):
+        self.node_a.claim(['a.mp4'])
+        self.now += 500
+        self.assertEqual(self.node_a.heartbeat(), 1)
+        self.now += 500
+        self.assertEqual(self.node_b.claim(['a.mp4']), [])
+
+    def test_completed_videos_are_never_claimed_again(self):
+        self.node_a.claim(['a.mp4'])
+        self.node_a.complete('a.mp4', 'succeeded')
+        self.now += 10000
+        self.assertEqual(self.node_a.claim(['a.mp4']), [])
+        self.assertEqual(self.node_b.claim(['a.mp4']), [])
+        self.assertEqual(self.node_b.done_videos(), {'a.mp4'})
+
+    def test_complete_after_losing_lease_still_marks_done(self):
+        self.node_a.claim(['a.mp4'])
+        self.now += 601
+        with self.assertLogs('coordination', 'WARNING'):
+            self.node_b.claim(['a.mp4'])
+        with self.assertLogs('coordination', 'ERROR'):
+            self.node_a.complete('a.mp4', 'succeeded')
+        self.assertEqual(self.node_b.done_videos(), {'a.mp4'})
+        self.assertEqual(self.node_b.status()['leased'], 0)
+        self.assertEqual(self.node_b.claim(['a.mp4']), [])
+
+    def test_release_makes_videos_available_immediately(self):
+        self.node_a.claim(['a.mp4', 'b.mp4'])
+        self.node_a.release(['a.mp4'])
+        self.assertEqual(self.node_b.claim(['a.mp4', 'b.mp4']), ['a.mp4'])
+
+    def test_release_does_not_drop_other_nodes_leases(self):
+        self.node_a.claim(['a.mp4'])
+        self.node_b.release(['a.mp4'])
+        self.assertEqual(self.node_b.claim(['a.mp4']), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import settings
+
+_CONFIG = """\
+[General]
+video_source_folder = /videos
+videos_per_batch = 7 # 每轮上传数量
+move_uploaded_files = false ; 不移动
+
+[WebTarget]
+upload_url = https://example.com/upload#/new
+
+[Metadata]
+description_template = {stem} 精彩合集 #搞笑 #萌宠
+tags = 猫, #日常
+"""
+
+
+class ParseConfigTest(unittest.TestCase):
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.config_path = os.path.join(self.work_dir, 'config.ini')
+        with open(self.config_path, 'w', encoding='utf-8') as f:
+            f.write(_CONFIG)
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    def test_hash_in_free_text_values_is_kept(self):
+        config = settings.parse_config_file(self.config_path)
+        self.assertEqual(config.get('Metadata', 'description_template'), '{stem} 精彩合集 #搞笑 #萌宠')
+        self.assertEqual(config.get('Metadata', 'tags'), '猫, #日常')
+        self.assertEqual(config.get('WebTarget', 'upload_url'), 'https://example.com/upload#/new')
+
+    def test_typed_options_ignore_trailing_comments(self):
+        config = settings.parse_config_file(self.config_path)
+        self.assertFalse(config.getboolean('General', 'move_uploaded_files'))
+        values, problems = settings.validate(config)
+        self.assertEqual(problems, [])
+        self.assertEqual(values[('General', 'videos_per_batch')], 7)
+        self.assertEqual(values[('WebTarget', 'upload_url')], 'https://example.com/upload#/new')
+
+    def test_invalid_values_are_reported(self):
+        with open(self.config_path, 'a', encoding='utf-8') as f:
+            f.write("[Queue]\npolicy = random\n")
+        _, problems = settings.validate(settings.parse_config_file(self.config_path))
+        self.assertEqual(len(problems), 1)
+        self.assertIn('[Queue] policy', problems[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,149 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from upload_queue import UploadQueue
+
+
+def _candidate(number, mtime=0.0, size=0):
+    filename = f"clip_{number}.mp4"
+    return {'path': os.path.join('/videos', filename), 'filename': filename, 'number': number,
+            'mtime': mtime, 'size': size}
+
+
+def _path(number):
+    return os.path.join('/videos', f"clip_{number}.mp4")
+
+
+class UploadQueueTest(unittest.TestCase):
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.state_file = os.path.join(self.work_dir, 'upload_queue.json')
+        self.pins_file = os.path.join(self.work_dir, 'pinned_videos.txt')
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    def _queue(self, policy='number'):
+        return UploadQueue(policy=policy, state_file=self.state_file, pins_file=self.pins_file)
+
+    def test_pops_in_policy_order(self):
+        video_queue = self._queue()
+        video_queue.sync([_candidate(n) for n in (115, 111, 113, 112)])
+        self.assertEqual(video_queue.pop_batch(3), [_path(111), _path(112), _path(113)])
+        self.assertEqual(video_queue.pop(), _path(115))
+        self.assertIsNone(video_queue.pop())
+
+    def test_size_policy_breaks_ties_by_number(self):
+        video_queue = self._queue('size')
+        video_queue.sync([_candidate(111, size=300), _candidate(113, size=100), _candidate(112, size=100)])
+        self.assertEqual(video_queue.peek(3), [_path(112), _path(113), _path(111)])
+
+    def test_sync_only_adds_new_and_removes_gone(self):
+        video_queue = self._queue()
+        self.assertEqual(video_queue.sync([_candidate(n) for n in (111, 112, 113)]), (3, 0))
+        self.assertEqual(video_queue.sync([_candidate(n) for n in (112, 113, 114)]), (1, 1))
+        self.assertEqual(video_queue.peek(10), [_path(112), _path(113), _path(114)])
+
+    def test_pinned_videos_go_first_in_pin_order(self):
+        video_queue = self._queue()
+        video_queue.sync([_candidate(n) for n in (111, 112, 113, 114)])
+        self.assertTrue(video_queue.pin(_path(114)))
+        self.assertTrue(video_queue.pin(_path(113)))
+        self.assertFalse(video_queue.pin(_path(999)))
+        self.assertEqual(video_queue.pop_batch(4), [_path(114), _path(113), _path(111), _path(112)])
+
+    def test_unpin_restores_policy_order(self):
+        video_queue = self._queue()
+        video_queue.sync([_candidate(n) for n in (111, 112)])
+        video_queue.pin(_path(112))
+        video_queue.unpin(_path(112))
+        self.assertEqual(video_queue.peek(2), [_path(111), _path(112)])
+
+    def test_pins_file_matches_by_file_name(self):
+        with open(self.pins_file, 'w', encoding='utf-8') as f:
+            f.write("# 注释\nclip_113.mp4\n")
+        video_queue = self._queue()
+        video_queue.sync([_candidate(n) for n in (111, 112, 113)])
+        self.assertEqual(video_queue.pop(), _path(113))
+
+    def test_pins_survive_reload(self):
+        video_queue = self._queue()
+        video_queue.sync([_candidate(n) for n in (111, 112, 113)])
+        video_queue.pin(_path(113))
+        self.assertEqual(self._queue().peek(3), [_path(113), _path(111), _path(112)])
+
+    def test_pins_file_entries_apply_when_video_appears(self):
+        with open(self.pins_file, 'w', encoding='utf-8') as f:
+            f.write("clip_114.mp4\n")
+        video_queue = self._queue()
+        video_queue.sync([_candidate(n) for n in (111, 112)])
+        self.assertEqual(video_queue.peek(1), [_path(111)])
+        # 置顶文件未修改，视频复制完成后出现在扫描结果中
+        video_queue.sync([_candidate(n) for n in (111, 112, 114)])
+        self.assertEqual(video_queue.peek(3), [_path(114), _path(111), _path(112)])
+
+    def test_requeued_video_keeps_pin(self):
+        video_queue = self._queue()
+        video_queue.sync([_candidate(n) for n in (111, 112, 113)])
+        video_queue.pin(_path(113))
+        self.assertEqual(video_queue.pop(), _path(113))
+        video_queue.requeue(_path(113))
+        self.assertEqual(video_queue.peek(3), [_path(113), _path(111), _path(112)])
+
+    def test_in_flight_pinned_video_keeps_pin_on_reload(self):
+        video_queue = self._queue()
+        video_queue.sync([_candidate(n) for n in (111, 112, 113)])
+        video_queue.pin(_path(113))
+        video_queue.pop()
+        self.assertEqual(self._queue().peek(3), [_path(113), _path(111), _path(112)])
+
+    def test_complete_drops_pin(self):
+        video_queue = self._queue()
+        video_queue.sync([_candidate(n) for n in (111, 112)])
+        video_queue.pin(_path(112))
+        video_queue.complete(video_queue.pop())
+        self.assertNotIn(_path(112), video_queue._pins)
+
+    def test_requeue_puts_video_back(self):
+        video_queue = self._queue()
+        video_queue.sync([_candidate(n) for n in (111, 112)])
+        first = video_queue.pop()
+        video_queue.requeue(first)
+        self.assertEqual(video_queue.peek(2), [_path(111), _path(112)])
+
+    def test_in_flight_videos_are_requeued_on_reload(self):
+        video_queue = self._queue()
+        video_queue.sync([_candidate(n) for n in (111, 112, 113)])
+        video_queue.pop_batch(2)
+        # 模拟中途退出：不调用 complete()/requeue()
+        reloaded = self._queue()
+        self.assertEqual(len(reloaded), 3)
+        self.assertEqual(reloaded.pop_batch(3), [_path(111), _path(112), _path(113)])
+
+    def test_completed_videos_are_not_requeued_on_reload(self):
+        video_queue = self._queue()
+        video_queue.sync([_candidate(n) for n in (111, 112)])
+        video_queue.complete(video_queue.pop())
+        # complete() 不写盘，重启后由 sync() 根据扫描结果（已上传的视频不在其中）移除
+        reloaded = self._queue()
+        reloaded.sync([_candidate(112)])
+        self.assertEqual(reloaded.peek(10), [_path(112)])
+
+    def test_policy_change_drops_saved_items(self):
+        video_queue = self._queue()
+        video_queue.sync([_candidate(n) for n in (111, 112)])
+        reloaded = self._queue('size')
+        self.assertEqual(len(reloaded), 0)
+        reloaded.sync([_candidate(111, size=200), _candidate(112, size=100)])
+        self.assertEqual(reloaded.peek(2), [_path(112), _path(111)])
+
+    def test_unknown_policy_is_rejected(self):
+        with self.assertRaises(ValueError):
+            UploadQueue(policy='random')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,287 @@
+import os
+import json
+import heapq
+import logging
+import itertools
+import threading
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STATE_FILE_NAME = "upload_queue.json"
+DEFAULT_PINS_FILE_NAME = "pinned_videos.txt"
+
+# 排序策略: 返回候选视频的排序键，值越小越先上传。文件名作为最后一个排序键保证结果确定。
+POLICIES = {
+    'number': lambda c: (c['number'], c['filename']), # 按文件名编号先进先出
+    'mtime': lambda c: (c['mtime'], c['number'], c['filename']), # 最早修改的优先
+    'size': lambda c: (c['size'], c['number'], c['filename']), # 文件最小的优先
+    'newest': lambda c: (-c['mtime'], c['number'], c['filename']), # 最新的视频优先
+    # 时长最短的优先，未能读取时长的视频排在最后并按大小排序
+    'shortest': lambda c: (c.get('duration') is None, c.get('duration') or 0, c['size'], c['number'], c['filename']),
+}
+# 需要 mtime/size 的策略
+_STAT_POLICIES = ('mtime', 'size', 'newest', 'shortest')
+# 置顶的视频排在所有普通视频之前
+_PINNED, _NORMAL = 0, 1
+
+
+class UploadQueue:
+    """
+    持久化的待上传视频优先队列（基于 heapq，插入和弹出均为 O(log n)）。
+
+    每轮扫描通过 sync() 增量喂入候选视频：只有新出现的视频会被插入，已上传或已删除的视频从队列中移除，
+    不再对整个列表重新排序。置顶 (pin) 的视频总是排在最前面，按置顶先后顺序上传；
+    置顶在视频完成之前一直有效，放回队列 (requeue) 或中途退出后重新入队的视频仍然置顶。
+    pop()/pop_batch() 取出的视频在 complete() 之前处于“处理中”状态，程序中途退出后下次启动会重新入队。
+    所有操作由锁保护，可被多个上传线程共享。
+    """
+
+    def __init__(self, policy='number', state_file=None, pins_file=None, duration_probe=None):
+        if policy not in POLICIES:
+            raise ValueError(f"未知的队列策略 '{policy}'，可选: {', '.join(POLICIES)}")
+        self.policy = policy
+        self.state_file = state_file
+        self.pins_file = pins_file
+        self.duration_probe = duration_probe
+        self._key = POLICIES[policy]
+        self._lock = threading.RLock()
+        self._items = {} # path -> 候选视频信息（待上传）
+        self._in_flight = {} # path -> 候选视频信息（已取出，尚未完成）
+        self._pins = {} # path -> 置顶序号
+        self._entries = {} # path -> 堆中的有效条目
+        self._heap = []
+        self._counter = itertools.count()
+        self._pins_file_mtime = None
+        self._pending_pin_names = [] # 置顶文件中尚未出现在队列里的视频，出现后再置顶
+        self._load()
+
+    @classmethod
+    def from_config(cls, config, index_settings=None, duration_probe=None):
+        """根据 [Queue] 构建队列；相对路径相对于项目根目录。"""
+        project_root = os.path.dirname(os.path.abspath(__file__))
+
+        def _resolve(path):
+            return path if os.path.isabs(path) else os.path.join(project_root, path)
+
+        # [Scanner] order_by 的取值与同名策略一致，未配置 [Queue] policy 时沿用 order_by
+        default_policy = (index_settings or {}).get('order_by', 'number')
+        policy = config.get('Queue', 'policy', fallback=default_policy).strip().lower() or default_policy
+        if policy not in POLICIES:
+            logger.warning(f"未知的队列策略 '{policy}'，改用 number。可选: {', '.join(POLICIES)}")
+            policy = 'number'
+        state_file = config.get('Queue', 'state_file', fallback=DEFAULT_STATE_FILE_NAME).strip()
+        pins_file = config.get('Queue', 'pins_file', fallback=DEFAULT_PINS_FILE_NAME).strip()
+        return cls(
+            policy=policy,
+            state_file=_resolve(state_file) if state_file else None,
+            pins_file=_resolve(pins_file) if pins_file else None,
+            duration_probe=duration_probe if policy == 'shortest' else None,
+        )
+
+    @property
+    def needs_stat(self):
+        """当前策略是否需要扫描器提供 mtime/size。"""
+        return self.policy in _STAT_POLICIES
+
+    # --- 堆维护 ---
+
+    def _priority(self, path):
+        if path in self._pins:
+            return (_PINNED, self._pins[path])
+        return (_NORMAL,) + self._key(self._items[path])
+
+    def _push(self, path):
+        self._invalidate(path)
+        entry = [self._priority(path), next(self._counter), path, True]
+        self._entries[path] = entry
+        heapq.heappush(self._heap, entry)
+
+    def _invalidate(self, path):
+        # 惰性删除：只把条目标记为无效，弹出时跳过
+        entry = self._entries.pop(path, None)
+        if entry is not None:
+            entry[-1] = False
+
+    def _rebuild(self):
+        self._entries = {}
+        self._heap = []
+        for path in self._items:
+            entry = [self._priority(path), next(self._counter), path, True]
+            self._entries[path] = entry
+            self._heap.append(entry)
+        heapq.heapify(self._heap)
+
+    # --- 持久化 ---
+
+    def _load(self):
+        if not self.state_file or not os.path.exists(self.state_file):
+            return
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"队列状态文件 {self.state_file} 无法读取，将重新建立队列: {e}")
+            return
+        self._pins = state.get('pins', {})
+        if state.get('policy') != self.policy:
+            # 策略变化后保存的候选信息可能缺少新策略需要的字段，由下一次 sync() 重新喂入
+            logger.info(f"队列策略已从 {state.get('policy')} 改为 {self.policy}，将在下次扫描时重建队列。")
+        else:
+            self._items = state.get('items', {})
+            # 上次中途退出时仍在处理中的视频重新入队
+            for path, item in state.get('in_flight', {}).items():
+                self._items.setdefault(path, item)
+        if self._pins:
+            self._counter = itertools.count(max(self._pins.values()) + 1)
+        self._rebuild()
+        logger.debug(f"已从 {self.state_file} 恢复 {len(self._items)} 个待上传视频。")
+
+    def _save(self):
+        if not self.state_file:
+            return
+        os.makedirs(os.path.dirname(self.state_file) or '.', exist_ok=True)
+        temp_path = f"{self.state_file}.{os.getpid()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({'policy': self.policy, 'items': self._items, 'in_flight': self._in_flight,
+                       'pins': self._pins}, f, ensure_ascii=False)
+        os.replace(temp_path, self.state_file)
+
+    def _reload_pins_file(self):
+        """
+        置顶文件每行一个视频（文件名或完整路径），文件修改后才重新读取。
+        还没有出现在队列中的视频（例如仍在复制）保留下来，之后的 sync() 中出现时再置顶。
+        """
+        if not self.pins_file:
+            return False
+        try:
+            mtime = os.path.getmtime(self.pins_file)
+        except OSError:
+            return False
+        if mtime != self._pins_file_mtime:
+            self._pins_file_mtime = mtime
+            with open(self.pins_file, 'r', encoding='utf-8') as f:
+                self._pending_pin_names = [line.strip() for line in f if line.strip() and not line.startswith('#')]
+        if not self._pending_pin_names:
+            return False
+        by_name = {}
+        for path in self._items:
+            by_name.setdefault(os.path.basename(path), path)
+        changed = False
+        unmatched = []
+        for name in self._pending_pin_names:
+            path = name if name in self._items else by_name.get(os.path.basename(name))
+            if path is None:
+                unmatched.append(name)
+            elif path not in self._pins:
+                self._pin(path)
+                changed = True
+        self._pending_pin_names = unmatched
+        return changed
+
+    # --- 对外接口 ---
+
+    def sync(self, candidates):
+        """
+        用本轮扫描得到的候选视频（video_index.scan_candidates 的结果，已排除上传过的）更新队列。
+        返回 (新增数量, 移除数量)。
+        """
+        with self._lock:
+            present = {c['path'] for c in candidates}
+            new_candidates = [c for c in candidates if c['path'] not in self._items and c['path'] not in self._in_flight]
+            gone = [path for path in self._items if path not in present]
+
+        # 读取时长较慢，在锁外完成，且每个视频只读取一次（结果随队列持久化）
+        if self.duration_probe:
+            for candidate in new_candidates:
+                candidate['duration'] = self.duration_probe(candidate['path'])
+
+        with self._lock:
+            for path in gone:
+                self._invalidate(path)
+                del self._items[path]
+                self._pins.pop(path, None)
+            for candidate in new_candidates:
+                self._items[candidate['path']] = dict(candidate)
+                self._push(candidate['path'])
+            pins_changed = self._reload_pins_file()
+            if new_candidates or gone or pins_changed:
+                self._save()
+            return len(new_candidates), len(gone)
+
+    def pop(self):
+        """取出优先级最高的视频路径，队列为空时返回 None。"""
+        with self._lock:
+            path = self._pop_locked()
+            if path is not None:
+                self._save()
+            return path
+
+    def pop_batch(self, count):
+        """取出最多 count 个视频路径。"""
+        with self._lock:
+            batch = []
+            while len(batch) < count:
+                path = self._pop_locked()
+                if path is None:
+                    break
+                batch.append(path)
+            if batch:
+                self._save()
+            return batch
+
+    def _pop_locked(self):
+        while self._heap:
+            entry = heapq.heappop(self._heap)
+            if not entry[-1]:
+                continue
+            path = entry[2]
+            del self._entries[path]
+            # 置顶保留到 complete()，放回队列的视频仍然排在最前面
+            self._in_flight[path] = self._items.pop(path)
+            return path
+        return None
+
+    def complete(self, path):
+        """视频处理结束（无论成功或失败）后调用，将其从队列中移除。"""
+        with self._lock:
+            # 不立即写盘：完成的视频已记录在追踪文件中，即使状态未保存，重启后的 sync() 也会将其移除
+            self._in_flight.pop(path, None)
+            self._pins.pop(path, None)
+
+    def requeue(self, path):
+        """把已取出但未处理的视频放回队列。"""
+        with self._lock:
+            item = self._in_flight.pop(path, None)
+            if item is not None:
+                self._items[path] = item
+                self._push(path)
+                self._save()
+
+    def _pin(self, path):
+        self._pins[path] = next(self._counter)
+        self._push(path)
+
+    def pin(self, path):
+        """置顶一个队列中的视频，返回是否成功。"""
+        with self._lock:
+            if path not in self._items:
+                return False
+            if path not in self._pins:
+                self._pin(path)
+                self._save()
+            return True
+
+    def unpin(self, path):
+        with self._lock:
+            if self._pins.pop(path, None) is not None and path in self._items:
+                self._push(path)
+                self._save()
+
+    def peek(self, count=10):
+        """按出队顺序返回前 count 个视频路径，不取出。"""
+        with self._lock:
+            return [entry[2] for entry in heapq.nsmallest(count, (e for e in self._heap if e[-1]))]
+
+    def __len__(self):
+        with self._lock:
+            return len(self._items)
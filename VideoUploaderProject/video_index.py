@@ -0,0 +1,102 @@
+import os
+import re
+import logging
+from functools import lru_cache
+
+logger = logging.getLogger(__name__)
+
+# 默认取文件名（不含扩展名）中最后一段数字，例如 "2024_clip_115" -> 115
+DEFAULT_NAME_PATTERN = r'(\d+)(?=\D*$)'
+DEFAULT_EXTENSIONS = ('.mp4', '.mov', '.mkv', '.webm')
+# 可选的排序键: number (文件名编号), mtime (修改时间), size (文件大小)
+ORDER_KEYS = ('number', 'mtime', 'size')
+
+
+@lru_cache(maxsize=32)
+def compile_name_pattern(pattern):
+    """编译命名模式。模式中有名为 num 的分组时取该分组，否则取第一个分组。"""
+    compiled = re.compile(pattern)
+    if 'num' not in compiled.groupindex and compiled.groups < 1:
+        raise ValueError(f"命名模式 '{pattern}' 需要至少一个捕获分组 (建议使用 (?P<num>\\d+))")
+    return compiled
+
+
+@lru_cache(maxsize=65536)
+def parse_video_number(filename, pattern=DEFAULT_NAME_PATTERN):
+    """从文件名中解析视频编号，结果按 (文件名, 模式) 缓存，重复扫描大目录时几乎无开销。"""
+    compiled = compile_name_pattern(pattern)
+    stem = os.path.splitext(filename)[0]
+    match = compiled.search(stem)
+    if not match:
+        return None
+    group = 'num' if 'num' in compiled.groupindex else 1
+    try:
+        return int(match.group(group))
+    except (TypeError, ValueError):
+        return None
+
+
+def normalize_extensions(extensions):
+    """把 'mp4, .MOV' 之类的配置统一为 ('.mp4', '.mov')。"""
+    if isinstance(extensions, str):
+        extensions = extensions.split(',')
+    normalized = []
+    for ext in extensions:
+        ext = ext.strip().lower()
+        if ext:
+            normalized.append(ext if ext.startswith('.') else '.' + ext)
+    return tuple(normalized) or DEFAULT_EXTENSIONS
+
+
+def load_index_settings(config):
+    """从配置的 [Scanner] 部分读取命名模式、扩展名和排序键。"""
+    order_by = config.get('Scanner', 'order_by', fallback='number').strip().lower()
+    if order_by not in ORDER_KEYS:
+        logger.warning(f"未知的排序键 '{order_by}'，改用 number。可选: {', '.join(ORDER_KEYS)}")
+        order_by = 'number'
+    pattern = config.get('Scanner', 'name_pattern', fallback=DEFAULT_NAME_PATTERN, raw=True) or DEFAULT_NAME_PATTERN
+    compile_name_pattern(pattern) # 启动时即校验模式
+    return {
+        'name_pattern': pattern,
+        'extensions': normalize_extensions(config.get('Scanner', 'extensions', fallback=','.join(DEFAULT_EXTENSIONS))),
+        'order_by': order_by,
+    }
+
+
+def scan_candidates(video_folder, start_number=0, name_pattern=DEFAULT_NAME_PATTERN,
+                    extensions=DEFAULT_EXTENSIONS, with_stat=False):
+    """
+    扫描目录，返回编号不小于 start_number 的视频候选列表（未排序）。
+    每项为 {'path', 'filename', 'number'}，with_stat=True 时额外包含 'mtime' 和 'size'。
+    """
+    candidates = []
+    with os.scandir(video_folder) as it:
+        for entry in it:
+            filename = entry.name
+            if not filename.lower().endswith(extensions):
+                continue
+            number = parse_video_number(filename, name_pattern)
+            if number is None:
+                logger.warning(f"无法从文件名 {filename} 中提取编号，将跳过。")
+                continue
+            if number < start_number:
+                continue
+            candidate = {'path': os.path.join(video_folder, filename), 'filename': filename, 'number': number}
+            if with_stat:
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                candidate['mtime'] = stat.st_mtime
+                candidate['size'] = stat.st_size
+            candidates.append(candidate)
+    return candidates
+
+
+def sort_candidates(candidates, order_by='number'):
+    """按指定键排序，编号作为第二排序键保证结果确定。"""
+    if order_by == 'number':
+        candidates.sort(key=lambda c: (c['number'], c['filename']))
+    else:
+        candidates.sort(key=lambda c: (c[order_by], c['number'], c['filename']))
+    return candidates
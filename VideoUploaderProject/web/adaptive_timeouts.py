@@ -0,0 +1,203 @@
+import os
+import json
+import math
+import atexit
+import logging
+import threading
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STATE_FILE_NAME = "adaptive_timeouts.json"
+DEFAULT_SIZE_BUCKETS_MB = (50, 200, 500, 1000, 2000)
+# 超时失败后该步骤的超时放大倍数，成功后逐步恢复
+_TIMEOUT_BACKOFF = 1.5
+_BOOST_DECAY = 0.9
+_MAX_BOOST = 8.0
+
+_instances = {}
+_instances_lock = threading.Lock()
+
+
+def _percentile(sorted_values, pct):
+    index = min(len(sorted_values) - 1, max(0, int(math.ceil(pct / 100.0 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+class AdaptiveTimeouts:
+    """
+    根据实际观测到的步骤耗时为上传流程的各个等待设置超时。
+
+    作为 web_interaction 的步骤监听器接收事件，按 (步骤, 文件大小分组) 维护最近 window 个成功样本，
+    超时 = 第 percentile 百分位耗时 × factor + margin，并限制在 [min_timeout, max_timeout] 内。
+    样本不足 min_samples 时使用调用方给出的默认值。因超时而失败的步骤不会产生成功样本，
+    因此会把该分组的超时按 1.5 倍放大（最多 8 倍），之后每次成功再逐步恢复，避免大文件被固定的短超时一直卡住。
+    样本定期写入 state_file，重启后继续使用。
+    """
+
+    def __init__(self, state_file=None, percentile=95, factor=1.2, margin=5.0, min_samples=20, window=200,
+                 min_timeout=3.0, max_timeout=600.0, size_buckets_mb=DEFAULT_SIZE_BUCKETS_MB, save_every=20):
+        self.state_file = state_file
+        self.percentile = percentile
+        self.factor = factor
+        self.margin = margin
+        self.min_samples = min_samples
+        self.window = window
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.size_buckets_mb = tuple(sorted(size_buckets_mb))
+        self.save_every = save_every
+        self._lock = threading.Lock()
+        self._samples = {} # (step, bucket) -> deque
+        self._boost = {} # (step, bucket) -> 超时放大倍数
+        self._issued = {} # (video, step) -> 本次使用的超时
+        self._unsaved = 0
+        self._load()
+
+    # --- 分组 ---
+
+    def size_bucket(self, video_path):
+        try:
+            size_mb = os.path.getsize(video_path) / (1024 * 1024)
+        except (OSError, TypeError):
+            return 'unknown'
+        lower = 0
+        for upper in self.size_buckets_mb:
+            if size_mb < upper:
+                return f"{lower}-{upper}MB"
+            lower = upper
+        return f">={lower}MB"
+
+    # --- 超时计算 ---
+
+    def timeout_for(self, step, video_path, default):
+        """返回该视频在该步骤应使用的超时（秒）。"""
+        key = (step, self.size_bucket(video_path))
+        with self._lock:
+            samples = self._samples.get(key)
+            boost = self._boost.get(key, 1.0)
+            if samples and len(samples) >= self.min_samples:
+                base = _percentile(sorted(samples), self.percentile) * self.factor + self.margin
+            else:
+                base = default
+            timeout = min(max(base * boost, self.min_timeout), max(self.max_timeout, default))
+            self._issued[(video_path, step)] = timeout
+        return timeout
+
+    def __call__(self, event):
+        """步骤监听器：记录成功步骤的耗时，识别超时失败。"""
+        if event['status'] == 'started':
+            return
+        key = (event['step'], self.size_bucket(event['video']))
+        with self._lock:
+            issued = self._issued.pop((event['video'], event['step']), None)
+            if event['status'] == 'succeeded':
+                samples = self._samples.get(key)
+                if samples is None:
+                    samples = self._samples[key] = deque(maxlen=self.window)
+                samples.append(event['elapsed'])
+                if key in self._boost:
+                    self._boost[key] = max(1.0, self._boost[key] * _BOOST_DECAY)
+                    if self._boost[key] == 1.0:
+                        del self._boost[key]
+            elif issued is not None and event['elapsed'] >= issued * 0.9:
+                # 耗时接近所用超时的失败视为超时失败
+                self._boost[key] = min(self._boost.get(key, 1.0) * _TIMEOUT_BACKOFF, _MAX_BOOST)
+                logger.info(f"步骤 {event['step']} ({key[1]}) 超时，后续超时放大到 {self._boost[key]:.2f} 倍。")
+            else:
+                return
+            self._unsaved += 1
+            should_save = self._unsaved >= self.save_every
+        if should_save:
+            self.save()
+
+    def snapshot(self):
+        """返回各分组当前的样本数、百分位耗时和放大倍数，便于查看。"""
+        with self._lock:
+            keys = set(self._samples) | set(self._boost)
+            result = {}
+            for step, bucket in sorted(keys):
+                samples = sorted(self._samples.get((step, bucket), ()))
+                result[f"{step}|{bucket}"] = {
+                    'samples': len(samples),
+                    f'p{self.percentile}': _percentile(samples, self.percentile) if samples else None,
+                    'boost': self._boost.get((step, bucket), 1.0),
+                }
+            return result
+
+    # --- 持久化 ---
+
+    def _load(self):
+        if not self.state_file or not os.path.exists(self.state_file):
+            return
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"自适应超时状态文件 {self.state_file} 无法读取，将重新统计: {e}")
+            return
+        for name, entry in state.get('groups', {}).items():
+            step, _, bucket = name.partition('|')
+            self._samples[(step, bucket)] = deque(entry.get('samples', [])[-self.window:], maxlen=self.window)
+            if entry.get('boost', 1.0) > 1.0:
+                # 旧版本保存的倍数可能超过上限
+                self._boost[(step, bucket)] = min(entry['boost'], _MAX_BOOST)
+
+    def save(self):
+        if not self.state_file:
+            return
+        with self._lock:
+            keys = set(self._samples) | set(self._boost)
+            groups = {
+                f"{step}|{bucket}": {
+                    'samples': [round(v, 3) for v in self._samples.get((step, bucket), ())],
+                    'boost': self._boost.get((step, bucket), 1.0),
+                }
+                for step, bucket in keys
+            }
+            self._unsaved = 0
+        try:
+            os.makedirs(os.path.dirname(self.state_file) or '.', exist_ok=True)
+            temp_path = f"{self.state_file}.{os.getpid()}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump({'groups': groups}, f, ensure_ascii=False)
+            os.replace(temp_path, self.state_file)
+        except OSError as e:
+            logger.warning(f"保存自适应超时状态失败: {e}")
+
+
+def get_adaptive_timeouts(config):
+    """根据配置 [AdaptiveTimeouts] 返回共享的 AdaptiveTimeouts，未启用时返回 None。相对路径相对于 web 目录。"""
+    if not config.getboolean('AdaptiveTimeouts', 'enabled', fallback=False):
+        return None
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    state_file = config.get('AdaptiveTimeouts', 'state_file', fallback=os.path.join('logs', DEFAULT_STATE_FILE_NAME))
+    if not os.path.isabs(state_file):
+        state_file = os.path.normpath(os.path.join(script_dir, state_file))
+    with _instances_lock:
+        instance = _instances.get(state_file)
+        if instance is None:
+            buckets = config.get('AdaptiveTimeouts', 'size_buckets_mb', fallback='')
+            instance = AdaptiveTimeouts(
+                state_file,
+                percentile=config.getfloat('AdaptiveTimeouts', 'percentile', fallback=95),
+                factor=config.getfloat('AdaptiveTimeouts', 'factor', fallback=1.2),
+                margin=config.getfloat('AdaptiveTimeouts', 'margin_seconds', fallback=5),
+                min_samples=config.getint('AdaptiveTimeouts', 'min_samples', fallback=20),
+                window=config.getint('AdaptiveTimeouts', 'window', fallback=200),
+                min_timeout=config.getfloat('AdaptiveTimeouts', 'min_timeout_seconds', fallback=3),
+                max_timeout=config.getfloat('AdaptiveTimeouts', 'max_timeout_seconds', fallback=600),
+                size_buckets_mb=[float(b) for b in buckets.split(',') if b.strip()] or DEFAULT_SIZE_BUCKETS_MB,
+            )
+            _instances[state_file] = instance
+        return instance
+
+
+def _save_all():
+    with _instances_lock:
+        instances = list(_instances.values())
+    for instance in instances:
+        instance.save()
+
+
+atexit.register(_save_all)
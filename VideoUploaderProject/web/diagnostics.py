@@ -0,0 +1,227 @@
+import os
+import re
+import time
+import gzip
+import base64
+import random
+import atexit
+import queue
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DIAGNOSTICS_DIR_NAME = "diagnostics"
+_SUPPORTED_IMAGE_FORMATS = ('jpeg', 'webp', 'png')
+_UNSAFE_KEY_CHARS = re.compile(r'[\\/:*?"<>|\s]+')
+
+# 根目录 -> DiagnosticsStore，同一目录只使用一个实例（共享磁盘预算和写入线程）
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def _safe_key(text):
+    return _UNSAFE_KEY_CHARS.sub('_', text).strip('_') or 'unknown'
+
+
+class DiagnosticsStore:
+    """
+    失败现场（截图 + DOM 快照）的采集与存储。
+
+    浏览器侧只做一次 CDP 调用取回数据，解码、压缩、写盘和按 LRU 淘汰都在后台线程完成。
+    文件按 <根目录>/<视频名>/<时间戳>_<原因>.<扩展名> 保存，总大小超过预算时删除最早写入的文件。
+    """
+
+    def __init__(self, root_dir, max_total_bytes=200 * 1024 * 1024, sample_rate=1.0,
+                 image_format='jpeg', image_quality=60, capture_dom=True):
+        if image_format not in _SUPPORTED_IMAGE_FORMATS:
+            logger.warning(f"不支持的截图格式 '{image_format}'，改用 jpeg。")
+            image_format = 'jpeg'
+        self.root_dir = root_dir
+        self.max_total_bytes = max_total_bytes
+        self.sample_rate = sample_rate
+        self.image_format = image_format
+        self.image_quality = image_quality
+        self.capture_dom = capture_dom
+        self._files = OrderedDict() # 路径 -> 字节数，按写入时间从旧到新
+        self._total_bytes = 0
+        self._queue = queue.Queue()
+        self._writer = None
+        self._writer_lock = threading.Lock()
+        self._index_loaded = False
+
+    # --- 采集（在调用线程中执行，尽量少占用浏览器） ---
+
+    def capture(self, driver, reason, video_path=None):
+        """采集一次失败现场，返回是否已提交写入。从不抛出异常。"""
+        if driver is None or self.sample_rate <= 0:
+            return False
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:
+            logger.debug(f"诊断采集被采样跳过: {reason}")
+            return False
+        captured_at = datetime.now()
+        image_data, image_ext = self._grab_screenshot(driver)
+        dom_html = self._grab_dom(driver) if self.capture_dom else None
+        if image_data is None and dom_html is None:
+            return False
+        self._ensure_writer()
+        self._queue.put((video_path, reason, captured_at, image_data, image_ext, dom_html))
+        logger.debug(f"诊断数据已提交后台写入: {reason} ({os.path.basename(video_path) if video_path else '无视频'})")
+        return True
+
+    def _grab_screenshot(self, driver):
+        params = {'format': self.image_format, 'captureBeyondViewport': False}
+        if self.image_format != 'png':
+            params['quality'] = self.image_quality
+        try:
+            result = driver.execute_cdp_cmd('Page.captureScreenshot', params)
+            return result.get('data'), 'jpg' if self.image_format == 'jpeg' else self.image_format
+        except Exception as e:
+            logger.debug(f"CDP 截图失败，回退到 WebDriver 截图: {e}")
+        try:
+            return driver.get_screenshot_as_base64(), 'png'
+        except Exception as e:
+            logger.error(f"保存截图失败: {e}")
+            return None, None
+
+    def _grab_dom(self, driver):
+        try:
+            result = driver.execute_cdp_cmd('Runtime.evaluate', {
+                'expression': 'document.documentElement.outerHTML',
+                'returnByValue': True,
+            })
+            return result.get('result', {}).get('value')
+        except Exception as e:
+            logger.debug(f"CDP 获取 DOM 失败，回退到 page_source: {e}")
+        try:
+            return driver.page_source
+        except Exception as e:
+            logger.debug(f"获取 DOM 快照失败: {e}")
+            return None
+
+    # --- 后台写入与淘汰 ---
+
+    def _ensure_writer(self):
+        with self._writer_lock:
+            if self._writer is None or not self._writer.is_alive():
+                self._writer = threading.Thread(target=self._write_loop, name='diagnostics-writer', daemon=True)
+                self._writer.start()
+
+    def _write_loop(self):
+        while True:
+            item = self._queue.get()
+            try:
+                self._write(*item)
+            except Exception as e:
+                logger.error(f"写入诊断数据失败: {e}", exc_info=True)
+            finally:
+                self._queue.task_done()
+
+    def _write(self, video_path, reason, captured_at, image_data, image_ext, dom_html):
+        self._load_index()
+        video_key = _safe_key(os.path.splitext(os.path.basename(video_path))[0]) if video_path else '_no_video'
+        folder = os.path.join(self.root_dir, video_key)
+        os.makedirs(folder, exist_ok=True)
+        stem = f"{captured_at.strftime('%Y%m%d-%H%M%S-%f')}_{_safe_key(reason)}"
+
+        if image_data:
+            image_path = os.path.join(folder, f"{stem}.{image_ext}")
+            with open(image_path, 'wb') as f:
+                f.write(base64.b64decode(image_data))
+            self._track(image_path)
+            logger.debug(f"截图已保存到: {image_path}")
+        if dom_html:
+            dom_path = os.path.join(folder, f"{stem}.html.gz")
+            with gzip.open(dom_path, 'wt', encoding='utf-8') as f:
+                f.write(dom_html)
+            self._track(dom_path)
+            logger.debug(f"DOM 快照已保存到: {dom_path}")
+        self._evict()
+
+    def _load_index(self):
+        """首次写入时扫描已有文件，按修改时间建立 LRU 顺序。"""
+        if self._index_loaded:
+            return
+        self._index_loaded = True
+        existing = []
+        for dirpath, _, filenames in os.walk(self.root_dir):
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                existing.append((stat.st_mtime, path, stat.st_size))
+        for _, path, size in sorted(existing):
+            self._files[path] = size
+            self._total_bytes += size
+
+    def _track(self, path):
+        size = os.path.getsize(path)
+        self._total_bytes += size - self._files.pop(path, 0)
+        self._files[path] = size
+
+    def _evict(self):
+        while self._total_bytes > self.max_total_bytes and len(self._files) > 1:
+            path, size = self._files.popitem(last=False)
+            self._total_bytes -= size
+            try:
+                os.remove(path)
+                logger.debug(f"诊断目录超出预算，已删除最早的文件: {path}")
+                folder = os.path.dirname(path)
+                if folder != self.root_dir and not os.listdir(folder):
+                    os.rmdir(folder)
+            except OSError as e:
+                logger.debug(f"删除诊断文件 {path} 失败: {e}")
+
+    def flush(self, timeout=10):
+        """等待已提交的诊断数据写完（最多 timeout 秒）。"""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.05)
+
+
+def get_diagnostics_store(config, default_root=None):
+    """根据配置 [Diagnostics] 返回共享的 DiagnosticsStore，未启用时返回 None。"""
+    if not config.getboolean('Diagnostics', 'enabled', fallback=True):
+        return None
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    default_root = default_root or os.path.join(script_dir, "logs", DEFAULT_DIAGNOSTICS_DIR_NAME)
+    root_dir = config.get('Diagnostics', 'folder', fallback=default_root) or default_root
+    if not os.path.isabs(root_dir):
+        root_dir = os.path.normpath(os.path.join(os.path.dirname(script_dir), root_dir))
+    with _stores_lock:
+        store = _stores.get(root_dir)
+        if store is None:
+            store = DiagnosticsStore(
+                root_dir,
+                max_total_bytes=int(config.getfloat('Diagnostics', 'max_total_mb', fallback=200) * 1024 * 1024),
+                sample_rate=config.getfloat('Diagnostics', 'sample_rate', fallback=1.0),
+                image_format=config.get('Diagnostics', 'image_format', fallback='jpeg').lower(),
+                image_quality=config.getint('Diagnostics', 'image_quality', fallback=60),
+                capture_dom=config.getboolean('Diagnostics', 'capture_dom', fallback=True),
+            )
+            _stores[root_dir] = store
+        return store
+
+
+def capture_failure(driver, config, reason, video_path=None):
+    """采集失败现场的便捷入口，诊断未启用或采集失败时静默返回 False。"""
+    try:
+        store = get_diagnostics_store(config)
+        return store.capture(driver, reason, video_path) if store else False
+    except Exception as e:
+        logger.error(f"采集诊断数据失败 ({reason}): {e}")
+        return False
+
+
+def _flush_all():
+    with _stores_lock:
+        stores = list(_stores.values())
+    for store in stores:
+        store.flush(timeout=5)
+
+
+atexit.register(_flush_all)
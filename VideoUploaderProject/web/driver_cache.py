@@ -0,0 +1,211 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import logging
+import platform as py_platform
+from contextlib import contextmanager
+
+if py_platform.system() == "Windows":
+    import msvcrt
+else:
+    import fcntl
+
+logger = logging.getLogger(__name__)
+
+OBJECTS_DIR_NAME = "objects"
+LOCKS_DIR_NAME = "locks"
+
+
+def detect_platform_tag():
+    """返回当前系统对应的 WebDriver 平台标签 (win64/win32/linux64/mac64/mac_arm64)，不支持时返回 None。"""
+    system = py_platform.system()
+    arch = py_platform.architecture()[0] # '64bit' or '32bit'
+    machine = py_platform.machine().lower() # e.g., 'amd64', 'x86_64', 'arm64'
+    if system == "Windows":
+        return "win64" if arch == '64bit' else "win32"
+    if system == "Linux":
+        # Assume 64-bit for Linux, which is most common for WebDriver releases
+        return "linux64"
+    if system == "Darwin":
+        # Check machine type for Apple Silicon (ARM) vs Intel
+        return "mac_arm64" if "arm" in machine or machine == "aarch64" else "mac64"
+    return None
+
+
+def driver_binary_name(platform_tag):
+    return "msedgedriver.exe" if platform_tag.startswith("win") else "msedgedriver"
+
+
+def _sha256_of(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+@contextmanager
+def file_lock(lock_path, timeout=600, poll_interval=0.5):
+    """跨进程的排他文件锁（Windows 用 msvcrt，其余系统用 fcntl），超时抛出 TimeoutError。"""
+    os.makedirs(os.path.dirname(lock_path), exist_ok=True)
+    handle = open(lock_path, 'a+b')
+    deadline = time.monotonic() + timeout
+    try:
+        while True:
+            try:
+                if py_platform.system() == "Windows":
+                    handle.seek(0)
+                    msvcrt.locking(handle.fileno(), msvcrt.LK_NBLCK, 1)
+                else:
+                    fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except OSError:
+                if time.monotonic() >= deadline:
+                    raise TimeoutError(f"等待文件锁 {lock_path} 超时 ({timeout} 秒)")
+                time.sleep(poll_interval)
+        yield
+    finally:
+        try:
+            if py_platform.system() == "Windows":
+                handle.seek(0)
+                msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+        except OSError:
+            pass
+        handle.close()
+
+
+class DriverCache:
+    """
+    按内容寻址的 WebDriver 二进制缓存。
+
+    二进制保存在 <root>/objects/<sha256>/<msedgedriver[.exe]>，一旦写入不再修改；
+    <root>/<平台标签>/<主版本>.json 记录该主版本当前对应的版本号和 sha256。
+    写入使用临时文件 + os.replace 原子完成，填充过程由文件锁保护，多个进程不会重复下载或互相覆盖。
+    shared_dir 为可选的共享目录（例如网络共享），本地未命中时先从共享目录复制。
+    """
+
+    def __init__(self, root_dir, shared_dir=None, publish_to_shared=False):
+        self.root_dir = root_dir
+        self.shared_dir = shared_dir
+        self.publish_to_shared = publish_to_shared and bool(shared_dir)
+
+    @staticmethod
+    def _index_path(root, major, platform_tag):
+        return os.path.join(root, platform_tag, f"{major}.json")
+
+    @staticmethod
+    def _object_path(root, sha256, platform_tag):
+        return os.path.join(root, OBJECTS_DIR_NAME, sha256, driver_binary_name(platform_tag))
+
+    def _read_entry(self, root, major, platform_tag):
+        index_path = self._index_path(root, major, platform_tag)
+        try:
+            with open(index_path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"WebDriver 缓存索引 {index_path} 无法读取: {e}")
+            return None
+        object_path = self._object_path(root, entry.get('sha256', ''), platform_tag)
+        if not entry.get('sha256') or not os.path.isfile(object_path):
+            return None
+        entry['path'] = object_path
+        return entry
+
+    def _write_entry(self, root, major, platform_tag, version, source_path, sha256):
+        object_path = self._object_path(root, sha256, platform_tag)
+        if not os.path.isfile(object_path):
+            os.makedirs(os.path.dirname(object_path), exist_ok=True)
+            temp_path = f"{object_path}.{os.getpid()}.tmp"
+            shutil.copyfile(source_path, temp_path)
+            if py_platform.system() != "Windows":
+                os.chmod(temp_path, 0o755)
+            os.replace(temp_path, object_path)
+        index_path = self._index_path(root, major, platform_tag)
+        os.makedirs(os.path.dirname(index_path), exist_ok=True)
+        temp_index = f"{index_path}.{os.getpid()}.tmp"
+        with open(temp_index, 'w', encoding='utf-8') as f:
+            json.dump({'version': version, 'sha256': sha256, 'platform': platform_tag,
+                       'stored_at': time.strftime('%Y-%m-%d %H:%M:%S')}, f, indent=2)
+        os.replace(temp_index, index_path)
+        return object_path
+
+    def lookup(self, major, platform_tag):
+        """查找缓存的驱动，返回 {'version', 'sha256', 'path'}，未命中返回 None。调用方不能持有 lock()。"""
+        entry = self._read_entry(self.root_dir, major, platform_tag)
+        if entry:
+            return entry
+        if not self.shared_dir:
+            return None
+        shared_entry = self._read_entry(self.shared_dir, major, platform_tag)
+        if not shared_entry:
+            return None
+        try:
+            with self.lock(major, platform_tag):
+                return self.lookup_locked(major, platform_tag)
+        except (OSError, TimeoutError) as e:
+            logger.warning(f"从共享缓存复制 WebDriver 失败，直接使用共享副本: {e}")
+            return shared_entry
+
+    def lookup_locked(self, major, platform_tag):
+        """
+        与 lookup() 相同，供已持有 lock() 的调用方使用（文件锁不可重入，lookup() 会再次加锁而一直等待）。
+        共享目录命中时复制到本地，避免直接从网络共享执行。
+        """
+        entry = self._read_entry(self.root_dir, major, platform_tag)
+        if entry or not self.shared_dir:
+            return entry
+        shared_entry = self._read_entry(self.shared_dir, major, platform_tag)
+        if not shared_entry:
+            return None
+        try:
+            path = self._write_entry(self.root_dir, major, platform_tag, shared_entry['version'],
+                                     shared_entry['path'], shared_entry['sha256'])
+        except OSError as e:
+            logger.warning(f"从共享缓存复制 WebDriver 失败，直接使用共享副本: {e}")
+            return shared_entry
+        logger.info(f"已从共享缓存 {self.shared_dir} 获取 WebDriver {shared_entry['version']}。")
+        return {'version': shared_entry['version'], 'sha256': shared_entry['sha256'], 'path': path}
+
+    def store(self, major, platform_tag, version, binary_path):
+        """把已验证的驱动写入缓存（调用方应持有 lock），返回缓存中的路径。"""
+        sha256 = _sha256_of(binary_path)
+        path = self._write_entry(self.root_dir, major, platform_tag, version, binary_path, sha256)
+        logger.info(f"WebDriver {version} ({platform_tag}) 已写入缓存: {path}")
+        if self.publish_to_shared:
+            try:
+                with file_lock(os.path.join(self.shared_dir, LOCKS_DIR_NAME, f"{platform_tag}_{major}.lock")):
+                    self._write_entry(self.shared_dir, major, platform_tag, version, binary_path, sha256)
+                logger.info(f"WebDriver {version} 已发布到共享缓存: {self.shared_dir}")
+            except (OSError, TimeoutError) as e:
+                logger.warning(f"发布 WebDriver 到共享缓存失败: {e}")
+        return path
+
+    def lock(self, major, platform_tag, timeout=600):
+        """返回保护 (平台, 主版本) 缓存填充过程的文件锁。"""
+        return file_lock(os.path.join(self.root_dir, LOCKS_DIR_NAME, f"{platform_tag}_{major}.lock"), timeout=timeout)
+
+    def staging_path(self, platform_tag):
+        """返回下载解压用的临时路径（与缓存同一文件系统，保证 os.replace 原子性）。"""
+        staging_dir = os.path.join(self.root_dir, "staging")
+        os.makedirs(staging_dir, exist_ok=True)
+        return os.path.join(staging_dir, f"{os.getpid()}_{driver_binary_name(platform_tag)}")
+
+
+def get_driver_cache(config):
+    """根据配置 [WebDriver] 构建 DriverCache。相对路径相对于 web 目录。"""
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    def _resolve(path):
+        return path if os.path.isabs(path) else os.path.normpath(os.path.join(script_dir, path))
+    root_dir = _resolve(config.get('WebDriver', 'cache_dir', fallback=os.path.join('driver_cache', 'bin')))
+    shared_dir = config.get('WebDriver', 'shared_cache_dir', fallback='').strip()
+    return DriverCache(
+        root_dir,
+        shared_dir=_resolve(shared_dir) if shared_dir else None,
+        publish_to_shared=config.getboolean('WebDriver', 'publish_to_shared', fallback=False),
+    )
@@ -0,0 +1,265 @@
+import os
+import json
+import time
+import logging
+import threading
+from contextlib import contextmanager
+
+from web import web_interaction, resource_monitor, driver_cache
+from web.resource_monitor import psutil
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PID_REGISTRY_NAME = "driver_pids.json"
+# 只清理这些名称的残留进程，防止 PID 被复用后误杀其他程序
+_BROWSER_PROCESS_NAMES = ('msedgedriver', 'msedge', 'microsoft-edge')
+_registry_lock = threading.Lock()
+# 等待其他上传进程释放进程记录文件锁的最长时间 (秒)
+_REGISTRY_LOCK_TIMEOUT = 30
+
+
+def _call_with_timeout(func, timeout):
+    """在守护线程中执行 func，返回 (是否按时完成, 结果或异常)。超时的线程会被放弃。"""
+    outcome = {}
+
+    def runner():
+        try:
+            outcome['result'] = func()
+        except Exception as e:
+            outcome['error'] = e
+
+    thread = threading.Thread(target=runner, name='driver-watchdog-call', daemon=True)
+    thread.start()
+    thread.join(timeout)
+    if thread.is_alive():
+        return False, None
+    return 'error' not in outcome, outcome.get('result', outcome.get('error'))
+
+
+def _snapshot_tree(driver):
+    """记录驱动进程树的 (pid, 创建时间)，用于之后确认进程身份后再清理。"""
+    processes = []
+    for proc in resource_monitor.process_tree(resource_monitor.driver_root_pid(driver)):
+        try:
+            processes.append({'pid': proc.pid, 'create_time': proc.create_time()})
+        except psutil.Error:
+            continue
+    return processes
+
+
+def _kill_recorded(processes):
+    """结束记录中仍存活且身份一致（同一创建时间、浏览器进程名）的进程，返回结束的数量。"""
+    if psutil is None:
+        return 0
+    killed = 0
+    for record in processes:
+        try:
+            proc = psutil.Process(record['pid'])
+            if abs(proc.create_time() - record['create_time']) > 1:
+                continue
+            if not proc.name().lower().startswith(_BROWSER_PROCESS_NAMES):
+                continue
+            proc.kill()
+            killed += 1
+        except psutil.Error:
+            continue
+    return killed
+
+
+class _PidRegistry:
+    """
+    记录本机由上传程序启动的浏览器进程，崩溃后下次启动时据此清理残留进程。
+    同一台主机上可以运行多个上传进程，记录文件的读-改-写由跨进程文件锁保护。
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    @contextmanager
+    def _locked(self):
+        with _registry_lock, driver_cache.file_lock(f"{self.path}.lock", timeout=_REGISTRY_LOCK_TIMEOUT):
+            yield
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.warning(f"浏览器进程记录 {self.path} 无法读取，将重建: {e}")
+            return {}
+
+    def _save(self, data):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2)
+        os.replace(temp_path, self.path)
+
+    def register(self, key, processes):
+        try:
+            with self._locked():
+                data = self._load()
+                data[key] = {'owner_pid': os.getpid(), 'processes': processes, 'registered_at': time.time()}
+                self._save(data)
+        except TimeoutError as e:
+            logger.warning(f"记录浏览器进程失败: {e}")
+
+    def unregister(self, key):
+        try:
+            with self._locked():
+                data = self._load()
+                if data.pop(key, None) is not None:
+                    self._save(data)
+        except TimeoutError as e:
+            logger.warning(f"删除浏览器进程记录失败: {e}")
+
+    def reap_orphans(self):
+        """清理所属上传进程已经不存在的记录，并结束其中残留的浏览器进程。"""
+        killed = 0
+        try:
+            with self._locked():
+                data = self._load()
+                for key, entry in list(data.items()):
+                    owner_pid = entry.get('owner_pid')
+                    owner_alive = owner_pid == os.getpid() or (psutil is not None and psutil.pid_exists(owner_pid))
+                    if owner_alive:
+                        continue
+                    killed += _kill_recorded(entry.get('processes', []))
+                    del data[key]
+                self._save(data)
+        except TimeoutError as e:
+            logger.warning(f"清理残留浏览器进程失败: {e}")
+        return killed
+
+
+class _TrackedDriver:
+    def __init__(self, driver):
+        self.driver = driver
+        self.created_at = time.monotonic()
+        self.uploads = 0
+        self.key = f"{os.getpid()}-{id(driver)}-{time.time():.0f}"
+        self.processes = _snapshot_tree(driver) if psutil is not None else []
+
+
+class DriverWatchdog:
+    """
+    管理上传用的 WebDriver 实例并在必要时回收。
+
+    acquire() 返回一个可用的浏览器（复用前先做轻量的存活检测），release() 记录一次上传，
+    当上传次数、运行时长或进程树内存超过阈值、上传失败或存活检测无响应时，
+    关闭浏览器并结束其整个进程树，避免长时间运行的主机内存持续上涨。
+    """
+
+    def __init__(self, config, max_uploads_per_driver=1, max_uptime_seconds=0, max_rss_mb=0,
+                 ping_timeout_seconds=10, quit_timeout_seconds=30, pid_registry_path=None):
+        self.config = config
+        self.max_uploads_per_driver = max_uploads_per_driver
+        self.max_uptime_seconds = max_uptime_seconds
+        self.max_rss_mb = max_rss_mb
+        self.ping_timeout_seconds = ping_timeout_seconds
+        self.quit_timeout_seconds = quit_timeout_seconds
+        self._registry = _PidRegistry(pid_registry_path) if pid_registry_path else None
+        self._tracked = None
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            config,
+            max_uploads_per_driver=config.getint('Watchdog', 'max_uploads_per_driver', fallback=1),
+            max_uptime_seconds=config.getfloat('Watchdog', 'max_uptime_minutes', fallback=0) * 60,
+            max_rss_mb=config.getfloat('Watchdog', 'max_rss_mb', fallback=0),
+            ping_timeout_seconds=config.getfloat('Watchdog', 'ping_timeout_seconds', fallback=10),
+            quit_timeout_seconds=config.getfloat('Watchdog', 'quit_timeout_seconds', fallback=30),
+            pid_registry_path=get_pid_registry_path(config),
+        )
+
+    def is_alive(self, driver):
+        """用一次极轻量的脚本调用检测浏览器是否仍能响应。"""
+        ok, result = _call_with_timeout(lambda: driver.execute_script("return 1;"), self.ping_timeout_seconds)
+        return ok and result == 1
+
+    def acquire(self):
+        """返回 (driver, is_new)。is_new 为 True 时调用方需要重新登录；无法创建浏览器时 driver 为 None。"""
+        tracked = self._tracked
+        if tracked is not None:
+            if self.is_alive(tracked.driver):
+                return tracked.driver, False
+            logger.warning("复用的浏览器未响应存活检测，将回收并重新创建。")
+            self._recycle("存活检测无响应")
+
+        driver = web_interaction.create_driver(self.config)
+        if not driver:
+            return None, True
+        tracked = _TrackedDriver(driver)
+        self._tracked = tracked
+        if self._registry and tracked.processes:
+            self._registry.register(tracked.key, tracked.processes)
+        return driver, True
+
+    def release(self, driver, upload_successful):
+        """一次上传结束后调用，根据结果和阈值决定保留还是回收浏览器。"""
+        tracked = self._tracked
+        if tracked is None or tracked.driver is not driver:
+            return
+        tracked.uploads += 1
+        reason = self._recycle_reason(tracked, upload_successful)
+        if reason:
+            self._recycle(reason)
+
+    def discard(self, driver):
+        """立即回收指定浏览器（例如登录失败）。"""
+        if self._tracked is not None and self._tracked.driver is driver:
+            self._recycle("调用方要求回收")
+
+    def shutdown(self):
+        if self._tracked is not None:
+            self._recycle("批次结束")
+
+    def _recycle_reason(self, tracked, upload_successful):
+        if not upload_successful:
+            return "上传失败，页面状态未知"
+        if self.max_uploads_per_driver > 0 and tracked.uploads >= self.max_uploads_per_driver:
+            return f"已上传 {tracked.uploads} 个视频"
+        uptime = time.monotonic() - tracked.created_at
+        if self.max_uptime_seconds > 0 and uptime >= self.max_uptime_seconds:
+            return f"已运行 {uptime / 60:.0f} 分钟"
+        if self.max_rss_mb > 0:
+            sample = resource_monitor.sample_process_tree(resource_monitor.driver_root_pid(tracked.driver))
+            if sample and sample['rss'] / (1024 * 1024) >= self.max_rss_mb:
+                return f"进程树内存 {sample['rss'] / (1024 * 1024):.0f} MB 超过上限"
+        return None
+
+    def _recycle(self, reason):
+        tracked, self._tracked = self._tracked, None
+        if tracked is None:
+            return
+        logger.debug(f"回收浏览器实例 ({reason})，共上传 {tracked.uploads} 个视频。")
+        # 在 quit 之前记录进程树，quit 卡住或留下残留进程时按记录结束
+        processes = _snapshot_tree(tracked.driver) if psutil is not None else tracked.processes
+        finished, _ = _call_with_timeout(tracked.driver.quit, self.quit_timeout_seconds)
+        if not finished:
+            logger.warning(f"浏览器在 {self.quit_timeout_seconds} 秒内未能正常关闭，强制结束其进程树。")
+        killed = _kill_recorded(processes)
+        if killed:
+            logger.info(f"已强制结束 {killed} 个残留的浏览器进程。")
+        if self._registry:
+            self._registry.unregister(tracked.key)
+
+
+def get_pid_registry_path(config):
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    path = config.get('Watchdog', 'pid_registry_file', fallback=os.path.join('logs', DEFAULT_PID_REGISTRY_NAME))
+    return path if os.path.isabs(path) else os.path.normpath(os.path.join(script_dir, path))
+
+
+def cleanup_orphaned_drivers(config):
+    """启动时调用：结束之前崩溃的上传进程遗留的浏览器进程。需要 psutil。"""
+    if psutil is None:
+        logger.debug("未安装 psutil，跳过残留浏览器进程清理。")
+        return 0
+    killed = _PidRegistry(get_pid_registry_path(config)).reap_orphans()
+    if killed:
+        logger.warning(f"已清理 {killed} 个之前运行遗留的浏览器进程。")
+    return killed
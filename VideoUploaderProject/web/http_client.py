@@ -0,0 +1,193 @@
+import os
+import json
+import shutil
+import hashlib
+import logging
+import threading
+from urllib.parse import urlparse
+
+import requests # Dependency: pip install requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+CACHE_INDEX_FILE_NAME = "index.json"
+DOWNLOAD_CHUNK_SIZE = 256 * 1024
+
+_session = None
+_session_lock = threading.Lock()
+_cache_lock = threading.Lock()
+
+
+def get_session():
+    """返回进程内共享的 requests.Session（连接池 + 对连接错误和 5xx 的有限重试）。"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            retry = Retry(total=3, connect=3, read=2, backoff_factor=0.5,
+                          status_forcelist=(500, 502, 503, 504), allowed_methods=frozenset(['GET', 'HEAD']))
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=retry)
+            session = requests.Session()
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _session = session
+        return _session
+
+
+def mirror_path_for(url, mirror_dir):
+    """把 URL 映射到本地镜像目录中的同名路径，例如 <mirror>/LATEST_RELEASE_124_WINDOWS。"""
+    if not mirror_dir:
+        return None
+    relative = urlparse(url).path.lstrip('/')
+    return os.path.join(mirror_dir, *relative.split('/'))
+
+
+def _load_cache_index(cache_dir):
+    index_path = os.path.join(cache_dir, CACHE_INDEX_FILE_NAME)
+    if not os.path.exists(index_path):
+        return {}
+    try:
+        with open(index_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning(f"HTTP 缓存索引 {index_path} 读取失败，将重建: {e}")
+        return {}
+
+
+def _save_cache_index(cache_dir, index):
+    index_path = os.path.join(cache_dir, CACHE_INDEX_FILE_NAME)
+    temp_path = index_path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(index, f, ensure_ascii=False, indent=2)
+    os.replace(temp_path, index_path)
+
+
+def fetch_cached(url, cache_dir, timeout=10, mirror_dir=None):
+    """
+    以条件请求 (ETag / Last-Modified) 获取小文件，返回 (内容 bytes, content-type)。
+
+    服务器返回 304 时直接使用本地缓存；网络不可用时退回缓存或镜像目录中的副本。
+    失败时抛出 requests.exceptions.RequestException。
+    """
+    mirrored = mirror_path_for(url, mirror_dir)
+    if mirrored and os.path.isfile(mirrored):
+        logger.debug(f"使用本地镜像: {mirrored}")
+        with open(mirrored, 'rb') as f:
+            return f.read(), ''
+
+    os.makedirs(cache_dir, exist_ok=True)
+    with _cache_lock:
+        entry = _load_cache_index(cache_dir).get(url)
+    body_path = os.path.join(cache_dir, hashlib.sha1(url.encode('utf-8')).hexdigest())
+    has_body = entry is not None and os.path.exists(body_path)
+
+    headers = {}
+    if has_body:
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+
+    try:
+        response = get_session().get(url, headers=headers, timeout=timeout)
+        if response.status_code == 304 and has_body:
+            logger.debug(f"{url} 未修改 (304)，使用缓存。")
+            with open(body_path, 'rb') as f:
+                return f.read(), entry.get('content_type', '')
+        response.raise_for_status()
+    except requests.exceptions.RequestException:
+        if has_body:
+            logger.warning(f"请求 {url} 失败，使用本地缓存的旧内容。")
+            with open(body_path, 'rb') as f:
+                return f.read(), entry.get('content_type', '')
+        raise
+
+    content_type = response.headers.get('content-type', '')
+    with open(body_path, 'wb') as f:
+        f.write(response.content)
+    with _cache_lock:
+        index = _load_cache_index(cache_dir)
+        index[url] = {
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'content_type': content_type,
+        }
+        _save_cache_index(cache_dir, index)
+    return response.content, content_type
+
+
+def download_file(url, dest_path, timeout=300, mirror_dir=None, show_progress=True):
+    """
+    流式下载文件到 dest_path，不在内存中保留完整内容。
+
+    下载过程写入 dest_path + '.part'，中断后再次调用会用 Range 请求续传（If-Range 保证文件未变化）；
+    完成后原子替换为 dest_path。镜像目录中存在同名文件时直接复制。
+    失败时抛出 requests.exceptions.RequestException 或 OSError。
+    """
+    os.makedirs(os.path.dirname(dest_path) or '.', exist_ok=True)
+    mirrored = mirror_path_for(url, mirror_dir)
+    if mirrored and os.path.isfile(mirrored):
+        logger.info(f"从本地镜像复制: {mirrored}")
+        shutil.copyfile(mirrored, dest_path + '.part')
+        os.replace(dest_path + '.part', dest_path)
+        return dest_path
+
+    part_path = dest_path + '.part'
+    meta_path = part_path + '.json'
+    resume_from = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+    validator = None
+    if resume_from and os.path.exists(meta_path):
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                validator = json.load(f).get('validator')
+        except (OSError, ValueError):
+            validator = None
+
+    headers = {}
+    if resume_from and validator:
+        headers['Range'] = f'bytes={resume_from}-'
+        headers['If-Range'] = validator
+        logger.info(f"检测到未完成的下载 ({resume_from / (1024*1024):.2f} MB)，尝试续传。")
+
+    with get_session().get(url, headers=headers, stream=True, timeout=timeout) as response:
+        if response.status_code == 416 and resume_from:
+            # 已经下载完整
+            os.replace(part_path, dest_path)
+            return dest_path
+        response.raise_for_status()
+        if response.status_code == 206:
+            mode = 'ab'
+            downloaded = resume_from
+        else:
+            mode = 'wb'
+            downloaded = 0
+        content_length = response.headers.get('content-length')
+        total_size = downloaded + int(content_length) if content_length else None
+
+        new_validator = response.headers.get('ETag') or response.headers.get('Last-Modified')
+        if new_validator:
+            with open(meta_path, 'w', encoding='utf-8') as f:
+                json.dump({'url': url, 'validator': new_validator}, f)
+
+        if total_size:
+            logger.info(f"文件总大小: {total_size / (1024*1024):.2f} MB")
+        else:
+            logger.warning("无法获取文件总大小，将不显示下载进度。")
+        last_reported_progress = -1
+        with open(part_path, mode) as target:
+            for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                target.write(chunk)
+                downloaded += len(chunk)
+                if show_progress and total_size:
+                    progress_percentage = int(downloaded / total_size * 100)
+                    if progress_percentage != last_reported_progress:
+                        print(f"下载进度: {progress_percentage}% ({downloaded / (1024*1024):.2f} MB / {total_size / (1024*1024):.2f} MB)", end='\r')
+                        last_reported_progress = progress_percentage
+        if show_progress and total_size:
+            print()
+
+    os.replace(part_path, dest_path)
+    if os.path.exists(meta_path):
+        os.remove(meta_path)
+    return dest_path
@@ -0,0 +1,204 @@
+import os
+import sys
+import json
+import time
+import logging
+import statistics
+import threading
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WATERFALL_FILE_NAME = "network_waterfall.jsonl"
+DEFAULT_READY_SELECTOR = ".byte-upload-trigger-area"
+# allowlist 模式: 只放行这些站点 (URLPattern 语法)，其余请求全部阻止
+DEFAULT_ALLOW_PATTERNS = (
+    "*://*.toutiao.com/*", "*://*.snssdk.com/*", "*://*.bytedance.com/*", "*://*.byteimg.com/*",
+    "*://*.pstatp.com/*", "*://*.bytescm.com/*", "*://*.zijieapi.com/*", "*://*.bytegoofy.com/*",
+)
+# blocklist 模式 (以及浏览器不支持 allowlist 时): 阻止统计、广告和字体等与上传无关的资源 (通配符语法)
+DEFAULT_BLOCK_PATTERNS = (
+    "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*", "*hm.baidu.com*",
+    "*cnzz.com*", "*mcs.snssdk.com*", "*mon.snssdk.com*", "*/slardar/*", "*/tea-sdk*",
+    "*.woff", "*.woff2", "*.ttf", "*.otf", "*.gif",
+)
+
+# 在每个新文档中记录上传区域出现的时间 (相对于导航开始)，并扩大资源计时缓冲区
+_READY_PROBE_SCRIPT = """
+(function (selector) {
+    try { performance.setResourceTimingBufferSize(2000); } catch (e) {}
+    function check() {
+        if (window.__uploaderReadyAt === undefined && document.querySelector(selector)) {
+            window.__uploaderReadyAt = performance.now();
+        }
+        return window.__uploaderReadyAt !== undefined;
+    }
+    function watch() {
+        if (check()) return;
+        var observer = new MutationObserver(function () { if (check()) observer.disconnect(); });
+        observer.observe(document.documentElement, {childList: true, subtree: true});
+    }
+    if (document.readyState === 'loading') {
+        document.addEventListener('DOMContentLoaded', watch);
+    } else {
+        watch();
+    }
+})(%s);
+"""
+
+_WATERFALL_SCRIPT = """
+var limit = arguments[0];
+var nav = performance.getEntriesByType('navigation')[0] || {};
+var resources = performance.getEntriesByType('resource');
+var transfer = 0, lastEnd = 0, byType = {};
+resources.forEach(function (r) {
+    transfer += r.transferSize || 0;
+    lastEnd = Math.max(lastEnd, r.responseEnd);
+    byType[r.initiatorType] = (byType[r.initiatorType] || 0) + 1;
+});
+var slowest = resources.slice().sort(function (a, b) { return b.duration - a.duration; }).slice(0, limit)
+    .map(function (r) {
+        return {name: r.name.slice(0, 200), type: r.initiatorType, start: Math.round(r.startTime),
+                duration: Math.round(r.duration), bytes: r.transferSize || 0};
+    });
+return {
+    url: location.href,
+    dom_content_loaded: nav.domContentLoadedEventEnd ? Math.round(nav.domContentLoadedEventEnd) : null,
+    load: nav.loadEventEnd ? Math.round(nav.loadEventEnd) : null,
+    ready: window.__uploaderReadyAt !== undefined ? Math.round(window.__uploaderReadyAt) : null,
+    last_resource_end: Math.round(lastEnd),
+    resources: resources.length,
+    transfer_bytes: transfer,
+    by_type: byType,
+    slowest: slowest
+};
+"""
+
+_write_lock = threading.Lock()
+
+
+def _split_patterns(config, key, default):
+    raw = config.get('NetworkPolicy', key, fallback=None)
+    if raw is None:
+        return list(default)
+    return [p.strip() for p in raw.replace('\n', ',').split(',') if p.strip()]
+
+
+def policy_name(config):
+    """当前生效的策略名: off / blocklist / allowlist，记录在瀑布图中以便对比。"""
+    if not config.getboolean('NetworkPolicy', 'enabled', fallback=False):
+        return 'off'
+    mode = config.get('NetworkPolicy', 'mode', fallback='blocklist').strip().lower()
+    return mode if mode in ('blocklist', 'allowlist') else 'blocklist'
+
+
+def apply_network_policy(driver, config):
+    """
+    通过 CDP 在浏览器上设置请求拦截，并注入记录上传区域出现时间的脚本。应在首次导航之前调用。
+    allowlist 模式使用 Network.setBlockedURLs 的 urlPatterns（较新的 Chromium 才支持）：
+    allow_patterns 依次放行，其余请求全部阻止；浏览器不支持时退回 blocklist 模式。返回实际生效的策略名。
+    """
+    applied = _apply(driver, config)
+    # 记在 driver 上，瀑布记录中使用实际生效的策略而不是配置值
+    driver._uploader_network_policy = applied
+    return applied
+
+
+def _apply(driver, config):
+    applied = policy_name(config)
+    try:
+        if config.getboolean('NetworkPolicy', 'record_waterfall', fallback=False):
+            selector = config.get('NetworkPolicy', 'ready_selector', fallback=DEFAULT_READY_SELECTOR)
+            driver.execute_cdp_cmd('Page.addScriptToEvaluateOnNewDocument',
+                                   {'source': _READY_PROBE_SCRIPT % json.dumps(selector)})
+        if applied == 'off':
+            return applied
+
+        driver.execute_cdp_cmd('Network.enable', {})
+        block_patterns = _split_patterns(config, 'block_patterns', DEFAULT_BLOCK_PATTERNS)
+        if applied == 'allowlist':
+            allow_patterns = _split_patterns(config, 'allow_patterns', DEFAULT_ALLOW_PATTERNS)
+            url_patterns = [{'urlPattern': p, 'block': False} for p in allow_patterns]
+            url_patterns.append({'urlPattern': '*://*/*', 'block': True})
+            try:
+                driver.execute_cdp_cmd('Network.setBlockedURLs', {'urlPatterns': url_patterns})
+                logger.info(f"已启用请求白名单，仅放行 {len(allow_patterns)} 个站点模式。")
+                return applied
+            except Exception as e:
+                logger.warning(f"浏览器不支持白名单拦截 (Network.setBlockedURLs urlPatterns)，改用黑名单: {e}")
+                applied = 'blocklist'
+        driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': block_patterns})
+        logger.info(f"已启用请求黑名单，阻止 {len(block_patterns)} 个 URL 模式。")
+    except Exception as e:
+        logger.warning(f"设置网络拦截策略失败，页面将完整加载: {e}")
+        return 'off'
+    return applied
+
+
+def get_waterfall_file_path(config):
+    """瀑布图记录文件路径，相对路径相对于项目根目录。"""
+    path = config.get('NetworkPolicy', 'waterfall_file', fallback=os.path.join('logs', DEFAULT_WATERFALL_FILE_NAME))
+    if not os.path.isabs(path):
+        path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), path)
+    return path
+
+
+def record_waterfall(driver, config, label):
+    """
+    采集当前页面的加载瀑布 (Navigation/Resource Timing)，追加写入瀑布图记录文件 (JSON Lines)。
+    ready 为上传区域出现的时间，即本项目关心的“可交互时间”。失败时只记录调试日志。
+    """
+    if not config.getboolean('NetworkPolicy', 'record_waterfall', fallback=False):
+        return None
+    try:
+        waterfall = driver.execute_script(_WATERFALL_SCRIPT, config.getint('NetworkPolicy', 'waterfall_top_n', fallback=10))
+    except Exception as e:
+        logger.debug(f"采集页面加载瀑布失败: {e}")
+        return None
+    policy = getattr(driver, '_uploader_network_policy', None) or policy_name(config)
+    waterfall = dict(waterfall or {}, label=label, policy=policy, time=time.time())
+    logger.debug(f"页面加载 ({label}, 策略 {waterfall['policy']}): 上传区域出现 {waterfall.get('ready')} ms，"
+                 f"load {waterfall.get('load')} ms，{waterfall.get('resources')} 个资源，{waterfall.get('transfer_bytes', 0) / 1024:.0f} KB")
+    path = get_waterfall_file_path(config)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with _write_lock, open(path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(waterfall, ensure_ascii=False) + "\n")
+    except OSError as e:
+        logger.warning(f"写入页面加载瀑布记录失败: {e}")
+    return waterfall
+
+
+def summarize_waterfalls(path):
+    """按 (页面, 策略) 汇总瀑布图记录：样本数及可交互时间、load 时间、资源数和传输量的中位数。"""
+    groups = {}
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            groups.setdefault((entry.get('label'), entry.get('policy')), []).append(entry)
+
+    def _median(entries, key, scale=1):
+        values = [e[key] / scale for e in entries if e.get(key) is not None]
+        return round(statistics.median(values)) if values else None
+
+    return {
+        f"{label}|{policy}": {
+            'samples': len(entries),
+            'ready_ms': _median(entries, 'ready'),
+            'load_ms': _median(entries, 'load'),
+            'resources': _median(entries, 'resources'),
+            'transfer_kb': _median(entries, 'transfer_bytes', 1024),
+        }
+        for (label, policy), entries in sorted(groups.items(), key=lambda item: (str(item[0][0]), str(item[0][1])))
+    }
+
+
+if __name__ == "__main__":
+    # python -m web.network_policy [瀑布图记录文件]: 对比不同拦截策略下的页面加载耗时
+    summary = summarize_waterfalls(sys.argv[1] if len(sys.argv) > 1 else
+                                   os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'logs',
+                                                DEFAULT_WATERFALL_FILE_NAME))
+    for group, stats in summary.items():
+        print(f"{group:<30} " + "  ".join(f"{key}={value}" for key, value in stats.items()))
@@ -0,0 +1,122 @@
+import time
+import logging
+import threading
+import statistics
+
+try:
+    import psutil # Optional: pip install psutil，用于统计浏览器进程树的内存/CPU
+except ImportError:
+    psutil = None
+
+logger = logging.getLogger(__name__)
+
+
+def driver_root_pid(driver):
+    """返回 WebDriver 服务进程 (msedgedriver) 的 PID，浏览器进程都是它的子进程。"""
+    process = getattr(getattr(driver, 'service', None), 'process', None)
+    return getattr(process, 'pid', None)
+
+
+def process_tree(pid):
+    """返回 pid 及其所有子孙进程的 psutil.Process 列表，psutil 不可用或进程不存在时返回空列表。"""
+    if psutil is None or pid is None:
+        return []
+    try:
+        root = psutil.Process(pid)
+        return [root] + root.children(recursive=True)
+    except psutil.Error:
+        return []
+
+
+def sample_process_tree(pid, cpu_interval=None):
+    """
+    采样一次进程树的资源占用，返回 {'rss', 'cpu_percent', 'processes'}；无法采样时返回 None。
+    cpu_percent 为自上次采样以来的 CPU 占用之和（首次采样为 0），可能超过 100。
+    """
+    processes = process_tree(pid)
+    if not processes:
+        return None
+    rss = 0
+    cpu = 0.0
+    for proc in processes:
+        try:
+            rss += proc.memory_info().rss
+            cpu += proc.cpu_percent(interval=cpu_interval)
+        except psutil.Error:
+            continue
+    return {'rss': rss, 'cpu_percent': cpu, 'processes': len(processes)}
+
+
+class ResourceSampler:
+    """在后台线程中定期采样一个 WebDriver 进程树的 RSS/CPU，并汇总峰值和均值。"""
+
+    def __init__(self, driver, interval=2.0, name=None):
+        self.pid = driver_root_pid(driver)
+        self.interval = interval
+        self.name = name or f"driver-{self.pid}"
+        self.samples = []
+        self._stop = threading.Event()
+        self._thread = None
+        # psutil 的 cpu_percent 需要同一个 Process 对象跨采样复用
+        self._processes = {}
+
+    def _sample_once(self):
+        if psutil is None or self.pid is None:
+            return
+        current = {}
+        for proc in process_tree(self.pid):
+            current[proc.pid] = self._processes.get(proc.pid, proc)
+        self._processes = current
+        rss = 0
+        cpu = 0.0
+        for proc in current.values():
+            try:
+                rss += proc.memory_info().rss
+                cpu += proc.cpu_percent(interval=None)
+            except psutil.Error:
+                continue
+        if current:
+            self.samples.append({'time': time.time(), 'rss': rss, 'cpu_percent': cpu, 'processes': len(current)})
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._sample_once()
+            self._stop.wait(self.interval)
+
+    def start(self):
+        if psutil is None:
+            logger.debug("未安装 psutil，跳过浏览器资源采样。")
+            return self
+        self._thread = threading.Thread(target=self._run, name=f"resource-sampler-{self.name}", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=self.interval + 1)
+        return self.summary()
+
+    def summary(self):
+        """返回 {'samples', 'peak_rss_mb', 'mean_rss_mb', 'peak_cpu_percent', 'mean_cpu_percent', 'max_processes'}，无数据时返回 None。"""
+        if not self.samples:
+            return None
+        rss_values = [s['rss'] for s in self.samples]
+        # 第一个样本的 cpu_percent 恒为 0，不计入均值
+        cpu_values = [s['cpu_percent'] for s in self.samples[1:]] or [0.0]
+        return {
+            'samples': len(self.samples),
+            'peak_rss_mb': max(rss_values) / (1024 * 1024),
+            'mean_rss_mb': statistics.fmean(rss_values) / (1024 * 1024),
+            'peak_cpu_percent': max(cpu_values),
+            'mean_cpu_percent': statistics.fmean(cpu_values),
+            'max_processes': max(s['processes'] for s in self.samples),
+        }
+
+
+def format_summary(summary):
+    if not summary:
+        return "无数据 (需要安装 psutil)"
+    return (f"峰值内存 {summary['peak_rss_mb']:.1f} MB, 平均内存 {summary['mean_rss_mb']:.1f} MB, "
+            f"峰值 CPU {summary['peak_cpu_percent']:.0f}%, 平均 CPU {summary['mean_cpu_percent']:.0f}%, "
+            f"最多 {summary['max_processes']} 个进程 ({summary['samples']} 次采样)")
@@ -0,0 +1,284 @@
+import os
+import json
+import time
+import logging
+import threading
+from datetime import datetime
+
+from requests.exceptions import RequestException
+
+from web import http_client, web_interaction
+
+logger = logging.getLogger(__name__)
+
+STATUS_PENDING = 'pending'
+STATUS_CONFIRMED = 'confirmed'
+STATUS_MISSING = 'missing'
+DEFAULT_STATUS_FILE_NAME = "upload_status.json"
+
+
+def _dig(data, dotted_path):
+    """按 'data.list' 这样的点分路径取出嵌套字段，取不到时返回 None。"""
+    for key in filter(None, dotted_path.split('.')):
+        if isinstance(data, dict):
+            data = data.get(key)
+        elif isinstance(data, list) and key.isdigit() and int(key) < len(data):
+            data = data[int(key)]
+        else:
+            return None
+    return data
+
+
+def _parse_timestamp(value):
+    """把内容列表中的时间字段（秒/毫秒时间戳或 ISO 字符串）转换为 epoch 秒，无法解析时返回 None。"""
+    if isinstance(value, str):
+        value = value.strip()
+        try:
+            value = float(value)
+        except ValueError:
+            try:
+                return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+            except ValueError:
+                return None
+    if isinstance(value, (int, float)) and value > 0:
+        return value / 1000.0 if value > 1e12 else float(value)
+    return None
+
+
+def _normalize_title(title):
+    return ' '.join(str(title or '').split()).casefold()
+
+
+def load_cookie_jar(config):
+    """读取浏览器保存的 Cookies 文件，返回可直接用于 requests 的 {name: value} 字典。"""
+    cookie_file = web_interaction._get_cookie_file_path(config)
+    try:
+        with open(cookie_file, 'r', encoding='utf-8') as f:
+            cookies = json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning(f"无法读取 Cookies 文件 {cookie_file}，上传结果核对将无法登录: {e}")
+        return {}
+    return {c['name']: c['value'] for c in cookies if 'name' in c and 'value' in c}
+
+
+class UploadVerifier:
+    """
+    在后台线程中核对“已发布”的视频是否真的出现在账号的内容管理列表中。
+
+    submit() 只把视频加入待核对列表并立即返回，浏览器上传流程不会被阻塞。后台线程每隔
+    poll_interval 秒用保存的 Cookies 通过 HTTP 分页拉取一次内容列表，一次请求同时核对所有待核对的视频，
+    按标题和发布时间窗口匹配。超过 verify_timeout 仍未出现的视频标记为 missing。
+    状态写入 status_file (JSON)。已确认或 missing 的视频保留 resolved_retention 秒后清除，
+    状态文件不会无限增长；保留期内已匹配的内容条目不会再匹配给其他视频（重启后依然有效）。
+    """
+
+    def __init__(self, config, list_url, status_file, items_path='data.list', id_field='id',
+                 title_field='title', time_field='create_time', status_field='status',
+                 page_size=20, max_pages=5, poll_interval=120, verify_timeout=3600,
+                 time_skew=300, request_timeout=15, resolved_retention=30 * 86400):
+        self.config = config
+        self.list_url = list_url
+        self.status_file = status_file
+        self.items_path = items_path
+        self.id_field = id_field
+        self.title_field = title_field
+        self.time_field = time_field
+        self.status_field = status_field
+        self.page_size = page_size
+        self.max_pages = max_pages
+        self.poll_interval = poll_interval
+        self.verify_timeout = verify_timeout
+        self.time_skew = time_skew
+        self.request_timeout = request_timeout
+        # 保留期至少覆盖一个待核对视频的匹配时间窗口，否则清除的条目可能被重新匹配
+        self.resolved_retention = max(resolved_retention, verify_timeout + 2 * time_skew)
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._records = self._load()
+        # 已经匹配过的内容条目，同一条目不会匹配给两个视频
+        self._claimed_items = set()
+        self._prune(time.time())
+
+    @classmethod
+    def from_config(cls, config):
+        """根据 [UploadVerifier] 构建核对器；未启用或未配置 content_list_url 时返回 None。"""
+        if not config.getboolean('UploadVerifier', 'enabled', fallback=False):
+            return None
+        list_url = config.get('UploadVerifier', 'content_list_url', fallback='').strip()
+        if not list_url:
+            logger.warning("已启用上传结果核对，但未配置 content_list_url，核对功能不会启动。")
+            return None
+        return cls(
+            config,
+            list_url,
+            get_status_file_path(config),
+            items_path=config.get('UploadVerifier', 'items_path', fallback='data.list'),
+            id_field=config.get('UploadVerifier', 'id_field', fallback='id'),
+            title_field=config.get('UploadVerifier', 'title_field', fallback='title'),
+            time_field=config.get('UploadVerifier', 'time_field', fallback='create_time'),
+            status_field=config.get('UploadVerifier', 'status_field', fallback='status'),
+            page_size=config.getint('UploadVerifier', 'page_size', fallback=20),
+            max_pages=config.getint('UploadVerifier', 'max_pages', fallback=5),
+            poll_interval=config.getfloat('UploadVerifier', 'poll_interval_seconds', fallback=120),
+            verify_timeout=config.getfloat('UploadVerifier', 'verify_timeout_minutes', fallback=60) * 60,
+            time_skew=config.getfloat('UploadVerifier', 'time_skew_seconds', fallback=300),
+            resolved_retention=config.getfloat('UploadVerifier', 'resolved_retention_days', fallback=30) * 86400,
+        )
+
+    # --- 状态持久化 ---
+
+    def _load(self):
+        try:
+            with open(self.status_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.warning(f"上传状态文件 {self.status_file} 无法读取，将重建: {e}")
+            return {}
+
+    def _prune(self, now):
+        """清除超过保留期的核对结果，并根据剩余记录重建已匹配的内容条目集合（调用方持有锁或尚未启动线程）。"""
+        cutoff = now - self.resolved_retention
+        self._records = {path: r for path, r in self._records.items()
+                         if r.get('status') == STATUS_PENDING or r.get('verified_at', now) >= cutoff}
+        self._claimed_items = {r['item_id'] for r in self._records.values() if r.get('item_id')}
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.status_file) or '.', exist_ok=True)
+        temp_path = f"{self.status_file}.{os.getpid()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._records, f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, self.status_file)
+
+    # --- 对外接口 ---
+
+    def submit(self, video_path, title, started_at, finished_at=None):
+        """登记一个已点击发布的视频。title 为平台上显示的标题（未填写时平台默认使用文件名）。"""
+        with self._lock:
+            self._records[video_path] = {
+                'title': title,
+                'started_at': started_at,
+                'finished_at': finished_at or time.time(),
+                'status': STATUS_PENDING,
+            }
+            self._save()
+
+    def get_status(self, video_path):
+        with self._lock:
+            record = self._records.get(video_path)
+            return record['status'] if record else None
+
+    def pending_count(self):
+        with self._lock:
+            return sum(1 for r in self._records.values() if r['status'] == STATUS_PENDING)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='upload-verifier', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join(timeout)
+        with self._lock:
+            self._save()
+
+    # --- 后台核对 ---
+
+    def _run(self):
+        while not self._stopped.is_set():
+            # 新提交的视频不马上核对，平台入库需要一点时间
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+            if self._stopped.is_set():
+                break
+            if self.pending_count():
+                try:
+                    self.poll_once()
+                except Exception as e:
+                    logger.error(f"核对上传结果时发生意外错误: {e}", exc_info=True)
+
+    def _fetch_page(self, session, cookies, page):
+        url = self.list_url.format(page=page, page_size=self.page_size)
+        response = session.get(url, cookies=cookies, timeout=self.request_timeout)
+        response.raise_for_status()
+        items = _dig(response.json(), self.items_path)
+        return items if isinstance(items, list) else []
+
+    def poll_once(self):
+        """拉取一次内容列表并更新所有待核对视频的状态，返回本次确认的视频数量。"""
+        with self._lock:
+            pending = {path: dict(r) for path, r in self._records.items() if r['status'] == STATUS_PENDING}
+        if not pending:
+            return 0
+        oldest = min(r['started_at'] for r in pending.values()) - self.time_skew
+
+        # 内容列表按发布时间倒序，翻到比最早的待核对视频还旧的条目即可停止
+        session = http_client.get_session()
+        cookies = load_cookie_jar(self.config)
+        items = []
+        try:
+            for page in range(1, self.max_pages + 1):
+                page_items = self._fetch_page(session, cookies, page)
+                items.extend(page_items)
+                times = [_parse_timestamp(_dig(item, self.time_field)) for item in page_items]
+                times = [t for t in times if t is not None]
+                if len(page_items) < self.page_size or (times and min(times) < oldest):
+                    break
+        except (RequestException, ValueError) as e:
+            # 网络异常或登录失效时保留待核对状态，下次轮询重试
+            logger.warning(f"获取内容列表失败，稍后重试: {e}")
+            if not items:
+                return 0
+
+        confirmed = 0
+        now = time.time()
+        with self._lock:
+            for path, record in pending.items():
+                item = self._match(record, items)
+                current = self._records.get(path)
+                if current is None or current['status'] != STATUS_PENDING:
+                    continue
+                if item is not None:
+                    item_id = str(_dig(item, self.id_field) or '')
+                    if item_id:
+                        self._claimed_items.add(item_id)
+                    current.update(status=STATUS_CONFIRMED, item_id=item_id or None,
+                                   platform_status=_dig(item, self.status_field), verified_at=now)
+                    confirmed += 1
+                    logger.info(f"已确认视频 {os.path.basename(path)} 出现在内容列表中。")
+                elif now - record['finished_at'] > self.verify_timeout:
+                    current.update(status=STATUS_MISSING, verified_at=now)
+                    logger.error(f"视频 {os.path.basename(path)} 在 {self.verify_timeout / 60:.0f} 分钟内未出现在内容列表中，请人工检查。")
+            self._prune(now)
+            self._save()
+        return confirmed
+
+    def _match(self, record, items):
+        """在内容列表中查找标题一致、创建时间落在上传时间窗口内且尚未被匹配的条目。"""
+        title = _normalize_title(record['title'])
+        earliest = record['started_at'] - self.time_skew
+        latest = record['finished_at'] + self.time_skew
+        for item in items:
+            if _normalize_title(_dig(item, self.title_field)) != title:
+                continue
+            item_id = str(_dig(item, self.id_field) or '')
+            if item_id and item_id in self._claimed_items:
+                continue
+            created = _parse_timestamp(_dig(item, self.time_field))
+            if created is None or earliest <= created <= latest:
+                return item
+        return None
+
+
+def get_status_file_path(config):
+    """状态文件路径，相对路径相对于项目根目录（与 Cookies 文件一致）。"""
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    path = config.get('UploadVerifier', 'status_file', fallback=DEFAULT_STATUS_FILE_NAME)
+    return path if os.path.isabs(path) else os.path.join(project_root, path)
@@ -1,12 +1,29 @@
 import os
+import math
 import subprocess
 import logging
 from datetime import datetime
 
+try:
+    import numpy # 可选依赖，用于封面候选帧的批量评分
+except ImportError:
+    numpy = None
+
 
 
 def extract_cover_image(video_path, config, output_folder="VideoUploaderProject/temp_covers"):
-    """使用 FFmpeg 从指定的视频文件中提取特定帧作为封面图片。"""
+    """
+    使用 FFmpeg 从指定的视频文件中提取封面图片。
+    [VideoSettings] cover_selection = best 时自动挑选最佳帧 (需要 numpy)，否则提取固定的第 cover_frame_index 帧。
+    """
+    if config.get('VideoSettings', 'cover_selection', fallback='fixed').strip().lower() == 'best':
+        if numpy is None:
+            logging.warning("未安装 numpy，无法自动挑选封面帧，改用固定帧。")
+        else:
+            cover_image_path = select_best_cover(video_path, config, output_folder)
+            if cover_image_path:
+                return cover_image_path
+            logging.warning(f"自动挑选封面失败，改用固定帧: {video_path}")
     # 从配置中获取要提取的帧的索引，如果未设置则默认为第 9 帧
     frame_index = config.getint('VideoSettings', 'cover_frame_index', fallback=9)
     # 从配置中获取 FFmpeg 可执行文件的路径，如果未设置则默认为 'ffmpeg' (假设在系统PATH中)
@@ -38,13 +55,13 @@ def extract_cover_image(video_path, config, output_folder="VideoUploaderProject/
     ]
 
     try:
-        logging.info(f"执行 FFmpeg 命令: {' '.join(command)}") # 记录将要执行的命令
+        logging.debug(f"执行 FFmpeg 命令: {' '.join(command)}") # 记录将要执行的命令
         # 执行 FFmpeg 命令，捕获输出，进行文本解码，并检查是否有错误
         process = subprocess.run(command, capture_output=True, text=True, check=True, shell=False)
-        logging.info(f"FFmpeg 输出: {process.stdout}") # 记录 FFmpeg 的标准输出
+        logging.debug(f"FFmpeg 输出: {process.stdout}") # 记录 FFmpeg 的标准输出
         if process.stderr:
-            # FFmpeg 可能会将一些信息性内容输出到 stderr，所以这里作为 info 级别记录
-            logging.info(f"FFmpeg 错误输出 (可能只是信息): {process.stderr}")
+            # FFmpeg 会将大量信息性内容（横幅、进度）输出到 stderr，只在 debug 级别记录
+            logging.debug(f"FFmpeg 错误输出 (可能只是信息): {process.stderr}")
         logging.info(f"封面成功提取到: {cover_image_path}")
         return cover_image_path # 返回成功提取的封面图片路径
     except subprocess.CalledProcessError as e: # 如果 FFmpeg 执行返回非零退出码
@@ -56,3 +73,219 @@ def extract_cover_image(video_path, config, output_folder="VideoUploaderProject/
         logging.error(f"FFmpeg 命令 '{ffmpeg_executable}' 未找到。请确保它已安装并配置在系统PATH中，或在 config.ini 中正确指定了路径。")
         return None # 记录错误并返回 None
 
+
+def probe_duration(video_path, config):
+    """使用 ffprobe 读取视频时长（秒），失败时返回 None。"""
+    ffprobe_executable = config.get('General', 'ffprobe_path', fallback='ffprobe')
+    command = [
+        ffprobe_executable,
+        '-v', 'error',
+        '-show_entries', 'format=duration', # 只读取容器头中的时长，不解码
+        '-of', 'default=noprint_wrappers=1:nokey=1',
+        video_path,
+    ]
+    try:
+        process = subprocess.run(command, capture_output=True, text=True, check=True, shell=False, timeout=30)
+        return float(process.stdout.strip())
+    except (subprocess.CalledProcessError, subprocess.TimeoutExpired, ValueError) as e:
+        logging.warning(f"读取视频时长失败 ({video_path}): {e}")
+        return None
+    except FileNotFoundError:
+        logging.error(f"ffprobe 命令 '{ffprobe_executable}' 未找到。请确保它已安装并配置在系统PATH中，或在 config.ini 中正确指定了路径。")
+        return None
+
+
+def score_frames(frames, weights=(1.0, 0.5, 0.5)):
+    """
+    对形状为 (帧数, 高, 宽, 3) 的 RGB 帧批量评分，返回每帧的得分数组。
+    清晰度为亮度拉普拉斯算子的方差，亮度越接近中间值越好，色彩丰富度使用 Hasler-Süsstrunk 指标；
+    三项分别按本批次最大值归一化后加权求和。接近全黑或全白的帧（片头、转场）得分为 -inf。
+    """
+    frames = frames.astype(numpy.float32)
+    red, green, blue = frames[..., 0], frames[..., 1], frames[..., 2]
+    luma = 0.299 * red + 0.587 * green + 0.114 * blue
+
+    laplacian = (luma[:, :-2, 1:-1] + luma[:, 2:, 1:-1] + luma[:, 1:-1, :-2] + luma[:, 1:-1, 2:]
+                 - 4 * luma[:, 1:-1, 1:-1])
+    sharpness = laplacian.var(axis=(1, 2))
+    mean_luma = luma.mean(axis=(1, 2)) / 255.0
+    brightness = 1.0 - numpy.abs(mean_luma - 0.5) * 2
+    rg = red - green
+    yb = 0.5 * (red + green) - blue
+    colorfulness = (numpy.sqrt(rg.var(axis=(1, 2)) + yb.var(axis=(1, 2)))
+                    + 0.3 * numpy.sqrt(rg.mean(axis=(1, 2)) ** 2 + yb.mean(axis=(1, 2)) ** 2))
+
+    metrics = numpy.stack([sharpness, brightness, colorfulness])
+    metrics /= numpy.maximum(metrics.max(axis=1, keepdims=True), 1e-6)
+    scores = numpy.asarray(weights, dtype=numpy.float32) @ metrics
+    scores[(mean_luma < 0.08) | (mean_luma > 0.95)] = -numpy.inf
+    return scores
+
+
+def _sample_frames(video_path, ffmpeg_executable, start, sample_rate, sample_count, width, height):
+    """一次解码按 sample_rate (帧/秒) 抽样并缩小的帧，通过管道读取为 (帧数, 高, 宽, 3) 数组。"""
+    command = [
+        ffmpeg_executable, '-v', 'error',
+        '-ss', f"{start:.3f}", '-i', video_path,
+        '-vf', f"fps={sample_rate:.6f},scale={width}:{height}",
+        '-frames:v', str(sample_count),
+        '-f', 'rawvideo', '-pix_fmt', 'rgb24', '-',
+    ]
+    logging.debug(f"执行 FFmpeg 命令: {' '.join(command)}")
+    process = subprocess.run(command, capture_output=True, check=True, shell=False, timeout=300)
+    frame_size = width * height * 3
+    count = len(process.stdout) // frame_size
+    return numpy.frombuffer(process.stdout, dtype=numpy.uint8, count=count * frame_size).reshape(count, height, width, 3)
+
+
+def select_best_cover(video_path, config, output_folder="VideoUploaderProject/temp_covers"):
+    """
+    自动挑选封面：一次 FFmpeg 解码抽取均匀分布的缩小帧，用 numpy 批量评分，
+    再只以原始分辨率输出得分最高的那一帧。失败时返回 None。
+    """
+    if numpy is None:
+        logging.error("自动挑选封面需要 numpy，请先安装 (pip install numpy)。")
+        return None
+    if not os.path.exists(video_path):
+        logging.error(f"视频文件不存在: {video_path}")
+        return None
+    ffmpeg_executable = config.get('General', 'ffmpeg_path', fallback='ffmpeg')
+    sample_count = config.getint('VideoSettings', 'cover_sample_count', fallback=24)
+    width = config.getint('VideoSettings', 'cover_analysis_width', fallback=160)
+    height = config.getint('VideoSettings', 'cover_analysis_height', fallback=90)
+    skip_percent = config.getfloat('VideoSettings', 'cover_skip_start_percent', fallback=5)
+    weights = tuple(config.getfloat('VideoSettings', f'cover_weight_{name}', fallback=default)
+                    for name, default in (('sharpness', 1.0), ('brightness', 0.5), ('colorfulness', 0.5)))
+
+    duration = probe_duration(video_path, config)
+    if not duration:
+        return None
+    # 跳过片头，在剩余时长内均匀抽样
+    start = duration * skip_percent / 100.0
+    sample_rate = sample_count / max(duration - start, 0.1)
+
+    try:
+        frames = _sample_frames(video_path, ffmpeg_executable, start, sample_rate, sample_count, width, height)
+    except subprocess.CalledProcessError as e:
+        logging.error(f"FFmpeg 抽样帧失败. 返回码: {e.returncode}, stderr: {e.stderr.decode('utf-8', 'replace')}")
+        return None
+    except subprocess.TimeoutExpired:
+        logging.error(f"FFmpeg 抽样帧超时: {video_path}")
+        return None
+    except FileNotFoundError:
+        logging.error(f"FFmpeg 命令 '{ffmpeg_executable}' 未找到。请确保它已安装并配置在系统PATH中，或在 config.ini 中正确指定了路径。")
+        return None
+    if not len(frames):
+        logging.error(f"未能从视频中抽取任何帧: {video_path}")
+        return None
+
+    scores = score_frames(frames, weights)
+    best = int(numpy.argmax(scores))
+    # fps 滤镜输出的第 k 帧对应抽样区间 [k/rate, (k+1)/rate) 的起点
+    timestamp = start + best / sample_rate
+    logging.debug(f"封面候选帧得分: {numpy.round(scores, 3).tolist()}，选中第 {best} 帧 ({timestamp:.2f}s)")
+
+    os.makedirs(output_folder, exist_ok=True)
+    video_filename = os.path.splitext(os.path.basename(video_path))[0]
+    cover_image_path = os.path.join(output_folder, f"{video_filename}_cover_best.jpg")
+    command = [
+        ffmpeg_executable, '-v', 'error',
+        '-ss', f"{timestamp:.3f}", '-i', video_path,
+        '-frames:v', '1', '-q:v', '2',
+        cover_image_path, '-y',
+    ]
+    try:
+        subprocess.run(command, capture_output=True, text=True, check=True, shell=False, timeout=60)
+    except (subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
+        logging.error(f"FFmpeg 输出封面失败: {e}")
+        return None
+    logging.info(f"已自动挑选封面 ({timestamp:.2f}s，共评估 {len(frames)} 帧): {cover_image_path}")
+    return cover_image_path
+
+
+def plan_segments(duration, size_bytes, max_duration=0, max_bytes=0, margin=0.95, keyframe_window=0):
+    """
+    按时长和文件大小限制规划分段，返回各分段的目标起点（秒，不含 0）；不需要分段时返回空列表。
+    按大小分段时假设码率均匀。实际切点取目标之前最近的关键帧，分段最多变长 keyframe_window 秒，规划时预留出来；
+    预留最多占时长限制的一半，时长限制很小时不会规划出大量极短的分段。
+    """
+    count = 1
+    if max_duration:
+        usable = max_duration * margin
+        count = max(count, math.ceil(duration / max(usable - min(keyframe_window, usable / 2), 1.0)))
+    if max_bytes:
+        # 关键帧对齐造成的时长偏差按比例换算成大小偏差
+        slack = min(keyframe_window / duration, 0.5) if duration else 0
+        count = max(count, math.ceil(size_bytes / max(max_bytes * margin * (1 - slack), 1.0)))
+    if count <= 1:
+        return []
+    return [duration * index / count for index in range(1, count)]
+
+
+def probe_keyframes(video_path, config, targets, window=30.0):
+    """
+    对每个目标时间，用 ffprobe 只读取 [目标 - window, 目标] 区间的视频包，返回不晚于目标的最近关键帧时间。
+    不解码，也不读取整个文件；某个目标附近找不到关键帧时返回该目标本身 (-ss 会自动对齐到之前的关键帧)。
+    读取失败时返回 None。
+    """
+    if not targets:
+        return []
+    ffprobe_executable = config.get('General', 'ffprobe_path', fallback='ffprobe')
+    intervals = ','.join(f"{max(target - window, 0):.3f}%{target:.3f}" for target in targets)
+    command = [
+        ffprobe_executable, '-v', 'error',
+        '-select_streams', 'v:0',
+        '-read_intervals', intervals,
+        '-show_entries', 'packet=pts_time,flags',
+        '-of', 'csv=p=0',
+        video_path,
+    ]
+    try:
+        process = subprocess.run(command, capture_output=True, text=True, check=True, shell=False, timeout=120)
+    except (subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
+        logging.warning(f"读取视频关键帧失败 ({video_path}): {e}")
+        return None
+    except FileNotFoundError:
+        logging.error(f"ffprobe 命令 '{ffprobe_executable}' 未找到。请确保它已安装并配置在系统PATH中，或在 config.ini 中正确指定了路径。")
+        return None
+
+    keyframes = []
+    for line in process.stdout.splitlines():
+        pts_time, _, flags = line.partition(',')
+        if 'K' in flags:
+            try:
+                keyframes.append(float(pts_time))
+            except ValueError:
+                continue
+    keyframes.sort()
+    cuts = []
+    for target in targets:
+        before = [k for k in keyframes if target - window <= k <= target]
+        cuts.append(before[-1] if before else target)
+    return cuts
+
+
+def cut_segment(ffmpeg_executable, video_path, start, length, output_path):
+    """
+    用流复制 (-c copy，不重新编码) 截取 [start, start + length) 写入 output_path，length 为 None 时截到结尾。
+    先写入临时文件，成功后再改名。在进程池中执行，返回 (output_path, 错误信息或 None)。
+    """
+    stem, extension = os.path.splitext(output_path)
+    temp_path = f"{stem}.partial{extension}"
+    command = [ffmpeg_executable, '-v', 'error', '-ss', f"{start:.3f}", '-i', video_path]
+    if length is not None:
+        command += ['-t', f"{length:.3f}"]
+    command += ['-map', '0', '-c', 'copy', '-avoid_negative_ts', 'make_zero', temp_path, '-y']
+    try:
+        subprocess.run(command, capture_output=True, text=True, check=True, shell=False, timeout=1800)
+        os.replace(temp_path, output_path)
+        return output_path, None
+    except subprocess.CalledProcessError as e:
+        error = f"返回码 {e.returncode}: {e.stderr.strip()[-500:]}"
+    except (subprocess.TimeoutExpired, OSError) as e:
+        error = str(e)
+    try:
+        os.remove(temp_path)
+    except OSError:
+        pass
+    return output_path, error
@@ -12,10 +12,15 @@ import re
 import platform as py_platform
 import requests # Dependency: pip install requests
 import zipfile
-import io
 from selenium.common.exceptions import WebDriverException, SessionNotCreatedException, TimeoutException
 import json # Added for cookie handling
 import shutil # For shutil.which
+import threading # For step listener bookkeeping
+from web import diagnostics # 失败现场截图/DOM 快照
+from web import http_client # 共享连接池与条件请求缓存
+from web import driver_cache # 按平台/主版本缓存的 WebDriver 二进制
+from web import adaptive_timeouts # 根据历史步骤耗时调整等待超时
+from web import network_policy # CDP 请求拦截与页面加载瀑布
 
 # Windows-specific import for browser version detection
 if py_platform.system() == "Windows":
@@ -31,21 +36,6 @@ logger.setLevel(logging.INFO)
 # --- Cookie Handling Constants and Functions ---
 COOKIE_FILE_PATH_CONFIG_KEY = 'cookies_file_path'
 DEFAULT_COOKIE_FILE_NAME = "browser_cookies.json"
-LOGS_DIR_NAME = "logs" # For screenshots
-
-def _ensure_logs_dir(base_script_path=__file__):
-    """Ensures the logs directory exists relative to the script or project."""
-    try:
-
-        script_dir = os.path.dirname(os.path.abspath(base_script_path))
-        logs_path = os.path.join(script_dir, LOGS_DIR_NAME)
-        if not os.path.exists(logs_path):
-            os.makedirs(logs_path)
-            logger.debug(f"日志目录已创建: {logs_path}")
-        return logs_path
-    except Exception as e:
-        logger.error(f"创建日志目录失败: {e}")
-        return os.path.join(os.path.dirname(os.path.abspath(base_script_path)), LOGS_DIR_NAME) # Return path anyway
 
 def _get_cookie_file_path(config):
     script_dir = os.path.dirname(os.path.abspath(__file__))
@@ -115,6 +105,79 @@ def load_cookies_on_domain(driver, config, domain_url):
 # --- End Cookie Handling ---
 
 
+# --- Step Timing Hooks ---
+# 上传流程中每个步骤开始/结束时会通知已注册的监听器，供基准测试、统计等模块使用。
+# 事件为 dict: {'video', 'step', 'status' ('started'/'succeeded'/'failed'), 'elapsed', 'thread'}
+_step_listeners = []
+_step_listeners_lock = threading.Lock()
+
+def add_step_listener(listener):
+    """注册步骤事件监听器，listener(event) 在上传线程中被同步调用，应尽量轻量。"""
+    with _step_listeners_lock:
+        if listener not in _step_listeners:
+            _step_listeners.append(listener)
+
+def remove_step_listener(listener):
+    """移除已注册的步骤事件监听器。"""
+    with _step_listeners_lock:
+        if listener in _step_listeners:
+            _step_listeners.remove(listener)
+
+def _notify_step_listeners(event):
+    with _step_listeners_lock:
+        listeners = list(_step_listeners)
+    for listener in listeners:
+        try:
+            listener(event)
+        except Exception as e:
+            logger.debug(f"步骤监听器 {listener} 处理事件失败: {e}")
+
+class _StepRecorder:
+    """记录单个视频上传过程中各步骤的耗时。开始新步骤时会以成功结束上一个步骤。"""
+
+    def __init__(self, video_file_path):
+        self.video_file_path = video_file_path
+        self.current_step = None
+        self._started_at = None
+
+    def start(self, step_name):
+        self._close('succeeded')
+        self.current_step = step_name
+        self._started_at = time.perf_counter()
+        self._emit(step_name, 'started', None)
+
+    def fail(self):
+        self._close('failed')
+
+    def finish(self):
+        self._close('succeeded')
+
+    def _close(self, status):
+        if self.current_step is None:
+            return
+        step_name, self.current_step = self.current_step, None
+        elapsed = time.perf_counter() - self._started_at
+        # 固定格式，供 log_indexer 从历史日志中提取失败步骤和步骤耗时
+        if status == 'failed':
+            logger.warning(f"上传步骤 {step_name} 失败，耗时 {elapsed:.2f} 秒")
+        else:
+            logger.info(f"上传步骤 {step_name} 完成，耗时 {elapsed:.2f} 秒")
+        self._emit(step_name, status, elapsed)
+
+    def _emit(self, step_name, status, elapsed):
+        if not _step_listeners:
+            return
+        _notify_step_listeners({
+            'video': self.video_file_path,
+            'step': step_name,
+            'status': status,
+            'elapsed': elapsed,
+            'thread': threading.current_thread().name,
+        })
+
+# --- End Step Timing Hooks ---
+
+
 # Helper functions for Edge and WebDriver management
 
 def _get_edge_browser_version_windows():
@@ -190,13 +253,36 @@ def _get_local_webdriver_version(driver_executable_path):
         logger.error(f"从 '{driver_executable_path}' 获取 WebDriver 版本时出错: {e}")
         return None
 
-def _get_webdriver_download_url(browser_major_version, os_platform_suffix="win64"):
+def _get_webdriver_cache_dirs(config):
+    """
+    返回 (HTTP 元数据缓存目录, 下载目录, 镜像目录或 None)。
+    相对路径相对于本脚本所在目录。
+    """
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    def _resolve(path):
+        return path if os.path.isabs(path) else os.path.normpath(os.path.join(script_dir, path))
+    http_cache_dir = _resolve(config.get('WebDriver', 'http_cache_dir', fallback=os.path.join('driver_cache', 'http')))
+    download_dir = _resolve(config.get('WebDriver', 'download_dir', fallback=os.path.join('driver_cache', 'downloads')))
+    mirror_dir = config.get('WebDriver', 'mirror_dir', fallback='').strip()
+    return http_cache_dir, download_dir, _resolve(mirror_dir) if mirror_dir else None
+
+def _decode_version_text(content, content_type):
+    """LATEST_RELEASE 文件通常是带 BOM 的 UTF-16，这里统一解码为版本字符串。"""
+    if 'utf-16' in content_type.lower() or content.startswith((b'\xff\xfe', b'\xfe\xff')):
+        text = content.decode('utf-16', errors='ignore')
+    else:
+        text = content.decode('utf-8', errors='ignore')
+    return text.strip('\x00').strip().lstrip('\ufeff')
+
+def _get_webdriver_download_url(browser_major_version, os_platform_suffix="win64", config=None):
     """
     尝试确定 Edge WebDriver 的下载 URL。
-    使用 Microsoft 的 LATEST_RELEASE_{MAJOR_VERSION} 端点。
+    使用 Microsoft 的 LATEST_RELEASE_{MAJOR_VERSION} 端点，通过共享连接池和条件请求缓存获取。
     """
     logger.debug(f"尝试查找与 Edge 主版本 {browser_major_version} ({os_platform_suffix}) 兼容的 WebDriver 下载 URL")
     base_url = "https://msedgedriver.azureedge.net"
+    http_cache_dir, _, mirror_dir = _get_webdriver_cache_dirs(config) if config is not None else (
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), 'driver_cache', 'http'), None, None)
     
     try:
         version_info_url = f"{base_url}/LATEST_RELEASE_{browser_major_version}"
@@ -207,24 +293,14 @@ def _get_webdriver_download_url(browser_major_version, os_platform_suffix="win64
         elif py_platform.system() == "Darwin":
              version_info_url = f"{base_url}/LATEST_RELEASE_{browser_major_version}_MACOS"
 
-        response = requests.get(version_info_url, timeout=10)
-        response.raise_for_status()
-        content_type = response.headers.get('content-type', '').lower()
-        if 'utf-16' in content_type:
-            driver_version_full = response.content.decode('utf-16-le', errors='ignore').strip('\x00').strip()
-        else:
-            driver_version_full = response.text.strip()
+        content, content_type = http_client.fetch_cached(version_info_url, http_cache_dir, timeout=10, mirror_dir=mirror_dir)
+        driver_version_full = _decode_version_text(content, content_type)
         
         if not re.match(r"^\d+\.\d+\.\d+\.\d+$", driver_version_full):
             logger.warning(f"从 '{version_info_url}' 获取的版本字符串 '{driver_version_full}' 不是有效的版本格式。")
             stable_url = f"{base_url}/LATEST_STABLE"
-            response_stable = requests.get(stable_url, timeout=10)
-            response_stable.raise_for_status()
-            stable_content_type = response_stable.headers.get('content-type', '').lower()
-            if 'utf-16' in stable_content_type:
-                 stable_version = response_stable.content.decode('utf-16-le', errors='ignore').strip('\x00').strip()
-            else:
-                 stable_version = response_stable.text.strip()
+            stable_content, stable_content_type = http_client.fetch_cached(stable_url, http_cache_dir, timeout=10, mirror_dir=mirror_dir)
+            stable_version = _decode_version_text(stable_content, stable_content_type)
 
             if stable_version.startswith(str(browser_major_version) + "."):
                 logger.debug(f"使用 LATEST_STABLE 版本 {stable_version}，因为它匹配主版本 {browser_major_version}。")
@@ -236,69 +312,57 @@ def _get_webdriver_download_url(browser_major_version, os_platform_suffix="win64
         logger.info(f"确定 Edge {browser_major_version} 的 WebDriver 版本为: {driver_version_full}")
         return f"{base_url}/{driver_version_full}/edgedriver_{os_platform_suffix}.zip"
         
-    except requests.exceptions.RequestException as e:
+    except (requests.exceptions.RequestException, OSError) as e:
         logger.error(f"从 Azure 获取 Edge {browser_major_version} 的 WebDriver 版本/URL 时出错: {e}")
         return None
 
-def _download_and_extract_webdriver(webdriver_url, driver_target_path):
+def _download_and_extract_webdriver(webdriver_url, driver_target_path, config=None):
     """
     从 URL 下载 WebDriver 并将 msedgedriver.exe 解压缩到 driver_target_path。
-    显示中文下载进度。
+    压缩包流式写入下载目录（支持断点续传），再直接从磁盘解压，不在内存中保留整个文件。
     """
     driver_dir = os.path.dirname(driver_target_path)
     os.makedirs(driver_dir, exist_ok=True) # 确保目录存在
 
-    if os.path.exists(driver_target_path):
-        try:
-            logger.debug(f"发现已存在的 WebDriver: {driver_target_path}，尝试删除...")
-            os.remove(driver_target_path)
-            logger.debug(f"已删除旧的 WebDriver: {driver_target_path}")
-        except OSError as e:
-            logger.error(f"删除旧的 WebDriver {driver_target_path} 失败: {e}. 请手动删除并重试。")
-            return False # 返回 False 表示准备失败
-    
+    if config is not None:
+        _, download_dir, mirror_dir = _get_webdriver_cache_dirs(config)
+    else:
+        download_dir, mirror_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'driver_cache', 'downloads'), None
+    # 以 "<版本>_<文件名>" 命名，避免不同版本的压缩包互相覆盖
+    url_parts = webdriver_url.rstrip('/').split('/')
+    archive_path = os.path.join(download_dir, f"{url_parts[-2]}_{url_parts[-1]}")
+
     try:
-        logger.info(f"开始下载 WebDriver 从: {webdriver_url}")
-        response = requests.get(webdriver_url, stream=True, timeout=300) # 5分钟超时
-        response.raise_for_status()
-        
-        total_size = response.headers.get('content-length')
-        if total_size is None:
-            logger.warning("无法获取文件总大小，将不显示下载进度。")
-            file_content = response.content
+        if os.path.exists(archive_path) and zipfile.is_zipfile(archive_path):
+            logger.info(f"使用已下载的 WebDriver 压缩包: {archive_path}")
         else:
-            total_size = int(total_size)
-            downloaded_size = 0
-            file_content_buffer = io.BytesIO()
-            chunk_size = 8192 
-            last_reported_progress = -1
-
-            logger.info(f"文件总大小: {total_size / (1024*1024):.2f} MB")
-            for data_chunk in response.iter_content(chunk_size=chunk_size):
-                file_content_buffer.write(data_chunk)
-                downloaded_size += len(data_chunk)
-                progress_percentage = int((downloaded_size / total_size) * 100)
-                
-                if progress_percentage != last_reported_progress:
-                    print(f"下载进度: {progress_percentage}% ({downloaded_size / (1024*1024):.2f} MB / {total_size / (1024*1024):.2f} MB)", end='\r')
-                    last_reported_progress = progress_percentage
-            print() 
-            file_content = file_content_buffer.getvalue()
+            logger.info(f"开始下载 WebDriver 从: {webdriver_url}")
+            http_client.download_file(webdriver_url, archive_path, timeout=300, mirror_dir=mirror_dir) # 5分钟超时
             logger.info("WebDriver 下载完成。")
 
-        with zipfile.ZipFile(io.BytesIO(file_content)) as zf:
+        with zipfile.ZipFile(archive_path) as zf:
             driver_filename_in_zip = None
             for member_name in zf.namelist():
-                if member_name.lower().endswith("msedgedriver.exe"):
+                # Windows 压缩包中为 msedgedriver.exe，Linux/macOS 中为 msedgedriver
+                if os.path.basename(member_name).lower() in ("msedgedriver.exe", "msedgedriver"):
                     driver_filename_in_zip = member_name
                     break
             
             if not driver_filename_in_zip:
-                logger.error(f"在从 {webdriver_url} 下载的 zip 文件中未找到 'msedgedriver.exe'。")
+                logger.error(f"在从 {webdriver_url} 下载的 zip 文件中未找到 'msedgedriver'。")
                 return False
 
+            if os.path.exists(driver_target_path):
+                try:
+                    logger.debug(f"发现已存在的 WebDriver: {driver_target_path}，尝试删除...")
+                    os.remove(driver_target_path)
+                    logger.debug(f"已删除旧的 WebDriver: {driver_target_path}")
+                except OSError as e:
+                    logger.error(f"删除旧的 WebDriver {driver_target_path} 失败: {e}. 请手动删除并重试。")
+                    return False # 返回 False 表示准备失败
+
             with zf.open(driver_filename_in_zip) as source, open(driver_target_path, "wb") as target_file:
-                target_file.write(source.read())
+                shutil.copyfileobj(source, target_file)
             
             if py_platform.system() != "Windows":
                 os.chmod(driver_target_path, 0o755)
@@ -306,10 +370,14 @@ def _download_and_extract_webdriver(webdriver_url, driver_target_path):
             logger.info(f"WebDriver '{driver_filename_in_zip}' 已解压缩到 '{driver_target_path}'")
         return True
     except requests.exceptions.RequestException as e:
-        logger.error(f"下载 WebDriver 失败 (URL: {webdriver_url}): {e}")
+        logger.error(f"下载 WebDriver 失败 (URL: {webdriver_url}): {e}。再次运行时将从断点续传。")
         return False
     except zipfile.BadZipFile:
-        logger.error(f"下载的文件不是一个有效的 ZIP 文件 (URL: {webdriver_url}).")
+        logger.error(f"下载的文件不是一个有效的 ZIP 文件 (URL: {webdriver_url})，已删除以便重新下载。")
+        try:
+            os.remove(archive_path)
+        except OSError:
+            pass
         return False
     except Exception as e:
         logger.error(f"下载或解压 WebDriver 时发生错误: {e}", exc_info=True)
@@ -318,6 +386,7 @@ def _download_and_extract_webdriver(webdriver_url, driver_target_path):
 def _ensure_compatible_edgedriver(config):
     """
     检查是否存在兼容的 Edge WebDriver，如果需要则下载它。
+    下载结果写入按 (平台, 主版本) 索引的共享缓存（见 driver_cache），多个进程/主机之间不会重复下载。
     返回兼容 WebDriver 的路径，如果设置失败则返回 None。
     """
     browser_version_str = None
@@ -354,89 +423,118 @@ def _ensure_compatible_edgedriver(config):
         logger.error(f"无法从浏览器版本字符串 '{browser_version_str}' 解析主版本: {e}")
         return None
 
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    default_driver_name = "msedgedriver.exe"
-    # Default candidate path is next to this script
-    default_driver_path_candidate = os.path.join(script_dir, default_driver_name) 
-    
-    webdriver_path_from_config = config.get('General', 'edgedriver_path', fallback=default_driver_path_candidate)
-    
-    if not os.path.isabs(webdriver_path_from_config):
-        # If relative, assume it's relative to this script's directory.
-        final_webdriver_path = os.path.normpath(os.path.join(script_dir, webdriver_path_from_config))
-    else:
-        final_webdriver_path = os.path.normpath(webdriver_path_from_config)
-    
-    webdriver_dir = os.path.dirname(final_webdriver_path)
-    if not os.path.exists(webdriver_dir) and webdriver_dir :
-        try:
-            os.makedirs(webdriver_dir, exist_ok=True)
-            logger.info(f"已创建 WebDriver 目录: {webdriver_dir}")
-        except Exception as e:
-            logger.error(f"创建 WebDriver 目录 {webdriver_dir} 失败: {e}")
-            return None
-            
-    logger.debug(f"期望的 WebDriver 路径: {final_webdriver_path}")
-
-    local_webdriver_version_str = _get_local_webdriver_version(final_webdriver_path)
-    needs_download = True
-    if local_webdriver_version_str:
-        try:
-            local_webdriver_major_version = local_webdriver_version_str.split('.')[0]
-            if local_webdriver_major_version == browser_major_version:
-                logger.debug(f"在 '{final_webdriver_path}' 找到兼容的本地 WebDriver 版本 {local_webdriver_version_str} (适用于 Edge {browser_major_version})。")
-                needs_download = False
-            else:
-                logger.warning(f"本地 WebDriver 版本 {local_webdriver_version_str} (主版本 {local_webdriver_major_version}) "
-                               f"与 Edge 版本 {browser_version_str} (主版本 {browser_major_version}) 不兼容。")
-        except Exception as e:
-            logger.warning(f"无法从本地 WebDriver 版本 '{local_webdriver_version_str}' 解析主版本: {e}。假设不兼容。")
-    else:
-        logger.info(f"在 '{final_webdriver_path}' 未找到本地 WebDriver 或无法确定其版本。")
+    os_platform_tag = driver_cache.detect_platform_tag()
+    if not os_platform_tag:
+        logger.error(f"不支持的操作系统平台进行 WebDriver 下载: {py_platform.system()}")
+        return None
 
-    if needs_download:
-        logger.info(f"尝试下载 Edge 主版本 {browser_major_version} 的 WebDriver。")
-        
-        os_platform_tag = ""
-        system = py_platform.system()
-        arch = py_platform.architecture()[0] # '64bit' or '32bit'
-        machine = py_platform.machine().lower() # e.g., 'amd64', 'x86_64', 'arm64'
-
-        if system == "Windows":
-            os_platform_tag = "win64" if arch == '64bit' else "win32"
-        elif system == "Linux":
-            # Assume 64-bit for Linux, which is most common for WebDriver releases
-            os_platform_tag = "linux64" 
-        elif system == "Darwin": # macOS
-            # Check machine type for Apple Silicon (ARM) vs Intel
-            os_platform_tag = "mac_arm64" if "arm" in machine or machine == "aarch64" else "mac64"
+    # 配置中显式指定的 WebDriver 优先（由用户自行维护，不会被覆盖）
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    webdriver_path_from_config = config.get('General', 'edgedriver_path', fallback='').strip()
+    if webdriver_path_from_config:
+        if not os.path.isabs(webdriver_path_from_config):
+            # If relative, assume it's relative to this script's directory.
+            configured_webdriver_path = os.path.normpath(os.path.join(script_dir, webdriver_path_from_config))
         else:
-            logger.error(f"不支持的操作系统平台进行 WebDriver 下载: {system}")
-            return None
+            configured_webdriver_path = os.path.normpath(webdriver_path_from_config)
+        configured_version = _get_local_webdriver_version(configured_webdriver_path)
+        if configured_version and configured_version.split('.')[0] == browser_major_version:
+            logger.debug(f"使用配置的 WebDriver '{configured_webdriver_path}' (版本 {configured_version})。")
+            return configured_webdriver_path
+        logger.warning(f"配置的 WebDriver '{configured_webdriver_path}' (版本 {configured_version}) "
+                       f"与 Edge 版本 {browser_version_str} 不兼容或不存在，改用 WebDriver 缓存。")
+
+    # 按 (平台, 主版本) 查找缓存，命中时无需下载，也无需再启动驱动进程检查版本
+    cache = driver_cache.get_driver_cache(config)
+    entry = cache.lookup(browser_major_version, os_platform_tag)
+    if entry:
+        logger.debug(f"使用缓存的 WebDriver {entry['version']} ({os_platform_tag}): {entry['path']}")
+        return entry['path']
 
-        webdriver_url = _get_webdriver_download_url(browser_major_version, os_platform_tag)
-        
-        if not webdriver_url:
-            logger.error(f"无法自动确定 Edge {browser_major_version} ({os_platform_tag}) 的 WebDriver 下载 URL。")
-            logger.error(f"请检查网络连接或手动将 Edge {browser_major_version} 的 '{default_driver_name}' 下载到 '{final_webdriver_path}'。")
-            return None
+    try:
+        with cache.lock(browser_major_version, os_platform_tag):
+            # 等待锁期间其他进程可能已经填充了缓存
+            entry = cache.lookup_locked(browser_major_version, os_platform_tag)
+            if entry:
+                return entry['path']
+
+            # 兼容旧版本：脚本旁边已有兼容的 msedgedriver 时直接导入缓存
+            legacy_driver_path = os.path.join(script_dir, driver_cache.driver_binary_name(os_platform_tag))
+            legacy_version = _get_local_webdriver_version(legacy_driver_path)
+            if legacy_version and legacy_version.split('.')[0] == browser_major_version:
+                logger.info(f"将已有的 WebDriver '{legacy_driver_path}' (版本 {legacy_version}) 导入缓存。")
+                return cache.store(browser_major_version, os_platform_tag, legacy_version, legacy_driver_path)
+
+            logger.info(f"尝试下载 Edge 主版本 {browser_major_version} 的 WebDriver。")
+            webdriver_url = _get_webdriver_download_url(browser_major_version, os_platform_tag, config)
+            if not webdriver_url:
+                logger.error(f"无法自动确定 Edge {browser_major_version} ({os_platform_tag}) 的 WebDriver 下载 URL。")
+                logger.error(f"请检查网络连接、配置 [WebDriver] mirror_dir，或在 config.ini 的 edgedriver_path 中指定 Edge {browser_major_version} 的 WebDriver。")
+                return None
 
-        if _download_and_extract_webdriver(webdriver_url, final_webdriver_path):
-            logger.info(f"WebDriver 已成功下载并解压缩到 '{final_webdriver_path}'。")
-            new_webdriver_version = _get_local_webdriver_version(final_webdriver_path)
-            if new_webdriver_version and new_webdriver_version.startswith(browser_major_version + "."):
+            staging_path = cache.staging_path(os_platform_tag)
+            try:
+                if not _download_and_extract_webdriver(webdriver_url, staging_path, config):
+                    logger.error(f"从 {webdriver_url} 下载和设置 WebDriver 失败。")
+                    return None
+                new_webdriver_version = _get_local_webdriver_version(staging_path)
+                if not (new_webdriver_version and new_webdriver_version.startswith(browser_major_version + ".")):
+                    logger.error(f"下载的 WebDriver 版本 ({new_webdriver_version}) 仍然与 Edge {browser_major_version} 不兼容或无法验证。")
+                    return None
                 logger.info(f"已成功设置兼容的 WebDriver 版本 {new_webdriver_version}。")
-                return final_webdriver_path
-            else:
-                logger.error(f"下载的 WebDriver 版本 ({new_webdriver_version}) 仍然与 Edge {browser_major_version} 不兼容或无法验证。")
-                return None
-        else:
-            logger.error(f"从 {webdriver_url} 下载和设置 WebDriver 失败。")
-            return None
-            
-    return final_webdriver_path
+                return cache.store(browser_major_version, os_platform_tag, new_webdriver_version, staging_path)
+            finally:
+                if os.path.exists(staging_path):
+                    os.remove(staging_path)
+    except TimeoutError as e:
+        logger.error(f"等待其他进程准备 WebDriver 超时: {e}")
+        return None
+    except OSError as e:
+        logger.error(f"写入 WebDriver 缓存失败: {e}", exc_info=True)
+        return None
 
 
+# 低资源占用模式下追加的浏览器参数：关闭扩展、后台网络、组件更新等与上传无关的服务
+LOW_FOOTPRINT_ARGUMENTS = [
+    "--disable-extensions",
+    "--disable-background-networking",
+    "--disable-component-update",
+    "--disable-default-apps",
+    "--disable-sync",
+    "--disable-domain-reliability",
+    "--disable-client-side-phishing-detection",
+    "--disable-breakpad",
+    "--no-first-run",
+    "--no-default-browser-check",
+    "--metrics-recording-only",
+    "--mute-audio",
+    "--disable-features=Translate,MediaRouter,OptimizationHints,AutofillServerCommunication,msEdgeShopping,EdgeCollections",
+]
+
+def _apply_low_footprint_profile(edge_options, prefs, config):
+    """
+    为高密度部署的上传主机应用低资源占用配置：
+    关闭后台服务、限制磁盘缓存和渲染进程数量，并默认阻止图片加载（image_allowlist 中的站点除外）。
+    """
+    for argument in LOW_FOOTPRINT_ARGUMENTS:
+        edge_options.add_argument(argument)
+
+    disk_cache_mb = config.getint('BrowserSettings', 'disk_cache_size_mb', fallback=32)
+    if disk_cache_mb > 0:
+        edge_options.add_argument(f"--disk-cache-size={disk_cache_mb * 1024 * 1024}")
+    renderer_limit = config.getint('BrowserSettings', 'renderer_process_limit', fallback=2)
+    if renderer_limit > 0:
+        edge_options.add_argument(f"--renderer-process-limit={renderer_limit}")
+
+    if config.getboolean('BrowserSettings', 'block_images', fallback=True):
+        # 2 = 阻止；白名单内的站点 (例如上传页所在域名，封面预览需要图片) 设为 1 = 允许
+        prefs["profile.managed_default_content_settings.images"] = 2
+        allowlist = [p.strip() for p in config.get('BrowserSettings', 'image_allowlist', fallback='[*.]toutiao.com').split(',') if p.strip()]
+        prefs["profile.content_settings.exceptions.images"] = {
+            f"{pattern},*": {"setting": 1} for pattern in allowlist
+        }
+    logger.info(f"已启用低资源占用浏览器配置 (磁盘缓存 {disk_cache_mb} MB, 渲染进程上限 {renderer_limit})。")
+
 def create_driver(config):
     """创建并返回一个 Edge WebDriver 实例，在创建前检查并准备WebDriver"""
     
@@ -532,6 +630,8 @@ def create_driver(config):
         
         # Disable password manager popups (might not be needed if using profile)
         prefs = {"credentials_enable_service": False, "profile.password_manager_enabled": False}
+        if config.getboolean('BrowserSettings', 'low_footprint', fallback=False):
+            _apply_low_footprint_profile(edge_options, prefs, config)
         edge_options.add_experimental_option("prefs", prefs)
         
         edge_service = EdgeService(executable_path=compatible_webdriver_path)
@@ -540,6 +640,8 @@ def create_driver(config):
 
         driver = webdriver.Edge(service=edge_service, options=edge_options)
         logger.info("Edge WebDriver 实例创建成功。")
+        # 在首次导航之前设置请求拦截，后续每次导航都生效
+        network_policy.apply_network_policy(driver, config)
         return driver
         
     except SessionNotCreatedException as e:
@@ -559,7 +661,6 @@ def login_to_website(driver, config):
     """处理网站登录逻辑。如果需要，等待用户手动登录，并保存/加载cookies。"""
     upload_url = config.get('WebTarget', 'upload_url')
     cookie_domain_url = config.get('WebTarget', 'cookie_domain_url', fallback="https://mp.toutiao.com") 
-    logs_path = _ensure_logs_dir()
 
     # 尝试加载 Cookies
     cookies_loaded_successfully = load_cookies_on_domain(driver, config, cookie_domain_url)
@@ -659,29 +760,144 @@ def login_to_website(driver, config):
                 return True
             else:
                 logger.error(f"在 {manual_login_timeout} 秒内未检测到成功的手动登录或目标元素未出现。")
-                try:
-                    screenshot_path = os.path.join(logs_path, "manual_login_timeout.png")
-                    driver.save_screenshot(screenshot_path)
-                    logger.debug(f"已保存截图到: {screenshot_path}")
-                except Exception as scr_e:
-                    logger.error(f"保存截图失败: {scr_e}")
+                diagnostics.capture_failure(driver, config, "manual_login_timeout")
                 return False
         else:
             logger.error(f"页面 ({driver.current_url}) 未识别为登录页面，但目标元素 '{target_page_element_locator[1]}' 也未找到。请检查页面状态和元素定位符。")
-            try:
-                screenshot_path = os.path.join(logs_path, "target_element_not_found_not_login_page.png")
-                driver.save_screenshot(screenshot_path)
-                logger.debug(f"已保存截图到: {screenshot_path}")
-            except Exception as scr_e:
-                logger.error(f"保存截图失败: {scr_e}")
+            diagnostics.capture_failure(driver, config, "target_element_not_found_not_login_page")
             return False
 
 
-def perform_video_upload(driver, video_file_path, video_title, cover_image_path, config):
-    """在已登录的页面上执行视频上传操作"""
-    logs_path = _ensure_logs_dir()
+# --- Metadata Form Filling ---
+DEFAULT_TITLE_SELECTOR = "input[placeholder*='标题'], textarea[placeholder*='标题']"
+DEFAULT_DESCRIPTION_SELECTOR = "textarea[placeholder*='简介'], [contenteditable='true'][data-placeholder*='简介']"
+DEFAULT_TAG_SELECTOR = "input[placeholder*='标签'], input[placeholder*='话题']"
+
+# 一次脚本调用填写标题、简介和标签。使用原生 value setter 并派发 input 事件，
+# 让页面框架（React 等受控组件）感知到修改；标签逐个输入后模拟回车确认。
+_FILL_METADATA_SCRIPT = """
+const [fields, tags, tagSelector] = arguments;
+const missing = [];
+function setValue(el, value) {
+    el.focus();
+    if (el.isContentEditable) {
+        el.textContent = value;
+    } else {
+        const proto = el.tagName === 'TEXTAREA' ? HTMLTextAreaElement.prototype : HTMLInputElement.prototype;
+        Object.getOwnPropertyDescriptor(proto, 'value').set.call(el, value);
+    }
+    el.dispatchEvent(new Event('input', {bubbles: true}));
+    el.dispatchEvent(new Event('change', {bubbles: true}));
+}
+for (const [name, selector, value] of fields) {
+    const el = document.querySelector(selector);
+    if (!el) { missing.push(name); continue; }
+    setValue(el, value);
+    el.blur();
+}
+if (tags.length) {
+    const tagInput = document.querySelector(tagSelector);
+    if (!tagInput) {
+        missing.push('tags');
+    } else {
+        for (const tag of tags) {
+            setValue(tagInput, tag);
+            for (const type of ['keydown', 'keypress', 'keyup']) {
+                tagInput.dispatchEvent(new KeyboardEvent(type, {key: 'Enter', code: 'Enter', keyCode: 13, which: 13, bubbles: true}));
+            }
+        }
+        tagInput.blur();
+    }
+}
+return missing;
+"""
+
+def fill_metadata_fields(driver, config, title=None, description=None, tags=None):
+    """在上传表单中一次性填写标题、简介和标签，返回未找到输入框的字段名列表。空值的字段保持平台默认。"""
+    fields = []
+    if title:
+        fields.append(['title', config.get('Metadata', 'title_selector', fallback=DEFAULT_TITLE_SELECTOR), title])
+    if description:
+        fields.append(['description', config.get('Metadata', 'description_selector', fallback=DEFAULT_DESCRIPTION_SELECTOR), description])
+    tags = list(tags or [])
+    if not fields and not tags:
+        return []
+    tag_selector = config.get('Metadata', 'tag_selector', fallback=DEFAULT_TAG_SELECTOR)
+    return driver.execute_script(_FILL_METADATA_SCRIPT, fields, tags, tag_selector) or []
+
+# --- End Metadata Form Filling ---
+
+# --- Custom Cover Upload ---
+# 封面对话框中“本地上传”标签、图片输入框和确认按钮，可在 [VideoSettings] 中覆盖
+DEFAULT_COVER_UPLOAD_TAB_XPATH = "/html/body/div[6]/div/div[2]/div/div[1]/ul/li[2]"
+DEFAULT_COVER_IMAGE_INPUT_XPATH = "//input[@type='file' and contains(@accept,'image')]"
+DEFAULT_COVER_UPLOAD_CONFIRM_XPATH = "//button[not(@disabled) and (normalize-space(.)='确定' or normalize-space(.)='完成')]"
+COVER_FINAL_CONFIRM_XPATH = "/html/body/div[7]/div/div[2]/div/div[2]/button[2]"
+
+def upload_cover_image(driver, config, cover_image_path, steps, step_timeout, video_file_path=None):
+    """
+    在已打开的封面对话框中通过本地图片输入框上传预先提取的封面，跳过页面内截取封面的流程。
+    找不到图片输入框时返回 False，调用方可改用页面截取（对话框仍然打开）；确认按钮超时时抛出 TimeoutException。
+    """
+    tab_xpath = config.get('VideoSettings', 'cover_upload_tab_xpath', fallback=DEFAULT_COVER_UPLOAD_TAB_XPATH).strip()
+    input_xpath = config.get('VideoSettings', 'cover_image_input_xpath', fallback=DEFAULT_COVER_IMAGE_INPUT_XPATH)
+    confirm_xpath = config.get('VideoSettings', 'cover_upload_confirm_xpath', fallback=DEFAULT_COVER_UPLOAD_CONFIRM_XPATH)
+
+    steps.start('cover_upload')
+    upload_timeout = step_timeout('cover_upload', 10)
+    if tab_xpath:
+        try:
+            WebDriverWait(driver, upload_timeout).until(EC.element_to_be_clickable((By.XPATH, tab_xpath))).click()
+            logger.debug("'本地上传' 标签已点击。")
+        except TimeoutException:
+            logger.debug(f"未找到 '本地上传' 标签 ({tab_xpath})，直接查找图片输入框。")
+    try:
+        image_input = WebDriverWait(driver, upload_timeout).until(
+            EC.presence_of_element_located((By.XPATH, input_xpath))
+        )
+    except TimeoutException:
+        steps.fail()
+        logger.warning(f"未找到封面图片输入框 ({input_xpath})，改用页面截取封面。正在采集诊断数据...")
+        diagnostics.capture_failure(driver, config, "cover_image_input_not_found", video_file_path)
+        return False
+    image_input.send_keys(os.path.abspath(cover_image_path))
+    logger.debug(f"封面图片已发送: {cover_image_path}")
+
+    steps.start('cover_confirm')
+    WebDriverWait(driver, step_timeout('cover_confirm', 30)).until(
+        EC.element_to_be_clickable((By.XPATH, confirm_xpath))
+    ).click()
+    logger.debug("封面上传 '确认' 按钮已点击。")
+
+    # 部分页面版本在确认后还有一次确认，短时间内没有出现则跳过
+    steps.start('cover_final_confirm')
+    try:
+        WebDriverWait(driver, 3).until(EC.element_to_be_clickable((By.XPATH, COVER_FINAL_CONFIRM_XPATH))).click()
+        logger.debug("封面最终确认按钮已点击。")
+    except TimeoutException:
+        logger.debug("没有出现封面最终确认按钮。")
+    return True
+
+# --- End Custom Cover Upload ---
+
+def perform_video_upload(driver, video_file_path, video_title, cover_image_path, config, description=None, tags=None):
+    """
+    在已登录的页面上执行视频上传操作。video_title/description/tags 为空时使用平台默认值。
+    [VideoSettings] cover_mode = upload 且 cover_image_path 存在时上传该图片作为封面，否则在页面中截取封面。
+    """
+    steps = _StepRecorder(video_file_path)
+    timeouts = adaptive_timeouts.get_adaptive_timeouts(config)
+    if timeouts:
+        add_step_listener(timeouts)
+
+    def step_timeout(step_name, default):
+        # 启用自适应超时时按历史耗时计算，否则使用固定的默认值
+        return timeouts.timeout_for(step_name, video_file_path, default) if timeouts else default
+
     try:
         logger.info(f"开始上传视频文件: {video_file_path}")
+        steps.start('file_input')
+        file_input_timeout = step_timeout('file_input', 10)
 
         xpath_strategy_2_input_general_hidden = "//input[@type='file' and (contains(@style,'display: none') or contains(@class,'hidden') or not(@visible)) and (@accept='video/*' or contains(@accept, '.mp4'))]" # 通用隐藏视频输入
 
@@ -691,7 +907,7 @@ def perform_video_upload(driver, video_file_path, video_title, cover_image_path,
         logger.debug(f"尝试使用通用隐藏视频输入 XPath: '{xpath_strategy_2_input_general_hidden}'")
         try:
 
-            WebDriverWait(driver, 10).until(
+            WebDriverWait(driver, file_input_timeout).until(
                 EC.presence_of_element_located((By.XPATH, xpath_strategy_2_input_general_hidden))
             )
             possible_inputs = driver.find_elements(By.XPATH, xpath_strategy_2_input_general_hidden)
@@ -702,22 +918,21 @@ def perform_video_upload(driver, video_file_path, video_title, cover_image_path,
             else:
                 logger.warning(f"失败: 未找到匹配 '{xpath_strategy_2_input_general_hidden}' 的元素，即使 presence_of_element_located 成功。")
         except TimeoutException:
-            logger.warning(f"失败: 在10秒内未能通过 XPath '{xpath_strategy_2_input_general_hidden}' 找到任何元素。截图保存中...")
-            screenshot_path = os.path.join(logs_path, "file_input_strategy2b_fail.png")
-            driver.save_screenshot(screenshot_path)
-            logger.debug(f"截图已保存到: {screenshot_path}")
+            logger.warning(f"失败: 在{file_input_timeout:.0f}秒内未能通过 XPath '{xpath_strategy_2_input_general_hidden}' 找到任何元素。正在采集诊断数据...")
+            diagnostics.capture_failure(driver, config, "file_input_strategy2b_fail", video_file_path)
         except Exception as e_gen_xpath:
             logger.warning(f"执行 XPath '{xpath_strategy_2_input_general_hidden}' 时发生意外错误: {e_gen_xpath}")
-            screenshot_path = os.path.join(logs_path, "file_input_strategy2b_exception.png")
-            driver.save_screenshot(screenshot_path)
-            logger.debug(f"截图已保存到: {screenshot_path}")
+            diagnostics.capture_failure(driver, config, "file_input_strategy2b_exception", video_file_path)
+
+        if file_input_element:
+            # 记录上传页的加载瀑布，用于对比不同拦截策略下上传区域的可交互时间
+            network_policy.record_waterfall(driver, config, 'upload_page')
 
         if not file_input_element:
             logger.error("所有定位策略均失败，未能找到文件输入元素。请检查上传页面的HTML结构和截图，并调整XPath选择器。")
             # 最终截图
-            screenshot_path = os.path.join(logs_path, "file_input_all_strategies_failed.png")
-            driver.save_screenshot(screenshot_path)
-            logger.debug(f"最终截图已保存到: {screenshot_path}")
+            diagnostics.capture_failure(driver, config, "file_input_all_strategies_failed", video_file_path)
+            steps.fail()
             return False
 
         # --- 文件路径发送 --- 
@@ -729,10 +944,8 @@ def perform_video_upload(driver, video_file_path, video_title, cover_image_path,
         except Exception as e_sendkeys:
             logger.error(f"向文件输入框直接发送路径失败: {e_sendkeys}")
             logger.debug("请检查截图，确认元素是否真的可以直接接收 send_keys，或是否需要JS辅助使其可见/可交互。")
-            screenshot_path = os.path.join(logs_path, "send_keys_to_file_input_failed.png")
-            driver.save_screenshot(screenshot_path)
-            logger.debug(f"截图已保存到: {screenshot_path}")
-
+            diagnostics.capture_failure(driver, config, "send_keys_to_file_input_failed", video_file_path)
+            steps.fail()
             return False
 
         logger.debug("等待视频信息加载和表单出现……")
@@ -746,131 +959,153 @@ def perform_video_upload(driver, video_file_path, video_title, cover_image_path,
                 capture_cover_tab_xpath = "/html/body/div[6]/div/div[2]/div/div[1]/ul/li[1]"
                 next_step_button_xpath = "/html/body/div[6]/div/div[2]/div/div[2]/div"
                 cover_confirm_op_xpath = "/html/body/div[6]/div/div[2]/div/div[1]/div/div[2]/div[2]/div[3]/div[3]/button[2]"
-                final_confirm_op_xpath = "/html/body/div[7]/div/div[2]/div/div[2]/button[2]"
+                final_confirm_op_xpath = COVER_FINAL_CONFIRM_XPATH
 
+                steps.start('cover_area')
                 logger.debug(f"尝试点击初始封面区域: {initial_cover_area_xpath}")
-                initial_cover_area = WebDriverWait(driver, 20).until(
+                initial_cover_area = WebDriverWait(driver, step_timeout('cover_area', 20)).until(
                     EC.element_to_be_clickable((By.XPATH, initial_cover_area_xpath))
                 )
                 driver.execute_script("arguments[0].scrollIntoView(true);", initial_cover_area)
                 time.sleep(0.5) # 点击前短暂暂停
                 initial_cover_area.click()
                 logger.debug("初始封面区域已点击。等待封面选项对话框...")
-                time.sleep(2) # 等待对话框出现
-
-                logger.debug(f"点击 '截取封面' 标签: {capture_cover_tab_xpath}")
-                capture_tab = WebDriverWait(driver, 10).until(
-                    EC.element_to_be_clickable((By.XPATH, capture_cover_tab_xpath))
-                )
-                capture_tab.click()
-                logger.debug("'截取封面' 标签已点击。")
-                time.sleep(1) # 等待标签内容加载
 
-                logger.debug(f"点击 '下一步' 按钮: {next_step_button_xpath}")
-                next_button = WebDriverWait(driver, 10).until(
-                    EC.element_to_be_clickable((By.XPATH, next_step_button_xpath))
-                )
-                next_button.click()
-                logger.debug("'下一步' 按钮已点击。")
-                time.sleep(1) # 等待对话框内下一步操作
-
-                logger.debug(f"点击 '确认' 按钮: {cover_confirm_op_xpath}")
-                confirm_button = WebDriverWait(driver, 30).until(
-                    EC.element_to_be_clickable((By.XPATH, cover_confirm_op_xpath))
-                )
-                driver.execute_script("arguments[0].scrollIntoView(true);", confirm_button)
-                time.sleep(0.5) # 点击前短暂暂停
-                confirm_button.click()
-                logger.debug("封面选择 '确认' 按钮已点击。")
-                time.sleep(2) # 如旧代码中一样，确认后等待处理
+                custom_cover_uploaded = False
+                if (config.get('VideoSettings', 'cover_mode', fallback='capture').strip().lower() == 'upload'
+                        and cover_image_path and os.path.exists(cover_image_path)):
+                    # 上传预先提取的封面图片，跳过页面内截取封面的多次点击和固定等待
+                    custom_cover_uploaded = upload_cover_image(driver, config, cover_image_path, steps, step_timeout, video_file_path)
+                if custom_cover_uploaded:
+                    logger.info(f"自定义封面上传完成: {cover_image_path}")
+                else:
+                    time.sleep(2) # 等待对话框出现
+
+                    steps.start('cover_dialog')
+                    cover_dialog_timeout = step_timeout('cover_dialog', 10)
+                    logger.debug(f"点击 '截取封面' 标签: {capture_cover_tab_xpath}")
+                    capture_tab = WebDriverWait(driver, cover_dialog_timeout).until(
+                        EC.element_to_be_clickable((By.XPATH, capture_cover_tab_xpath))
+                    )
+                    capture_tab.click()
+                    logger.debug("'截取封面' 标签已点击。")
+                    time.sleep(1) # 等待标签内容加载
 
-                # --- 修改后的最终确认按钮逻辑 ---
-                logger.debug(f"检查并尝试点击封面编辑后的最终确认按钮: {final_confirm_op_xpath}")
-                try:
-                    # 首先，用短超时检查元素是否存在，避免长时间等待一个不存在的元素
-                    WebDriverWait(driver, 3).until(
-                        EC.presence_of_element_located((By.XPATH, final_confirm_op_xpath))
+                    logger.debug(f"点击 '下一步' 按钮: {next_step_button_xpath}")
+                    next_button = WebDriverWait(driver, cover_dialog_timeout).until(
+                        EC.element_to_be_clickable((By.XPATH, next_step_button_xpath))
                     )
-                    logger.debug(f"最终确认按钮 (XPath: {final_confirm_op_xpath}) 存在。现在等待其可点击并尝试点击...")
-                    
-                    # 按钮存在，现在等待它可被点击（可能需要更长时间）
-                    final_confirm_button_element = WebDriverWait(driver, 15).until(
-                        EC.element_to_be_clickable((By.XPATH, final_confirm_op_xpath))
+                    next_button.click()
+                    logger.debug("'下一步' 按钮已点击。")
+                    time.sleep(1) # 等待对话框内下一步操作
+
+                    steps.start('cover_confirm')
+                    logger.debug(f"点击 '确认' 按钮: {cover_confirm_op_xpath}")
+                    confirm_button = WebDriverWait(driver, step_timeout('cover_confirm', 30)).until(
+                        EC.element_to_be_clickable((By.XPATH, cover_confirm_op_xpath))
                     )
-                    final_confirm_button_element.click()
-                    logger.debug("封面最终确认按钮已成功点击。") # 使用 info 级别表示成功完成一个可选/条件步骤
-                except TimeoutException:
-                    logger.warning(f"封面最终确认按钮 (XPath: {final_confirm_op_xpath}) 未在预期时间内找到或变为可点击。此步骤可能为可选或页面行为已改变，将跳过。")
-                    return False# 表示上传失败
-                # --- 结束修改后的最终确认按钮逻辑 ---
+                    driver.execute_script("arguments[0].scrollIntoView(true);", confirm_button)
+                    time.sleep(0.5) # 点击前短暂暂停
+                    confirm_button.click()
+                    logger.debug("封面选择 '确认' 按钮已点击。")
+                    time.sleep(2) # 如旧代码中一样，确认后等待处理
+
+                    # --- 修改后的最终确认按钮逻辑 ---
+                    steps.start('cover_final_confirm')
+                    logger.debug(f"检查并尝试点击封面编辑后的最终确认按钮: {final_confirm_op_xpath}")
+                    try:
+                        # 首先，用短超时检查元素是否存在，避免长时间等待一个不存在的元素
+                        WebDriverWait(driver, 3).until(
+                            EC.presence_of_element_located((By.XPATH, final_confirm_op_xpath))
+                        )
+                        logger.debug(f"最终确认按钮 (XPath: {final_confirm_op_xpath}) 存在。现在等待其可点击并尝试点击...")
+                    
+                        # 按钮存在，现在等待它可被点击（可能需要更长时间）
+                        final_confirm_button_element = WebDriverWait(driver, step_timeout('cover_final_confirm', 15)).until(
+                            EC.element_to_be_clickable((By.XPATH, final_confirm_op_xpath))
+                        )
+                        final_confirm_button_element.click()
+                        logger.debug("封面最终确认按钮已成功点击。") # 使用 info 级别表示成功完成一个可选/条件步骤
+                    except TimeoutException:
+                        logger.warning(f"封面最终确认按钮 (XPath: {final_confirm_op_xpath}) 未在预期时间内找到或变为可点击。此步骤可能为可选或页面行为已改变，将跳过。")
+                        steps.fail()
+                        return False# 表示上传失败
+                    # --- 结束修改后的最终确认按钮逻辑 ---
                 
-                logger.info("封面截取与确认流程完成。")
+                    logger.info("封面截取与确认流程完成。")
 
             except TimeoutException as e_cover:
+                steps.fail()
                 logger.error(f"封面截取/确认过程中发生超时: {e_cover}")
-                screenshot_path = os.path.join(logs_path, "cover_selection_timeout_error.png")
-                driver.save_screenshot(screenshot_path)
-                logger.debug(f"已保存封面选择超时截图到: {screenshot_path}")
-                logger.error("封面截取/确认超时，已关闭浏览器窗口，标记该视频上传失败。")
-                driver.quit()
+                diagnostics.capture_failure(driver, config, "cover_selection_timeout_error", video_file_path)
+                # 浏览器由调用方统一关闭/回收，这里不再调用 driver.quit()，避免重复关闭
+                logger.error("封面截取/确认超时，标记该视频上传失败。")
                 return False# 表示上传失败
             except Exception as e_cover_generic:
+                steps.fail()
                 logger.error(f"封面截取/确认过程中发生意外错误: {e_cover_generic}", exc_info=True)
-                screenshot_path = os.path.join(logs_path, "cover_selection_unexpected_error.png")
-                driver.save_screenshot(screenshot_path)
-                logger.debug(f"已保存封面选择意外错误截图到: {screenshot_path}")
+                diagnostics.capture_failure(driver, config, "cover_selection_unexpected_error", video_file_path)
                 return False # 表示上传失败
             # --- 结束新的封面选择逻辑 ---
 
             logger.debug("封面处理完成。") # 移除了日志中关于等待后点击发布的部分
             time.sleep(2) # 保留用户要求的在封面操作后的2秒等待
 
+            steps.start('processing_text')
             text_indicator_xpath = "/html/body/div[1]/div/div[3]/section/main/div[2]/div/div/div[2]/div/div/div/div[2]/div/div[1]/div/div/div/div[3]/div/div[2]/div[1]/div[2]/div[2]/div[2]/div[2]"
-            logger.debug(f"等待指定区域出现文本内容 (XPath: {text_indicator_xpath}) 以准备发布...")
+            processing_timeout = step_timeout('processing_text', 60)
+            logger.debug(f"等待指定区域出现文本内容 (XPath: {text_indicator_xpath}) 以准备发布，最多 {processing_timeout:.0f} 秒...")
             try:
-                WebDriverWait(driver, 60).until( # 等待最多60秒
+                WebDriverWait(driver, processing_timeout).until(
                     lambda d: d.find_element(By.XPATH, text_indicator_xpath).text.strip() != ""
                 )
                 logger.debug(f"指定区域 (XPath: {text_indicator_xpath}) 已出现文本内容。继续发布流程。")
             except TimeoutException:
-                logger.error(f"在指定区域 (XPath: {text_indicator_xpath}) 等待文本内容超时（60秒）。视频可能未成功处理或状态未更新。截图保存中...")
-                screenshot_path = os.path.join(logs_path, "text_appearance_timeout_for_publish.png")
-                try:
-                    driver.save_screenshot(screenshot_path)
-                    logger.debug(f"截图已保存到: {screenshot_path}")
-                except Exception as scr_e:
-                    logger.error(f"保存截图失败: {scr_e}")
+                steps.fail()
+                logger.error(f"在指定区域 (XPath: {text_indicator_xpath}) 等待文本内容超时（{processing_timeout:.0f}秒）。视频可能未成功处理或状态未更新。正在采集诊断数据...")
+                diagnostics.capture_failure(driver, config, "text_appearance_timeout_for_publish", video_file_path)
                 return False # 表示上传失败，无法继续发布
 
+            if video_title or description or tags:
+                steps.start('metadata')
+                # 平台会在上传开始后用文件名自动填充标题，因此在视频处理完成后再覆盖
+                missing_fields = fill_metadata_fields(driver, config, video_title, description, tags)
+                if missing_fields:
+                    steps.fail()
+                    logger.warning(f"未找到以下字段的输入框，将保留平台默认值: {', '.join(missing_fields)}。正在采集诊断数据...")
+                    diagnostics.capture_failure(driver, config, "metadata_fields_not_found", video_file_path)
+                else:
+                    logger.debug("标题/简介/标签已填写。")
+
             submit_button_locator = (By.XPATH, "//button[contains(.,'发布') and not(@disabled)]")
             logger.debug(f"尝试定位并点击发布按钮 ({submit_button_locator[1]})...")
 
+            steps.start('mask')
             logger.debug("等待可能的遮罩层消失...")
             try:
-                WebDriverWait(driver, 45).until( # 等待最多45秒让遮罩消失
+                WebDriverWait(driver, step_timeout('mask', 45)).until( # 默认最多等待45秒让遮罩消失
                     EC.invisibility_of_element_located((By.XPATH, "//div[@class='mask ']"))
                 )
                 logger.debug("遮罩层已消失或超时。")
             except TimeoutException:
-                logger.warning("等待遮罩层消失超时，但仍将尝试点击发布按钮。这可能会失败。截图保存中...")
-                screenshot_path = os.path.join(logs_path, "mask_still_present_timeout.png")
-                try:
-                    driver.save_screenshot(screenshot_path)
-                    logger.debug(f"截图已保存到: {screenshot_path}")
-                except Exception as scr_e:
-                    logger.error(f"保存截图失败: {scr_e}")
+                steps.fail()
+                logger.warning("等待遮罩层消失超时，但仍将尝试点击发布按钮。这可能会失败。正在采集诊断数据...")
+                diagnostics.capture_failure(driver, config, "mask_still_present_timeout", video_file_path)
             
             # 再次确保按钮是可点击的，因为遮罩消失后，按钮状态可能再次变化
+            steps.start('publish')
             logger.debug("重新确认发布按钮可点击性...")
-            submit_button = WebDriverWait(driver, 10).until(EC.element_to_be_clickable(submit_button_locator))
+            submit_button = WebDriverWait(driver, step_timeout('publish', 10)).until(EC.element_to_be_clickable(submit_button_locator))
 
             submit_button.click() # 点击发布按钮
             logger.debug("发布按钮已点击。")
 
             # --- 开始处理可能的弹窗 ---
+            steps.start('popup')
             try:
                 logger.debug("检查是否存在需要额外确认的弹窗...")
                 # 等待弹窗中的特定按钮出现，设置一个较短的超时时间，例如5秒
+                # 弹窗通常不出现，这一步的耗时大多等于超时本身，因此不使用自适应超时
                 popup_button_xpath = "/html/body/div[7]/div[2]/div/div[2]/div[3]/button[1]/span"
                 popup_button = WebDriverWait(driver, 5).until(
                     EC.element_to_be_clickable((By.XPATH, popup_button_xpath))
@@ -898,21 +1133,17 @@ def perform_video_upload(driver, video_file_path, video_title, cover_image_path,
             logger.debug("程序将在此暂停一段时间以便您观察。")
 
         except TimeoutException as e_wait_title: # 这个 except 对应主 TRY 块
+            steps.fail()
             logger.error(f"在视频处理或发布准备阶段发生超时: {e_wait_title}", exc_info=True)
-            screenshot_path = os.path.join(logs_path, "after_file_selection_error.png")
-            driver.save_screenshot(screenshot_path)
-            logger.debug(f"已保存截图到: {screenshot_path}")
+            diagnostics.capture_failure(driver, config, "after_file_selection_error", video_file_path)
             return False
 
+        steps.finish()
         logger.info("视频上传流程（到点击发布按钮）初步完成。")
         return True
 
     except Exception as e:
+        steps.fail()
         logger.error(f"视频上传过程中发生未预期错误: {e}", exc_info=True)
-        screenshot_path = os.path.join(logs_path, "perform_video_upload_unexpected_error.png")
-        try:
-            driver.save_screenshot(screenshot_path)
-            logger.debug(f"已保存截图到: {screenshot_path}")
-        except Exception as scr_e:
-            logger.error(f"保存截图失败: {scr_e}")
+        diagnostics.capture_failure(driver, config, "perform_video_upload_unexpected_error", video_file_path)
         return False
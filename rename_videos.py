@@ -1,6 +1,126 @@
 import os
+import re
+import json
+import uuid
+import subprocess
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 
-def batch_rename_videos(folder_path, base_name, start_number, extension):
+JOURNAL_PREFIX = ".rename_journal_"
+TEMP_PREFIX = ".renametmp_"
+ORDER_CHOICES = ("mtime", "name", "content_date")
+_DIGITS_RE = re.compile(r"(\d+)")
+
+
+def _natural_key(name):
+    """自然排序键，使 clip2 排在 clip10 之前。"""
+    return [int(part) if part.isdigit() else part.lower() for part in _DIGITS_RE.split(name)]
+
+
+def _content_date(path, mtime, ffprobe_path="ffprobe"):
+    """读取视频元数据中的 creation_time，失败时退回文件修改时间。"""
+    try:
+        result = subprocess.run(
+            [ffprobe_path, "-v", "error", "-show_entries", "format_tags=creation_time",
+             "-of", "default=noprint_wrappers=1:nokey=1", path],
+            capture_output=True, text=True, timeout=30
+        )
+        value = result.stdout.strip()
+        if value:
+            return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+    except (OSError, ValueError, subprocess.SubprocessError):
+        pass
+    return mtime
+
+
+def _collect_files(folder_path, extension, order, ffprobe_path):
+    """一次 scandir 收集匹配扩展名的文件，并按确定的顺序排序。"""
+    ext_lower = extension.lower()
+    entries = []
+    with os.scandir(folder_path) as it:
+        for entry in it:
+            if entry.name.startswith((JOURNAL_PREFIX, TEMP_PREFIX)):
+                continue
+            if entry.name.lower().endswith(ext_lower) and entry.is_file():
+                entries.append((entry.name, entry.stat().st_mtime))
+
+    if order == "content_date":
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            keys = list(pool.map(
+                lambda item: _content_date(os.path.join(folder_path, item[0]), item[1], ffprobe_path), entries
+            ))
+        ranked = [(key, name) for key, (name, _) in zip(keys, entries)]
+    elif order == "mtime":
+        ranked = [(mtime, name) for name, mtime in entries]
+    else:
+        ranked = [(_natural_key(name), name) for name, _ in entries]
+    # 文件名作为第二排序键，保证时间相同时顺序也是确定的
+    ranked.sort()
+    return [name for _, name in ranked]
+
+
+def plan_renames(folder_path, base_name, start_number, extension, order="mtime", ffprobe_path="ffprobe"):
+    """
+    在内存中计算完整的重命名映射。
+
+    返回 [(旧文件名, 新文件名), ...]，按编号顺序排列，已经是目标名称的文件不包含在内。
+    编号连续分配，不会因为冲突而跳号。
+    """
+    if order not in ORDER_CHOICES:
+        raise ValueError(f"不支持的排序方式: {order}，可选: {', '.join(ORDER_CHOICES)}")
+    names = _collect_files(folder_path, extension, order, ffprobe_path)
+    plan = []
+    for offset, old_name in enumerate(names):
+        new_name = f"{base_name}{start_number + offset:03d}{extension}"
+        if old_name != new_name:
+            plan.append((old_name, new_name))
+    return plan
+
+
+def _execute_plan(folder_path, plan, journal_path, verbose=False):
+    """
+    两阶段执行重命名：目标名被其他待改名文件占用的先改为临时名，再统一改为最终名。
+    每一步都先写入日志文件，中途失败时可以用 undo_renames 恢复。
+    """
+    # Windows 文件系统不区分大小写，占用检查按规范化后的名称进行
+    occupied = {os.path.normcase(old) for old, _ in plan}
+    token = uuid.uuid4().hex[:8]
+    pending = []
+    renamed = 0
+
+    with open(journal_path, "a", encoding="utf-8") as journal:
+        def log(action, src, dst):
+            journal.write(json.dumps({"action": action, "src": src, "dst": dst}, ensure_ascii=False) + "\n")
+
+        # 阶段一：目标空闲的直接改名，否则先移到临时名
+        for index, (old_name, new_name) in enumerate(plan):
+            if os.path.normcase(new_name) in occupied:
+                temp_name = f"{TEMP_PREFIX}{token}_{index}"
+                log("rename", old_name, temp_name)
+                os.rename(os.path.join(folder_path, old_name), os.path.join(folder_path, temp_name))
+                pending.append((temp_name, new_name))
+            else:
+                log("rename", old_name, new_name)
+                os.rename(os.path.join(folder_path, old_name), os.path.join(folder_path, new_name))
+                renamed += 1
+                if verbose:
+                    print(f"已重命名: '{old_name}' -> '{new_name}'")
+            occupied.discard(os.path.normcase(old_name))
+        journal.flush()
+
+        # 阶段二：临时名 -> 最终名
+        for temp_name, new_name in pending:
+            log("rename", temp_name, new_name)
+            os.rename(os.path.join(folder_path, temp_name), os.path.join(folder_path, new_name))
+            renamed += 1
+            if verbose:
+                print(f"已重命名: -> '{new_name}'")
+        log("done", None, None)
+    return renamed
+
+
+def batch_rename_videos(folder_path, base_name, start_number, extension, order="mtime", dry_run=False,
+                        verbose=False, ffprobe_path="ffprobe"):
     """
     批量重命名指定文件夹中的视频文件。
 
@@ -9,48 +129,71 @@ def batch_rename_videos(folder_path, base_name, start_number, extension):
     base_name (str): 新文件名的基本名称 (例如 "海外猫咪视频大赏")。
     start_number (int): 重命名的起始编号。
     extension (str): 视频文件的扩展名 (例如 ".mp4")。
+    order (str): 编号顺序，"mtime"（修改时间）、"name"（文件名自然排序）或 "content_date"（视频元数据中的拍摄时间）。
+    dry_run (bool): 为 True 时只打印计划，不修改任何文件。
+    verbose (bool): 是否逐个打印重命名结果（文件很多时会明显变慢）。
+
+    返回:
+    本次写入的撤销日志路径；dry_run 或无需改名时返回 None。
     """
     print(f"开始处理文件夹: {folder_path}")
     print(f"新文件名基础: {base_name}")
     print(f"起始编号: {start_number:03d}")
     print(f"文件扩展名: {extension}")
-
-    current_number = start_number
-    files_renamed_count = 0
+    print(f"排序方式: {order}")
 
     try:
-        for filename in os.listdir(folder_path):
-            if filename.lower().endswith(extension.lower()):
-                old_file_path = os.path.join(folder_path, filename)
-                
-                # 生成新的文件名，确保编号是三位数，不足补零
-                new_filename = f"{base_name}{current_number:03d}{extension}"
-                new_file_path = os.path.join(folder_path, new_filename)
-
-                # 检查新文件名是否已存在，以避免覆盖
-                if os.path.exists(new_file_path):
-                    print(f"警告: 文件 {new_filename} 已存在，跳过 {filename}")
-                    # 可以选择是否因为新文件名已存在而递增 current_number
-                    # 如果希望即使跳过也消耗一个编号，可以取消下一行的注释
-                    # current_number += 1 
-                    continue
-
-                try:
-                    os.rename(old_file_path, new_file_path)
-                    print(f"已重命名: '{filename}' -> '{new_filename}'")
-                    files_renamed_count += 1
-                    current_number += 1
-                except OSError as e:
-                    print(f"错误: 重命名 '{filename}' 失败。原因: {e}")
-            
+        plan = plan_renames(folder_path, base_name, start_number, extension, order, ffprobe_path)
     except FileNotFoundError:
         print(f"错误: 文件夹 '{folder_path}' 未找到。")
-        return
+        return None
     except Exception as e:
         print(f"发生未知错误: {e}")
-        return
+        return None
+
+    if not plan:
+        print("\n所有文件均已是目标名称，无需重命名。")
+        return None
+
+    if dry_run:
+        print(f"\n[试运行] 计划重命名 {len(plan)} 个文件:")
+        for old_name, new_name in plan[:50]:
+            print(f"  '{old_name}' -> '{new_name}'")
+        if len(plan) > 50:
+            print(f"  ... 其余 {len(plan) - 50} 个省略")
+        return None
+
+    journal_path = os.path.join(folder_path, f"{JOURNAL_PREFIX}{datetime.now().strftime('%Y%m%d-%H%M%S')}.jsonl")
+    try:
+        files_renamed_count = _execute_plan(folder_path, plan, journal_path, verbose)
+    except OSError as e:
+        print(f"错误: 重命名过程中失败。原因: {e}")
+        print(f"可使用 undo_renames('{journal_path}') 恢复已完成的部分。")
+        return journal_path
+
+    print(f"\n处理完成。总共重命名了 {files_renamed_count} 个文件。撤销日志: {journal_path}")
+    return journal_path
+
+
+def undo_renames(journal_path):
+    """根据撤销日志逆序恢复文件名（同样使用两阶段，避免恢复过程中的名称冲突）。"""
+    folder_path = os.path.dirname(journal_path)
+    with open(journal_path, "r", encoding="utf-8") as f:
+        steps = [json.loads(line) for line in f if line.strip()]
+    renames = [(step["src"], step["dst"]) for step in steps if step["action"] == "rename"]
+
+    # 把日志中的链 (a -> tmp -> b) 折叠为 当前名 -> 原始名
+    origin_of = {}
+    for src, dst in renames:
+        origin_of[dst] = origin_of.pop(src, src)
+    reverse_plan = [(current, original) for current, original in origin_of.items()
+                    if current != original and os.path.exists(os.path.join(folder_path, current))]
+
+    undo_journal = journal_path[:-len(".jsonl")] + ".undo.jsonl"
+    restored = _execute_plan(folder_path, reverse_plan, undo_journal) if reverse_plan else 0
+    print(f"已根据 {journal_path} 恢复 {restored} 个文件名。")
+    return restored
 
-    print(f"\n处理完成。总共重命名了 {files_renamed_count} 个文件。")
 
 if __name__ == "__main__":
     # ----- 请根据您的实际情况修改以下参数 -----
@@ -58,9 +201,16 @@ if __name__ == "__main__":
     BASE_FILENAME = "海外猫咪视频大赏"
     STARTING_NUMBER = 102  # 起始编号，例如 11 代表 011
     FILE_EXTENSION = ".mp4"
+    ORDER_BY = "mtime"  # 编号顺序: "mtime" / "name" / "content_date"
+    DRY_RUN = False  # 为 True 时只打印计划，不实际改名
+    UNDO_JOURNAL = None  # 填入撤销日志路径则执行撤销而不是重命名
     # ----- 参数修改结束 -----
 
-    batch_rename_videos(VIDEO_FOLDER, BASE_FILENAME, STARTING_NUMBER, FILE_EXTENSION)
+    if UNDO_JOURNAL:
+        undo_renames(UNDO_JOURNAL)
+    else:
+        batch_rename_videos(VIDEO_FOLDER, BASE_FILENAME, STARTING_NUMBER, FILE_EXTENSION,
+                            order=ORDER_BY, dry_run=DRY_RUN)
 
     # 提示用户按任意键退出，以便在直接运行脚本时查看输出
     input("\n按 Enter 键退出...")